@@ -1,13 +1,17 @@
-import json
+import contextlib
 import os
 import re
-import tempfile
+import sqlite3
+import threading
 import traceback
-from urllib.request import urlopen
 
 from qgis.core import (
+    Qgis,
+    QgsArcGisRestUtils,
     QgsCoordinateReferenceSystem,
     QgsCoordinateTransform,
+    QgsCsException,
+    QgsDistanceArea,
     QgsFeature,
     QgsFeatureSink,
     QgsField,
@@ -19,26 +23,63 @@ from qgis.core import (
     QgsProcessingParameterCrs,
     QgsProcessingParameterEnum,
     QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterFile,
+    QgsProcessingParameterFileDestination,
+    QgsProcessingParameterNumber,
+    QgsProcessingParameterString,
+    QgsProcessingUtils,
     QgsProject,
+    QgsRectangle,
+    QgsUnitTypes,
     QgsVectorLayer,
+    QgsVectorTileLayer,
+    QgsWkbTypes,
 )
-from qgis.PyQt.QtCore import QCoreApplication
-
+from qgis.PyQt.QtCore import QCoreApplication, QMetaType
+from qgis.PyQt.QtXml import QDomDocument
+
+from . import (
+    api,
+    class_stats,
+    dictionary,
+    esri_rest,
+    estimator,
+    feature_cache,
+    geometry_processing,
+    mirror,
+    overviews,
+    page_sizing,
+    pipeline,
+    server_stats,
+    service_download,
+    spatial_sort,
+    vector_tiles,
+    writers,
+)
+from .catalog import resolve_dataset_url
+from .feature_cache import FeatureCache, default_cache_dir
 from .settings_datasets import DATASETS
 from .settings_prefecture import PREFECTURES
 
 
+def _import_style(layer, style_xml):
+    """Apply a QML document held in memory to ``layer``; returns (ok, error)."""
+    doc = QDomDocument("qgis")
+    doc.setContent(style_xml)
+    return layer.importNamedStyle(doc)
+
+
 class _StylePostProcessor(QgsProcessingLayerPostProcessorInterface):
     _instance = None
 
-    def __init__(self, qml_path):
+    def __init__(self, style_xml):
         super().__init__()
-        self.qml_path = qml_path
+        self.style_xml = style_xml
         _StylePostProcessor._instance = self
 
     def postProcessLayer(self, layer, context, feedback):
-        if self.qml_path and os.path.exists(self.qml_path):
-            ok, err = layer.loadNamedStyle(self.qml_path)
+        if self.style_xml:
+            ok, err = _import_style(layer, self.style_xml)
             if ok:
                 layer.triggerRepaint()
                 feedback.pushInfo(f"Applied style to layer: {layer.name()}")
@@ -52,6 +93,26 @@ class MOELoaderAlgorithm(QgsProcessingAlgorithm):
     PREFECTURE = "PREFECTURE"
     CRS = "CRS"
     ADD_AS_ARCGIS_LAYER = "ADD_AS_ARCGIS_LAYER"
+    CACHE_ARCGIS_LAYER = "CACHE_ARCGIS_LAYER"
+    CACHE_TTL = "CACHE_TTL"
+    MIRROR_DIR = "MIRROR_DIR"
+    BASE_URL = "BASE_URL"
+    ESTIMATE_ONLY = "ESTIMATE_ONLY"
+    STATISTICS_ONLY = "STATISTICS_ONLY"
+    STATISTICS_ALL_PREFECTURES = "STATISTICS_ALL_PREFECTURES"
+    ALL_LAYERS = "ALL_LAYERS"
+    BULK_LOAD = "BULK_LOAD"
+    MEMORY_LIMIT = "MEMORY_LIMIT"
+    REPAIR_GEOMETRIES = "REPAIR_GEOMETRIES"
+    GRID_SIZE = "GRID_SIZE"
+    SPATIAL_SORT = "SPATIAL_SORT"
+    BUILD_OVERVIEWS = "BUILD_OVERVIEWS"
+    VECTOR_TILES = "VECTOR_TILES"
+    TILE_FIELDS = "TILE_FIELDS"
+    TILE_MIN_ZOOM = "TILE_MIN_ZOOM"
+    TILE_MAX_ZOOM = "TILE_MAX_ZOOM"
+    ENCODE_FIELDS = "ENCODE_FIELDS"
+    CLASS_STATS_FIELDS = "CLASS_STATS_FIELDS"
     OUTPUT = "OUTPUT"
 
     def initAlgorithm(self, config=None):
@@ -105,6 +166,199 @@ class MOELoaderAlgorithm(QgsProcessingAlgorithm):
             )
         )
 
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.CACHE_ARCGIS_LAYER,
+                self.tr("Cache ArcGIS REST Server layer features locally"),
+                optional=True,
+                defaultValue=False,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.CACHE_TTL,
+                self.tr("Cache lifetime (hours)"),
+                type=Qgis.ProcessingNumberParameterType.Double,
+                minValue=0,
+                optional=True,
+                defaultValue=24,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFile(
+                self.MIRROR_DIR,
+                self.tr("Local mirror directory"),
+                behavior=Qgis.ProcessingFileParameterBehavior.Folder,
+                optional=True,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterString(
+                self.BASE_URL,
+                self.tr("Server base URL (mirror server)"),
+                optional=True,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.ESTIMATE_ONLY,
+                self.tr("Only estimate the download size (no download)"),
+                optional=True,
+                defaultValue=False,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.STATISTICS_ONLY,
+                self.tr("Only fetch class totals from the server (no geometries)"),
+                optional=True,
+                defaultValue=False,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.STATISTICS_ALL_PREFECTURES,
+                self.tr("Class totals for all prefectures"),
+                optional=True,
+                defaultValue=False,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.ALL_LAYERS,
+                self.tr("Download all layers and tables of the service (GeoPackage)"),
+                optional=True,
+                defaultValue=False,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.BULK_LOAD,
+                self.tr("Bulk-load GeoPackage output (build spatial index at the end)"),
+                optional=True,
+                defaultValue=True,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.MEMORY_LIMIT,
+                self.tr("Move temporary output to disk above (MB, 0 = never)"),
+                type=Qgis.ProcessingNumberParameterType.Double,
+                minValue=0,
+                optional=True,
+                defaultValue=512,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.REPAIR_GEOMETRIES,
+                self.tr("Repair invalid geometries (parallel)"),
+                optional=True,
+                defaultValue=False,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.GRID_SIZE,
+                self.tr("Snap geometries to grid (0 = off)"),
+                type=Qgis.ProcessingNumberParameterType.Double,
+                minValue=0,
+                optional=True,
+                defaultValue=0,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.SPATIAL_SORT,
+                self.tr("Spatial order of the output"),
+                options=[
+                    self.tr("Server order"),
+                    self.tr("Hilbert curve"),
+                    self.tr("Z-order curve"),
+                ],
+                optional=True,
+                defaultValue=0,
+            )
+        )
+
+        build_overviews = QgsProcessingParameterBoolean(
+            self.BUILD_OVERVIEWS,
+            self.tr("Build overview layers for small scales (GeoPackage)"),
+            optional=True,
+            defaultValue=False,
+        )
+        build_overviews.setHelp(
+            self.tr(
+                "Overviews are simplified feature by feature, so small gaps and "
+                "overlaps can appear between neighbouring polygons. They are "
+                "meant for display only; use the full resolution layer for "
+                "analysis."
+            )
+        )
+        self.addParameter(build_overviews)
+
+        self.addParameter(
+            QgsProcessingParameterString(
+                self.TILE_FIELDS,
+                self.tr("Vector tile attributes (comma separated, empty = all)"),
+                optional=True,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.TILE_MIN_ZOOM,
+                self.tr("Vector tile minimum zoom"),
+                type=Qgis.ProcessingNumberParameterType.Integer,
+                minValue=0,
+                maxValue=24,
+                optional=True,
+                defaultValue=vector_tiles.DEFAULT_MIN_ZOOM,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.TILE_MAX_ZOOM,
+                self.tr("Vector tile maximum zoom"),
+                type=Qgis.ProcessingNumberParameterType.Integer,
+                minValue=0,
+                maxValue=24,
+                optional=True,
+                defaultValue=vector_tiles.DEFAULT_MAX_ZOOM,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterString(
+                self.ENCODE_FIELDS,
+                self.tr(
+                    "Encode text fields as codes (comma separated, * = all, GeoPackage)"
+                ),
+                optional=True,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterString(
+                self.CLASS_STATS_FIELDS,
+                self.tr("Per-class statistics CSV for fields (comma separated)"),
+                optional=True,
+            )
+        )
+
         self.addParameter(
             QgsProcessingParameterFeatureSink(
                 self.OUTPUT,
@@ -113,6 +367,16 @@ class MOELoaderAlgorithm(QgsProcessingAlgorithm):
             )
         )
 
+        self.addParameter(
+            QgsProcessingParameterFileDestination(
+                self.VECTOR_TILES,
+                self.tr("Vector tiles (MBTiles)"),
+                fileFilter="MBTiles (*.mbtiles)",
+                optional=True,
+                createByDefault=False,
+            )
+        )
+
     def checkParameterValues(self, parameters, context):
         dataset_idx = self.parameterAsEnum(parameters, self.CATEGORY, context)
         _, has_prefecture = self._dataset_mapping[dataset_idx]
@@ -129,17 +393,30 @@ class MOELoaderAlgorithm(QgsProcessingAlgorithm):
         dataset_key, has_prefecture = self._dataset_mapping[dataset_idx]
 
         dataset = DATASETS[dataset_key]
-        url = dataset["url"]
+        pref_code = None
 
         if has_prefecture:
             pref_idx = self.parameterAsEnum(parameters, self.PREFECTURE, context)
             pref_code = list(PREFECTURES.keys())[pref_idx]
 
-            # Handle specific URL for Hokkaido
-            if dataset_key == "vg_50000" and pref_code == "01":
-                pref_code = f"{pref_code}_0420"
-
-            url = url.format(pref_code=pref_code)
+        base_url = self.parameterAsString(parameters, self.BASE_URL, context)
+        url = resolve_dataset_url(dataset_key, pref_code, base_url or None)
+
+        if self.parameterAsBool(parameters, self.ESTIMATE_ONLY, context):
+            return self._estimate_download(url, feedback)
+
+        if self.parameterAsBool(parameters, self.STATISTICS_ONLY, context):
+            targets = [(self._build_layer_name(dataset, has_prefecture, None), url)]
+            if has_prefecture:
+                targets = [(PREFECTURES[pref_code], url)]
+                if self.parameterAsBool(
+                    parameters, self.STATISTICS_ALL_PREFECTURES, context
+                ):
+                    targets = [
+                        (name, resolve_dataset_url(dataset_key, code, base_url or None))
+                        for code, name in PREFECTURES.items()
+                    ]
+            return self._server_statistics(targets, parameters, context, feedback)
 
         feedback.pushInfo(f"Loading from: {url}")
 
@@ -151,6 +428,7 @@ class MOELoaderAlgorithm(QgsProcessingAlgorithm):
             layer_id = self._load_as_arcgis_layer(
                 url,
                 dataset,
+                dataset_key,
                 has_prefecture,
                 pref_idx if has_prefecture else None,
                 parameters,
@@ -165,6 +443,20 @@ class MOELoaderAlgorithm(QgsProcessingAlgorithm):
             )
             return {"OUTPUT": None}
 
+        if self.parameterAsBool(parameters, self.ALL_LAYERS, context):
+            return self._save_all_layers(
+                url,
+                parameters,
+                context,
+                feedback,
+                dataset=dataset,
+                has_prefecture=has_prefecture,
+                pref_idx=pref_idx if has_prefecture else None,
+            )
+
+        self._geometry_stats = None
+        self._vector_tiles = None
+        self._class_stats_path = None
         file_output = self._save_to_file(
             url,
             parameters,
@@ -175,21 +467,134 @@ class MOELoaderAlgorithm(QgsProcessingAlgorithm):
             has_prefecture=has_prefecture,
             pref_idx=pref_idx if has_prefecture else None,
         )
-        return {"OUTPUT": file_output}
+        results = {"OUTPUT": file_output}
+        if self._geometry_stats is not None:
+            results["INVALID_GEOMETRIES"] = self._geometry_stats["invalid"]
+            results["REPAIRED_GEOMETRIES"] = self._geometry_stats["repaired"]
+            results["FAILED_GEOMETRIES"] = (
+                self._geometry_stats["unrepaired"] + self._geometry_stats["failed"]
+            )
+        if self._vector_tiles:
+            results["VECTOR_TILES"] = self._vector_tiles
+        if self._class_stats_path:
+            results["CLASS_STATISTICS"] = self._class_stats_path
+        return results
 
     def _fetch_json(self, url, feedback, error_context):
         try:
-            if not url.startswith(("https://", "http://")):
-                raise ValueError(f"Unsupported URL scheme: {url}")
-            with urlopen(url) as response:  # noqa: S310  # nosec B310 - scheme validated above
-                return json.loads(response.read().decode())
+            return esri_rest.fetch_json(url)
         except Exception as e:
             feedback.reportError(f"{error_context}: {str(e)}")
             return None
 
+    def _estimate_download(self, url, feedback):
+        feedback.pushInfo(f"Estimating download from: {url}")
+        resolved = self._resolve_layer_url_and_meta(url, feedback)
+        if not resolved:
+            return {"OUTPUT": None}
+        layer_url, _, layer_meta = resolved
+
+        try:
+            estimate = estimator.estimate_layer(layer_url, layer_meta)
+        except esri_rest.REQUEST_ERRORS as e:
+            self._report_exception(feedback, "Failed to estimate download", e)
+            return {"OUTPUT": None}
+
+        for line in estimator.format_estimate(estimate):
+            feedback.pushInfo(line)
+        return {
+            "OUTPUT": None,
+            "ESTIMATED_FEATURES": estimate["features"],
+            "ESTIMATED_BYTES": estimate["bytes"],
+            "ESTIMATED_SECONDS": estimate["seconds"],
+        }
+
+    def _server_statistics(self, targets, parameters, context, feedback):
+        """Write server-side class totals of ``targets`` to a table."""
+        group_fields = [
+            name.strip()
+            for name in self.parameterAsString(
+                parameters, self.CLASS_STATS_FIELDS, context
+            ).split(",")
+            if name.strip()
+        ]
+        feedback.pushInfo(
+            f"Querying class totals of {len(targets)} service(s) "
+            f"grouped by {', '.join(group_fields) or '(none)'}"
+        )
+        rows, errors = server_stats.collect_statistics(targets, group_fields)
+        for label, error in errors.items():
+            feedback.reportError(f"{label}: {error}")
+
+        fields = QgsFields()
+        fields.append(QgsField("source", QMetaType.Type.QString))
+        for name in group_fields:
+            fields.append(QgsField(name, QMetaType.Type.QString))
+        fields.append(QgsField(server_stats.COUNT_FIELD, QMetaType.Type.LongLong))
+        fields.append(QgsField(server_stats.AREA_FIELD, QMetaType.Type.Double))
+        fields.append(QgsField(server_stats.AREA_UNIT_FIELD, QMetaType.Type.QString))
+
+        # Server areas are in the units of each service's spatial reference.
+        units = {}
+        for row in rows:
+            if row["source"] not in units:
+                crs = api.crs_from_spatial_ref(row[server_stats.SPATIAL_REFERENCE])
+                units[row["source"]] = (
+                    QgsUnitTypes.toString(
+                        QgsUnitTypes.distanceToAreaUnit(crs.mapUnits())
+                    )
+                    if crs is not None
+                    else None
+                )
+
+        dest_id = None
+        if parameters.get(self.OUTPUT):
+            (sink, dest_id) = self.parameterAsSink(
+                parameters,
+                self.OUTPUT,
+                context,
+                fields,
+                Qgis.WkbType.NoGeometry,
+                QgsCoordinateReferenceSystem(),
+            )
+            if sink is None:
+                feedback.reportError(self.tr("Failed to create output layer."))
+                return {"OUTPUT": None}
+            for row in rows:
+                feature = QgsFeature(fields)
+                feature.setAttributes(
+                    [
+                        row["source"],
+                        *(
+                            None if row[name] is None else str(row[name])
+                            for name in group_fields
+                        ),
+                        row[server_stats.COUNT_FIELD],
+                        row[server_stats.AREA_FIELD],
+                        units[row["source"]],
+                    ]
+                )
+                sink.addFeature(feature, QgsFeatureSink.FastInsert)
+            del sink
+        else:
+            for row in rows[:50]:
+                values = [
+                    row["source"],
+                    *(row[name] for name in group_fields),
+                    row[server_stats.COUNT_FIELD],
+                    row[server_stats.AREA_FIELD],
+                    units[row["source"]],
+                ]
+                feedback.pushInfo(
+                    " | ".join("" if value is None else str(value) for value in values)
+                )
+
+        feedback.pushInfo(f"Received {len(rows)} class total(s)")
+        return {"OUTPUT": dest_id, "STATISTICS_ROWS": len(rows)}
+
     def _resolve_layer_url_and_meta(self, url, feedback):
         service_meta = self._fetch_json(
-            f"{url}?f=json", feedback, "Failed to fetch FeatureServer metadata"
+            url, feedback, "Failed to fetch FeatureServer metadata"
         )
         if not service_meta:
             return None
@@ -205,7 +610,7 @@ class MOELoaderAlgorithm(QgsProcessingAlgorithm):
 
         # fmt: off
         layer_meta = self._fetch_json(
-            f"{layer_url}?f=json", feedback, "Failed to fetch layer metadata"
+            layer_url, feedback, "Failed to fetch layer metadata"
         ) or {}
         # fmt: on
 
@@ -229,12 +634,7 @@ class MOELoaderAlgorithm(QgsProcessingAlgorithm):
     def _set_vector_layer_crs(
         self, vector_layer, service_meta, layer_meta, parameters, context, feedback
     ):
-        extent_ref = (layer_meta.get("extent") or {}).get("spatialReference")
-        layer_ref = layer_meta.get("spatialReference")
-        service_ref = service_meta.get("spatialReference", {})
-        spatial_ref = extent_ref or layer_ref or service_ref
-
-        esri_crs = self._crs_from_esri_spatial_ref(spatial_ref, feedback)
+        esri_crs = api.layer_crs(service_meta, layer_meta, feedback)
 
         # Prioritize the CRS specified by the user
         param_crs = self.parameterAsCrs(parameters, self.CRS, context)
@@ -253,6 +653,15 @@ class MOELoaderAlgorithm(QgsProcessingAlgorithm):
 
         vector_layer.setCrs(layer_crs)
 
+    def _output_crs(self, vector_layer, parameters, context, feedback):
+        """Return the CRS parameter if set, otherwise the source layer's CRS."""
+        param_crs = self.parameterAsCrs(parameters, self.CRS, context)
+        if param_crs and param_crs.isValid():
+            feedback.pushInfo(f"Using user-specified CRS: {param_crs.authid()}")
+            return param_crs
+        feedback.pushInfo(f"Keeping the source CRS: {vector_layer.crs().authid()}")
+        return vector_layer.crs()
+
     def _report_exception(self, feedback, message, exception):
         feedback.reportError(f"{message}: {str(exception)}")
         feedback.reportError(traceback.format_exc())
@@ -269,19 +678,36 @@ class MOELoaderAlgorithm(QgsProcessingAlgorithm):
         return output_path
 
     def _load_as_arcgis_layer(
-        self, url, dataset, has_prefecture, pref_idx, parameters, context, feedback
+        self,
+        url,
+        dataset,
+        dataset_key,
+        has_prefecture,
+        pref_idx,
+        parameters,
+        context,
+        feedback,
     ):
         try:
+            use_cache = self.parameterAsBool(
+                parameters, self.CACHE_ARCGIS_LAYER, context
+            )
+            cache_ttl = self.parameterAsDouble(parameters, self.CACHE_TTL, context)
+            layer_name = self._build_layer_name(dataset, has_prefecture, pref_idx)
+
             resolved = self._resolve_layer_url_and_meta(url, feedback)
             if not resolved:
+                if use_cache:
+                    return self._load_offline_cache(url, layer_name, feedback)
                 return None
             layer_url, service_meta, layer_meta = resolved
 
-            layer_name = self._build_layer_name(dataset, has_prefecture, pref_idx)
             vector_layer = self._create_arcgis_vector_layer(
                 layer_url, layer_name, feedback
             )
             if vector_layer is None:
+                if use_cache:
+                    return self._load_offline_cache(url, layer_name, feedback)
                 return None
 
             self._set_vector_layer_crs(
@@ -293,6 +719,34 @@ class MOELoaderAlgorithm(QgsProcessingAlgorithm):
                 feedback,
             )
 
+            if use_cache:
+                layer_id = layer_meta.get("id", layer_url.rsplit("/", 1)[-1])
+                cache = FeatureCache(
+                    default_cache_dir(), url, layer_id, cache_ttl * 3600
+                )
+                # Without a map canvas (headless runs) the whole layer is cached.
+                canvas = feature_cache.map_canvas()
+                extent = None
+                if canvas is not None:
+                    extent = feature_cache.canvas_extent(canvas, vector_layer.crs())
+                fetched, reused, failed = cache.sync(vector_layer, feedback, extent)
+                feedback.pushInfo(
+                    f"Feature cache: {fetched} tile(s) fetched, "
+                    f"{reused} reused, {failed} failed"
+                )
+                style_xml = self._export_style(vector_layer, dataset_key, feedback)
+                if style_xml:
+                    cache.save_style(style_xml)
+                cached_layer = cache.layer(layer_name)
+                if cached_layer is None:
+                    feedback.reportError(f"Failed to open feature cache: {url}")
+                    return None
+                if canvas is not None:
+                    feature_cache.follow_canvas(
+                        cache, vector_layer, cached_layer, canvas
+                    )
+                vector_layer = cached_layer
+
             QgsProject.instance().addMapLayer(vector_layer)
             feedback.pushInfo(f"Successfully loaded layer: {layer_name}")
             return vector_layer.id()
@@ -301,6 +755,17 @@ class MOELoaderAlgorithm(QgsProcessingAlgorithm):
             self._report_exception(feedback, "Error loading layer", e)
             return None
 
+    def _load_offline_cache(self, url, layer_name, feedback):
+        cache = FeatureCache.find(default_cache_dir(), url, 0)
+        vector_layer = cache.layer(layer_name) if cache else None
+        if vector_layer is None:
+            feedback.reportError(f"No cached features available for: {url}")
+            return None
+
+        feedback.pushInfo(f"Server unreachable, loaded cached features: {layer_name}")
+        QgsProject.instance().addMapLayer(vector_layer)
+        return vector_layer.id()
+
     def _save_to_file(
         self,
         url,
@@ -312,23 +777,41 @@ class MOELoaderAlgorithm(QgsProcessingAlgorithm):
         has_prefecture=False,
         pref_idx=None,
     ):
-        resolved = self._resolve_layer_url_and_meta(url, feedback)
-        if not resolved:
-            return None
-        layer_url, service_meta, layer_meta = resolved
+        mirror_dir = self.parameterAsFile(parameters, self.MIRROR_DIR, context)
+        service_dir = mirror.mirror_path(mirror_dir, url)
 
-        vector_layer = self._create_arcgis_vector_layer(layer_url, "temp", feedback)
-        if vector_layer is None:
-            return None
+        if service_dir:
+            layer_meta, page_paths = mirror.read_layer(service_dir)
+            if layer_meta is None or not page_paths:
+                feedback.reportError(f"No mirrored layer found in: {service_dir}")
+                return None
+            service_meta = mirror.read_service_meta(service_dir)
+            feedback.pushInfo(
+                f"Streaming {len(page_paths)} page(s) from mirror: {service_dir}"
+            )
+            # Pages are decoded one at a time while writing; this empty
+            # layer only carries the schema, CRS and renderer.
+            vector_layer = self._create_mirror_vector_layer(layer_meta)
+            total = mirror.feature_count(service_dir, layer_meta.get("id"))
+        else:
+            if mirror_dir:
+                feedback.pushInfo(f"Not found in mirror, loading from server: {url}")
+            resolved = self._resolve_layer_url_and_meta(url, feedback)
+            if not resolved:
+                return None
+            layer_url, service_meta, layer_meta = resolved
 
-        self._set_vector_layer_crs(
-            vector_layer,
-            service_meta,
-            layer_meta,
-            parameters,
-            context,
-            feedback,
-        )
+            vector_layer = self._create_arcgis_vector_layer(layer_url, "temp", feedback)
+            if vector_layer is None:
+                return None
+            total = vector_layer.featureCount()
+
+        # The source layer keeps the server's CRS; a CRS parameter is the
+        # output CRS the features are reprojected to.
+        esri_crs = api.layer_crs(service_meta, layer_meta, feedback)
+        if esri_crs and esri_crs.isValid():
+            vector_layer.setCrs(esri_crs)
+        final_output_crs = self._output_crs(vector_layer, parameters, context, feedback)
 
         cleaned_fields = QgsFields()
         for field in vector_layer.fields():
@@ -337,67 +820,232 @@ class MOELoaderAlgorithm(QgsProcessingAlgorithm):
             new_field.setComment("")
             cleaned_fields.append(new_field)
 
-        final_output_crs = vector_layer.crs()
+        encoder = None
+        sink_fields = cleaned_fields
+        encode_names = self._encode_field_names(
+            parameters, context, cleaned_fields, feedback
+        )
+        if encode_names:
+            encoder = dictionary.DictionaryEncoder(encode_names)
+            sink_fields = QgsFields()
+            for field in cleaned_fields:
+                if field.name() in encode_names:
+                    sink_fields.append(QgsField(field.name(), QMetaType.Type.Int))
+                else:
+                    sink_fields.append(field)
 
-        (sink, dest_id) = self.parameterAsSink(
+        (sink, dest_id, streaming_writer) = self._create_sink(
             parameters,
-            self.OUTPUT,
             context,
-            cleaned_fields,
+            sink_fields,
             vector_layer.wkbType(),
             final_output_crs,
-            QgsFeatureSink.SinkFlags(),
+            feedback,
         )
 
         if sink is None:
             feedback.reportError(self.tr("Failed to create output layer."))
             return None
 
-        feedback.pushInfo(
-            f"Output CRS: {final_output_crs.authid() if final_output_crs.isValid() else 'Unknown'}"
-        )
+        # Sink wrappers own worker pools and temporary files, and the output
+        # file is only finalized (spatial index, journal mode) on close, so
+        # every early return below still has to clean them up.
+        output_sink = sink
+        post_processor = None
+        sorter = None
+        completed = False
+        try:
+            feedback.pushInfo(
+                f"Output CRS: {final_output_crs.authid() if final_output_crs.isValid() else 'Unknown'}"
+            )
 
-        total = vector_layer.featureCount()
-        feedback.pushInfo(f"Writing {total} features to output...")
+            feedback.pushInfo(f"Writing {total} features to output...")
 
-        processed = 0
-        needs_transform = final_output_crs.isValid() and (
-            final_output_crs.authid() != vector_layer.crs().authid()
-        )
-        if needs_transform:
-            feedback.pushInfo(
-                f"Reprojecting on save: {vector_layer.crs().authid()} → {final_output_crs.authid()}"
+            processed = 0
+            needs_transform = final_output_crs.isValid() and (
+                final_output_crs.authid() != vector_layer.crs().authid()
             )
-            transform = QgsCoordinateTransform(
-                vector_layer.crs(),
-                final_output_crs,
-                QgsProject.instance().transformContext(),
+            if needs_transform:
+                feedback.pushInfo(
+                    f"Reprojecting on save: {vector_layer.crs().authid()} → {final_output_crs.authid()}"
+                )
+                transform = QgsCoordinateTransform(
+                    vector_layer.crs(),
+                    final_output_crs,
+                    QgsProject.instance().transformContext(),
+                )
+            else:
+                transform = None
+
+            if encoder is not None:
+                sink = dictionary.EncodingSink(
+                    sink,
+                    encoder,
+                    {cleaned_fields.indexOf(name): name for name in encode_names},
+                )
+                feedback.pushInfo(
+                    f"Dictionary-encoding fields: {', '.join(encode_names)}"
+                )
+
+            statistics = {}
+            stats_fields = self.parameterAsString(
+                parameters, self.CLASS_STATS_FIELDS, context
             )
-        else:
-            transform = None
+            for name in (name.strip() for name in stats_fields.split(",")):
+                if not name:
+                    continue
+                index = cleaned_fields.indexOf(name)
+                if index < 0:
+                    feedback.pushInfo(f"Field not found, no statistics: {name}")
+                    continue
+                statistics[index] = class_stats.ClassStatistics(name)
+            if statistics:
+                sink = class_stats.StatisticsSink(
+                    sink, statistics, self._area_measure(final_output_crs, context)
+                )
 
-        for feature in vector_layer.getFeatures():
-            if feedback.isCanceled():
-                break
-            new_f = QgsFeature(feature)
-            if transform and new_f.hasGeometry():
+            sort_idx = self.parameterAsEnum(parameters, self.SPATIAL_SORT, context)
+            if sort_idx:
+                if service_dir is None:
+                    extent = QgsRectangle(vector_layer.extent())
+                else:
+                    extent = api.extent_from_esri(layer_meta.get("extent"))
+                if transform is not None:
+                    extent = transform.transformBoundingBox(extent)
+                curve = (spatial_sort.HILBERT, spatial_sort.Z_ORDER)[sort_idx - 1]
+                sorter = writers.SortingSink(sink, cleaned_fields, extent, curve)
+                feedback.pushInfo(f"Sorting output features by {curve} key")
+                sink = sorter
+
+            repair = self.parameterAsBool(parameters, self.REPAIR_GEOMETRIES, context)
+            grid_size = self.parameterAsDouble(parameters, self.GRID_SIZE, context)
+            if repair or grid_size > 0:
+                options = {
+                    "make_valid": repair,
+                    "grid_size": grid_size,
+                    "wkb_type": int(vector_layer.wkbType()),
+                }
+                if transform is not None:
+                    # Reproject in the pool along with the repair.
+                    options["source_crs"] = vector_layer.crs().toWkt()
+                    options["dest_crs"] = final_output_crs.toWkt()
+                    transform = None
+                post_processor = geometry_processing.ProcessingSink(sink, options)
+                mode = "processes" if post_processor.processes else "threads"
+                feedback.pushInfo(
+                    f"Post-processing geometries with {post_processor.workers} {mode}"
+                )
+                sink = post_processor
+
+            if service_dir is None:
+                processed = self._write_pipelined(
+                    layer_url,
+                    layer_meta,
+                    cleaned_fields,
+                    transform,
+                    sink,
+                    total,
+                    feedback,
+                )
+                if processed is None:
+                    return None
+                features = ()
+            else:
+                features = self._mirror_features(
+                    page_paths, layer_meta, vector_layer.fields()
+                )
+            # Mirrored pages are read while iterating; a damaged one stops
+            # the copy.
+            try:
+                for feature in features:
+                    if feedback.isCanceled():
+                        break
+                    new_f = QgsFeature(feature)
+                    if transform and new_f.hasGeometry():
+                        try:
+                            geom = new_f.geometry()
+                            if not geom.isEmpty():
+                                geom.transform(transform)
+                                new_f.setGeometry(geom)
+                        except Exception as e:
+                            feedback.pushInfo(
+                                f"Skipping feature due to transform error: {str(e)}"
+                            )
+                            continue
+                    sink.addFeature(new_f, QgsFeatureSink.FastInsert)
+                    processed += 1
+                    if total > 0:
+                        feedback.setProgress(int((processed / total) * 100))
+            except (*esri_rest.REQUEST_ERRORS, EOFError) as e:
+                self._report_exception(feedback, "Failed to read mirrored page", e)
+                return None
+
+            if post_processor is not None:
                 try:
-                    geom = new_f.geometry()
-                    if not geom.isEmpty():
-                        geom.transform(transform)
-                        new_f.setGeometry(geom)
-                except Exception as e:
-                    feedback.pushInfo(
-                        f"Skipping feature due to transform error: {str(e)}"
+                    post_processor.flush()
+                except (RuntimeError, OSError) as e:
+                    self._report_exception(
+                        feedback, "Geometry post-processing failed", e
                     )
-                    continue
-            sink.addFeature(new_f, QgsFeatureSink.FastInsert)
-            processed += 1
-            if total > 0:
-                feedback.setProgress(int((processed / total) * 100))
+                    return None
+                stats = post_processor.stats
+                self._geometry_stats = stats
+                feedback.pushInfo(
+                    f"Geometries: {stats['invalid']} invalid, "
+                    f"{stats['repaired']} repaired, "
+                    f"{stats['unrepaired']} not repairable, {stats['failed']} failed"
+                )
+                processed = post_processor.written
+                sink = post_processor.sink
 
-        feedback.pushInfo(f"Successfully wrote {processed} features")
+            if sorter is not None:
+                if sorter.spilled_runs:
+                    feedback.pushInfo(f"Merging {sorter.spilled_runs} sorted run(s)")
+                try:
+                    processed = sorter.flush()
+                except (OSError, RuntimeError) as e:
+                    self._report_exception(feedback, "Spatial sort failed", e)
+                    return None
+                sink = sorter.sink
+
+            if statistics:
+                sink = sink.sink
+
+            if encoder is not None:
+                sink = sink.sink
+                feedback.pushInfo(
+                    f"Replaced {encoder.encoded_bytes:,} bytes of text with codes for "
+                    f"{encoder.distinct_values()} distinct value(s)"
+                )
 
+            feedback.pushInfo(f"Successfully wrote {processed} features")
+            completed = True
+        finally:
+            if post_processor is not None:
+                post_processor.close()
+            if sorter is not None:
+                sorter.close()
+            if not completed and streaming_writer:
+                with contextlib.suppress(OSError, RuntimeError):
+                    output_sink.close()
+
+        if streaming_writer:
+            feedback.pushInfo("Finalizing output...")
+            try:
+                sink.close()
+            except (OSError, RuntimeError) as e:
+                self._report_exception(feedback, "Failed to finalize output", e)
+            if isinstance(sink, writers.SpillingSink):
+                if sink.spilled:
+                    feedback.pushInfo(
+                        f"Temporary output exceeded the memory limit, "
+                        f"stored on disk: {sink.spill_path}"
+                    )
+                if sink.layer is None or not sink.layer.isValid():
+                    feedback.reportError(self.tr("Failed to create output layer."))
+                    return None
+                context.temporaryLayerStore().addMapLayer(sink.layer)
+                dest_id = sink.layer.id()
         del sink
 
         output_path = self._extract_output_path(dest_id)
@@ -408,16 +1056,74 @@ class MOELoaderAlgorithm(QgsProcessingAlgorithm):
         # Check if this is a real file path (absolute path)
         is_file_output = output_path and os.path.isabs(output_path)
 
-        # Save style QML
-        qml_path = self._save_style_qml(
-            vector_layer, output_path, dataset_key, is_file_output, feedback
+        if statistics:
+            self._class_stats_path = self._write_class_statistics(
+                list(statistics.values()),
+                output_path,
+                is_file_output,
+                context,
+                feedback,
+            )
+
+        # Export the style; only file outputs get a QML file next to them
+        style_xml = self._export_style(vector_layer, dataset_key, feedback)
+        if encoder is not None and style_xml:
+            for reference in dictionary.unrecoded_references(style_xml, encoder.names):
+                feedback.pushWarning(
+                    f"Style shows codes instead of values: {reference}"
+                )
+            style_xml = dictionary.recode_style(style_xml, encoder)
+        qml_path = None
+        if is_file_output and style_xml:
+            qml_path = self._save_style_qml(style_xml, output_path, feedback)
+
+        build_overviews = self.parameterAsBool(
+            parameters, self.BUILD_OVERVIEWS, context
         )
+        overview_tables = []
+        if is_file_output and build_overviews and writers.is_geopackage(output_path):
+            overview_tables = self._build_overviews(
+                output_path, final_output_crs, feedback
+            )
+
+        if is_file_output and encoder is not None:
+            try:
+                view = dictionary.write_lookup_tables(output_path, encoder)
+                feedback.pushInfo(f"Wrote lookup tables and decoded view: {view}")
+            except (ValueError, sqlite3.Error) as e:
+                self._report_exception(feedback, "Failed to write lookup tables", e)
 
         if is_file_output:
             # Load the saved layer and add it to the project with style
             try:
                 saved_layer = QgsVectorLayer(output_path, layer_name, "ogr")
                 if saved_layer.isValid():
+                    tile_sources = {None: saved_layer.source()}
+                    if overview_tables:
+                        tile_sources.update(
+                            self._add_overview_layers(
+                                saved_layer,
+                                output_path,
+                                layer_name,
+                                overview_tables,
+                                style_xml,
+                                qml_path,
+                                feedback,
+                            )
+                        )
+                    tiles_path = self.parameterAsFileOutput(
+                        parameters, self.VECTOR_TILES, context
+                    )
+                    if tiles_path:
+                        self._vector_tiles = self._export_vector_tiles(
+                            saved_layer,
+                            tile_sources,
+                            tiles_path,
+                            layer_name,
+                            parameters,
+                            context,
+                            feedback,
+                        )
                     QgsProject.instance().addMapLayer(saved_layer)
                     feedback.pushInfo(f"Added layer to project: {layer_name}")
                     context.addLayerToLoadOnCompletion(
@@ -436,63 +1142,480 @@ class MOELoaderAlgorithm(QgsProcessingAlgorithm):
             details = QgsProcessingContext.LayerDetails(
                 layer_name, QgsProject.instance(), self.OUTPUT
             )
-            if qml_path:
-                details.setPostProcessor(_StylePostProcessor(qml_path))
+            if style_xml:
+                details.setPostProcessor(_StylePostProcessor(style_xml))
             context.addLayerToLoadOnCompletion(dest_id, details)
 
         return dest_id
 
-    def _save_style_qml(
-        self, vector_layer, output_path, dataset_key, is_file_output, feedback
+    def _save_all_layers(
+        self,
+        url,
+        parameters,
+        context,
+        feedback,
+        dataset=None,
+        has_prefecture=False,
+        pref_idx=None,
+    ):
+        """Download every layer and table of the service into one GeoPackage."""
+        output_path = self.parameterAsOutputLayer(parameters, self.OUTPUT, context)
+        output_path = self._extract_output_path(output_path)
+        if not (os.path.isabs(output_path) and writers.is_geopackage(output_path)):
+            feedback.reportError(
+                self.tr("Downloading all layers needs a GeoPackage file output.")
+            )
+            return {"OUTPUT": None}
+
+        mirror_dir = self.parameterAsFile(parameters, self.MIRROR_DIR, context)
+        service_dir = mirror.mirror_path(mirror_dir, url)
+        if service_dir:
+            service_meta = mirror.read_service_meta(service_dir)
+        else:
+            service_meta = self._fetch_json(
+                url, feedback, "Failed to fetch FeatureServer metadata"
+            )
+            if not service_meta:
+                return {"OUTPUT": None}
+
+        entries = esri_rest.service_entries(service_meta)
+        if not entries:
+            feedback.reportError(f"No layers found in FeatureServer: {url}")
+            return {"OUTPUT": None}
+        feedback.pushInfo(
+            f"Downloading {len(entries)} layer(s) and table(s) "
+            f"with {service_download.DEFAULT_WORKERS} workers"
+        )
+
+        crs = self.parameterAsCrs(parameters, self.CRS, context)
+        try:
+            results = service_download.download_service(
+                url,
+                service_meta,
+                output_path,
+                crs=crs if crs.isValid() else None,
+                transform_context=context.transformContext(),
+                service_dir=service_dir,
+                feedback=feedback,
+            )
+        except (*esri_rest.REQUEST_ERRORS, RuntimeError) as e:
+            self._report_exception(feedback, "Failed to download the service", e)
+            return {"OUTPUT": None}
+
+        layer_name = self._build_layer_name(dataset, has_prefecture, pref_idx)
+        written = 0
+        for result in results:
+            entry = result["entry"]
+            if result["error"] is not None:
+                feedback.reportError(
+                    f"{entry.get('name') or entry.get('id')}: {result['error']}"
+                )
+                continue
+            written += 1
+            feedback.pushInfo(
+                f"{result['table']}: {result['features']} feature(s)"
+                + (f", {result['skipped']} skipped" if result["skipped"] else "")
+            )
+            if result["page_sizes"]:
+                feedback.pushInfo(f"{result['table']}: {result['page_sizes']}")
+
+            saved_layer = QgsVectorLayer(
+                f"{output_path}|layername={result['table']}",
+                f"{layer_name}_{entry.get('name') or result['table']}",
+                "ogr",
+            )
+            if not saved_layer.isValid():
+                feedback.reportError(f"Could not load saved layer: {result['table']}")
+                continue
+            drawing_info = result["layer_meta"].get("drawingInfo") or {}
+            if drawing_info.get("renderer"):
+                renderer = QgsArcGisRestUtils.convertRenderer(drawing_info["renderer"])
+                if renderer is not None:
+                    saved_layer.setRenderer(renderer)
+            QgsProject.instance().addMapLayer(saved_layer)
+            context.addLayerToLoadOnCompletion(
+                saved_layer.id(),
+                QgsProcessingContext.LayerDetails(
+                    saved_layer.name(), QgsProject.instance(), self.OUTPUT
+                ),
+            )
+
+        feedback.pushInfo(
+            f"Wrote {written} of {len(results)} table(s) to {output_path}"
+        )
+        return {"OUTPUT": output_path if written else None, "LAYERS": written}
+
+    def _area_measure(self, crs, context):
+        """Return ``feature -> (area in m², bbox)`` measuring on the ellipsoid."""
+        distance_area = QgsDistanceArea()
+        distance_area.setSourceCrs(crs, context.transformContext())
+        distance_area.setEllipsoid(crs.ellipsoidAcronym() or "EPSG:7019")
+
+        def measure(feature):
+            if not feature.hasGeometry():
+                return 0.0, None
+            geometry = feature.geometry()
+            box = geometry.boundingBox()
+            area = distance_area.convertAreaMeasurement(
+                distance_area.measureArea(geometry), Qgis.AreaUnit.SquareMeters
+            )
+            return area, (
+                box.xMinimum(),
+                box.yMinimum(),
+                box.xMaximum(),
+                box.yMaximum(),
+            )
+
+        return measure
+
+    def _write_class_statistics(
+        self, statistics, output_path, is_file_output, context, feedback
     ):
         if is_file_output:
-            base, _ = os.path.splitext(output_path)
-            qml_path = base + ".qml"
-        else:
-            fd, qml_path = tempfile.mkstemp(suffix=".qml")
-            os.close(fd)
-
-        res, err = vector_layer.saveNamedStyle(qml_path)
-        if res:
-            feedback.pushInfo(f"Saved style file: {qml_path}")
-            if dataset_key == "vg_50000":
-                from .style_converter import convert_rasterfill_qml
-
-                if convert_rasterfill_qml(qml_path):
-                    feedback.pushInfo("Converted RasterFill to native symbols")
-            return qml_path
+            csv_path = os.path.splitext(output_path)[0] + "_class_stats.csv"
         else:
-            feedback.reportError(f"Failed to save style to {qml_path}: {err}")
+            csv_path = QgsProcessingUtils.generateTempFilename(
+                "class_stats.csv", context
+            )
+        try:
+            rows = class_stats.write_csv(csv_path, statistics)
+        except OSError as e:
+            self._report_exception(feedback, "Failed to write class statistics", e)
+            return None
+        feedback.pushInfo(f"Wrote statistics for {rows} class(es): {csv_path}")
+        return csv_path
+
+    def _encode_field_names(self, parameters, context, fields, feedback):
+        """Text fields to dictionary-encode, or [] to write values verbatim."""
+        value = self.parameterAsString(parameters, self.ENCODE_FIELDS, context)
+        requested = [name.strip() for name in value.split(",") if name.strip()]
+        if not requested:
+            return []
+
+        output = self.parameterAsOutputLayer(parameters, self.OUTPUT, context)
+        if not (os.path.isabs(output) and writers.is_geopackage(output)):
+            feedback.pushInfo(
+                "Dictionary encoding needs a GeoPackage file output; "
+                "writing values verbatim"
+            )
+            return []
+
+        text_fields = [
+            field.name() for field in fields if field.type() == QMetaType.Type.QString
+        ]
+        if "*" in requested:
+            return text_fields
+        for name in requested:
+            if name not in text_fields:
+                feedback.pushInfo(f"Not a text field, not encoded: {name}")
+        return [name for name in text_fields if name in requested]
+
+    def _build_overviews(self, output_path, crs, feedback):
+        feedback.pushInfo("Building overview layers...")
+        try:
+            tables = overviews.build_overviews(
+                output_path,
+                geographic=crs.isValid() and crs.isGeographic(),
+                progress=lambda fraction: feedback.setProgress(int(fraction * 100)),
+            )
+        except (OSError, RuntimeError) as e:
+            self._report_exception(feedback, "Failed to build overview layers", e)
+            return []
+        for table, scale, count in tables:
+            feedback.pushInfo(f"Overview 1:{scale}: {count} features in {table}")
+        return tables
+
+    def _add_overview_layers(
+        self,
+        base_layer,
+        output_path,
+        layer_name,
+        tables,
+        style_xml,
+        qml_path,
+        feedback,
+    ):
+        """Add the overview tables with scale-dependent visibility.
+
+        Every level shows from its own scale up to the next coarser one; the
+        ranges are stored in the base QML and as default styles of the
+        overview tables, so they also apply when the file is opened later.
+        """
+        ranges = overviews.scale_ranges([scale for _, scale, _ in tables])
+        names = {scale: table for table, scale, _ in tables}
+        sources = {}
+
+        for scale, min_scale, max_scale in ranges:
+            if scale is None:
+                layer = base_layer
+            else:
+                layer = QgsVectorLayer(
+                    f"{output_path}|layername={names[scale]}",
+                    f"{layer_name} (1:{scale})",
+                    "ogr",
+                )
+                if not layer.isValid():
+                    feedback.reportError(f"Could not load overview: {names[scale]}")
+                    continue
+                if style_xml:
+                    _import_style(layer, style_xml)
+
+            layer.setScaleBasedVisibility(True)
+            layer.setMinimumScale(min_scale)
+            layer.setMaximumScale(max_scale)
+
+            if scale is None:
+                if qml_path:
+                    layer.saveNamedStyle(qml_path)
+                continue
+            layer.saveStyleToDatabase(names[scale], "", True, "")
+            QgsProject.instance().addMapLayer(layer)
+            sources[scale] = layer.source()
+        return sources
+
+    def _export_vector_tiles(
+        self, layer, sources, tiles_path, layer_name, parameters, context, feedback
+    ):
+        """Write the layer (and its overviews) as MBTiles with a matching style."""
+        if not tiles_path.lower().endswith(".mbtiles"):
+            feedback.reportError(
+                f"Only MBTiles vector tile archives are supported: {tiles_path}"
+            )
             return None
 
-    def _crs_from_esri_spatial_ref(self, spatial_ref, feedback):
-        if not spatial_ref:
+        min_zoom = self.parameterAsInt(parameters, self.TILE_MIN_ZOOM, context)
+        max_zoom = self.parameterAsInt(parameters, self.TILE_MAX_ZOOM, context)
+        if min_zoom > max_zoom:
+            min_zoom, max_zoom = max_zoom, min_zoom
+
+        fields = None
+        tile_fields = self.parameterAsString(parameters, self.TILE_FIELDS, context)
+        if tile_fields.strip():
+            fields = {name.strip() for name in tile_fields.split(",") if name.strip()}
+            fields |= vector_tiles.style_attributes(layer)
+
+        tile_layer_name = os.path.splitext(os.path.basename(tiles_path))[0]
+        feedback.pushInfo(f"Writing vector tiles z{min_zoom}-z{max_zoom}: {tiles_path}")
+        try:
+            count = vector_tiles.export_mbtiles(
+                tiles_path,
+                sources,
+                tile_layer_name,
+                min_zoom,
+                max_zoom,
+                fields=fields,
+                feedback=feedback,
+            )
+        except (OSError, ValueError, sqlite3.Error) as e:
+            self._report_exception(feedback, "Failed to write vector tiles", e)
             return None
+        feedback.pushInfo(f"Wrote {count} vector tiles")
 
-        wkid = spatial_ref.get("latestWkid") or spatial_ref.get("wkid")
-        if wkid is not None:
-            esri_to_epsg = {
-                102100: 3857,
-                102113: 3857,
-            }
-            wkid = esri_to_epsg.get(wkid, wkid)
+        tile_layer = QgsVectorTileLayer(
+            f"type=mbtiles&url={tiles_path}", f"{layer_name} (tiles)"
+        )
+        if tile_layer.isValid():
+            tile_layer.setRenderer(vector_tiles.tile_renderer(layer, tile_layer_name))
+            base, _ = os.path.splitext(tiles_path)
+            tile_layer.saveNamedStyle(base + ".qml")
+            QgsProject.instance().addMapLayer(tile_layer)
+        return tiles_path
+
+    def _write_pipelined(
+        self, layer_url, layer_meta, fields, transform, sink, total, feedback
+    ):
+        """Download, decode and write features as overlapping stages.
+
+        Pages are fetched on a network thread, converted and reprojected on
+        worker threads and written on this thread, connected by bounded
+        queues. Returns the number of features written, or None on error.
+        """
+        geometry_type = layer_meta.get("geometryType", "")
+        has_z = bool(layer_meta.get("hasZ"))
+        has_m = bool(layer_meta.get("hasM"))
+        local = threading.local()
+        skipped = 0
+        processed = 0
 
-            if wkid is not None:
+        sizer = page_sizing.AdaptivePageSizer(esri_rest.max_record_count(layer_meta))
+
+        def fetch_pages():
+            for _, page in esri_rest.iter_query_pages(
+                layer_url, layer_meta, sizer=sizer
+            ):
+                yield page.get("features") or [], page.get("transform")
+
+        def decode(page):
+            items, quantization = page
+            # QgsCoordinateTransform is not thread safe; copy it per worker.
+            if transform is not None and not hasattr(local, "transform"):
+                local.transform = QgsCoordinateTransform(transform)
+            features = []
+            failed = 0
+            for item in items:
                 try:
-                    wkid_int = int(wkid)
-                    crs = QgsCoordinateReferenceSystem.fromEpsgId(wkid_int)
-                    if crs.isValid():
-                        return crs
-                except (ValueError, TypeError) as e:
-                    feedback.reportError(f"Invalid WKID format: {wkid} - {str(e)}")
-
-        wkt = spatial_ref.get("wkt") or spatial_ref.get("latestWkt")
-        if wkt:
-            crs = QgsCoordinateReferenceSystem()
-            if crs.createFromWkt(wkt):
-                return crs
+                    features.append(
+                        api.feature_from_esri(
+                            item,
+                            fields,
+                            geometry_type,
+                            has_z,
+                            has_m,
+                            getattr(local, "transform", None),
+                            quantization,
+                        )
+                    )
+                except QgsCsException:
+                    failed += 1
+            return features, failed
+
+        def write(decoded):
+            nonlocal processed, skipped
+            features, failed = decoded
+            skipped += failed
+            for feature in features:
+                sink.addFeature(feature, QgsFeatureSink.FastInsert)
+            processed += len(features)
+            if total > 0:
+                feedback.setProgress(int((processed / total) * 100))
 
-        return None
+        stages = pipeline.Pipeline(
+            fetch_pages(), decode, names=("network", "decode", "write")
+        )
+        try:
+            stages.run(write, feedback.isCanceled)
+        except (*esri_rest.REQUEST_ERRORS, RuntimeError) as e:
+            self._report_exception(feedback, "Failed to download features", e)
+            return None
+
+        if skipped:
+            feedback.pushInfo(f"Skipped {skipped} feature(s) due to transform errors")
+        for line in stages.summary():
+            feedback.pushInfo(f"Pipeline {line}")
+        feedback.pushInfo(sizer.summary())
+        return processed
+
+    def _create_sink(self, parameters, context, fields, wkb_type, crs, feedback):
+        """Return (sink, dest_id, is_streaming_writer) for the output parameter.
+
+        New GeoPackage (unless bulk loading is disabled), FlatGeobuf and
+        GeoParquet files are written through the writers module, and
+        temporary outputs through a SpillingSink; everything else uses the
+        Processing sink.
+        """
+        output = self.parameterAsOutputLayer(parameters, self.OUTPUT, context)
+        memory_limit = self.parameterAsDouble(parameters, self.MEMORY_LIMIT, context)
+
+        if writers.is_memory_output(output) and memory_limit > 0:
+            sink = writers.SpillingSink(
+                fields,
+                wkb_type,
+                crs,
+                context.transformContext(),
+                QgsProcessingUtils.generateTempFilename("output.gpkg", context),
+                int(memory_limit * 1024 * 1024),
+            )
+            return sink, None, True
+
+        writer_class = writers.writer_class(output)
+        if writers.is_geopackage(output) and not self.parameterAsBool(
+            parameters, self.BULK_LOAD, context
+        ):
+            writer_class = None
+
+        if writer_class is not None and os.path.isabs(output):
+            writer = writer_class(
+                output,
+                fields,
+                wkb_type,
+                crs,
+                context.transformContext(),
+            )
+            if not writer.hasError():
+                feedback.pushInfo(f"Streaming output with {writer.driver_name} writer")
+                return writer, output, True
+            feedback.pushInfo(
+                f"Streaming writer unavailable, using default writer: "
+                f"{writer.errorMessage()}"
+            )
+
+        (sink, dest_id) = self.parameterAsSink(
+            parameters,
+            self.OUTPUT,
+            context,
+            fields,
+            wkb_type,
+            crs,
+            QgsFeatureSink.SinkFlags(),
+        )
+        return sink, dest_id, False
+
+    def _create_mirror_vector_layer(self, layer_meta):
+        """Return an empty memory layer with the schema of a mirrored layer."""
+        if layer_meta.get("geometryType"):
+            wkb_type = api.wkb_type_from_esri(layer_meta)
+        else:
+            wkb_type = Qgis.WkbType.NoGeometry
+        layer = QgsVectorLayer(QgsWkbTypes.displayString(wkb_type), "temp", "memory")
+        layer.dataProvider().addAttributes(
+            api.fields_from_esri(layer_meta.get("fields")).toList()
+        )
+        layer.updateFields()
+
+        # The arcgisfeatureserver provider derives the renderer from the
+        # layer's drawingInfo; do the same so the saved style matches.
+        renderer_data = (layer_meta.get("drawingInfo") or {}).get("renderer")
+        if renderer_data:
+            renderer = QgsArcGisRestUtils.convertRenderer(renderer_data)
+            if renderer is not None:
+                layer.setRenderer(renderer)
+        return layer
+
+    def _mirror_features(self, page_paths, layer_meta, fields):
+        """Decode mirrored pages lazily, one page in memory at a time."""
+        geometry_type = layer_meta.get("geometryType", "")
+        has_z = bool(layer_meta.get("hasZ"))
+        has_m = bool(layer_meta.get("hasM"))
+        for page in mirror.read_pages(page_paths):
+            quantization = page.get("transform")
+            for item in page.get("features") or []:
+                yield api.feature_from_esri(
+                    item,
+                    fields,
+                    geometry_type,
+                    has_z,
+                    has_m,
+                    quantization=quantization,
+                )
+
+    def _export_style(self, vector_layer, dataset_key, feedback):
+        """Return the layer style as a QML document string, or None."""
+        doc = QDomDocument("qgis")
+        err = vector_layer.exportNamedStyle(doc)
+        if err:
+            feedback.reportError(f"Failed to export style: {err}")
+            return None
+        style_xml = doc.toString(2)
+        if dataset_key == "vg_50000":
+            from .style_converter import convert_rasterfill_xml
+
+            converted = convert_rasterfill_xml(style_xml)
+            if converted is not None:
+                feedback.pushInfo("Converted RasterFill to native symbols")
+                style_xml = converted
+        return style_xml
+
+    def _save_style_qml(self, style_xml, output_path, feedback):
+        base, _ = os.path.splitext(output_path)
+        qml_path = base + ".qml"
+        try:
+            with open(qml_path, "w", encoding="utf-8") as f:
+                f.write(style_xml)
+        except OSError as e:
+            feedback.reportError(f"Failed to save style to {qml_path}: {e}")
+            return None
+        feedback.pushInfo(f"Saved style file: {qml_path}")
+        return qml_path
 
     def shortHelpString(self):
         return self.tr(
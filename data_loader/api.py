@@ -0,0 +1,311 @@
+"""
+Scriptable access to MOE GeoPortal datasets.
+
+Streams features page by page without going through the Processing
+framework, so only one ``/query`` page is held in memory at a time::
+
+    from moe_geoportal_loader.data_loader import api
+
+    features = api.stream("vg_50000", pref_code="13", crs="EPSG:6677")
+    print(features.fields.names(), features.count())
+    for feature in features:
+        ...
+
+    # Raw Esri JSON, with a server-side filter and projection
+    anaguma = api.stream("anaguma", where="...", out_fields=["objectid"])
+    for item in anaguma.esri_features():
+        ...
+"""
+
+from __future__ import annotations
+
+from qgis.core import (
+    QgsArcGisRestUtils,
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransform,
+    QgsFeature,
+    QgsField,
+    QgsFields,
+    QgsGeometry,
+    QgsProject,
+    QgsRectangle,
+    QgsWkbTypes,
+)
+from qgis.PyQt.QtCore import QDate, QDateTime, QMetaType, Qt
+
+from . import esri_rest, esri_wkb
+from .catalog import resolve_dataset_url
+
+_ESRI_TO_EPSG = {
+    102100: 3857,
+    102113: 3857,
+}
+
+_FIELD_TYPES = {
+    "esriFieldTypeOID": QMetaType.Type.LongLong,
+    "esriFieldTypeSmallInteger": QMetaType.Type.Int,
+    "esriFieldTypeInteger": QMetaType.Type.Int,
+    "esriFieldTypeBigInteger": QMetaType.Type.LongLong,
+    "esriFieldTypeSingle": QMetaType.Type.Double,
+    "esriFieldTypeDouble": QMetaType.Type.Double,
+    "esriFieldTypeDate": QMetaType.Type.QDateTime,
+    "esriFieldTypeTimestampOffset": QMetaType.Type.QDateTime,
+    "esriFieldTypeDateOnly": QMetaType.Type.QDate,
+}
+
+
+def fetch_metadata(url: str):
+    """Return (layer_url, service_meta, layer_meta) for the first layer.
+
+    Raises:
+        esri_rest.RestError: If the service has no layers or answers an error.
+    """
+    service_meta = esri_rest.fetch_json(url)
+    layers = service_meta.get("layers") or []
+    if not layers:
+        raise esri_rest.RestError(f"No layers found in FeatureServer: {url}")
+
+    layer_url = f"{url}/{layers[0].get('id')}"
+    return layer_url, service_meta, esri_rest.fetch_json(layer_url)
+
+
+def crs_from_spatial_ref(spatial_ref, feedback=None):
+    """Convert an Esri spatialReference to a CRS, or None if unknown."""
+    if not spatial_ref:
+        return None
+
+    wkid = spatial_ref.get("latestWkid") or spatial_ref.get("wkid")
+    if wkid is not None:
+        wkid = _ESRI_TO_EPSG.get(wkid, wkid)
+        try:
+            crs = QgsCoordinateReferenceSystem.fromEpsgId(int(wkid))
+            if crs.isValid():
+                return crs
+        except (ValueError, TypeError) as e:
+            if feedback is not None:
+                feedback.reportError(f"Invalid WKID format: {wkid} - {e}")
+
+    wkt = spatial_ref.get("wkt") or spatial_ref.get("latestWkt")
+    if wkt:
+        crs = QgsCoordinateReferenceSystem()
+        if crs.createFromWkt(wkt):
+            return crs
+
+    return None
+
+
+def layer_crs(service_meta, layer_meta, feedback=None):
+    """Return the CRS declared by a layer, falling back to its service."""
+    extent_ref = (layer_meta.get("extent") or {}).get("spatialReference")
+    layer_ref = layer_meta.get("spatialReference")
+    service_ref = service_meta.get("spatialReference", {})
+    return crs_from_spatial_ref(extent_ref or layer_ref or service_ref, feedback)
+
+
+def extent_from_esri(envelope) -> QgsRectangle:
+    """Convert an Esri JSON envelope to a QgsRectangle; empty if missing."""
+    if not envelope or envelope.get("xmin") is None:
+        return QgsRectangle()
+    return QgsRectangle(
+        envelope["xmin"], envelope["ymin"], envelope["xmax"], envelope["ymax"]
+    )
+
+
+def fields_from_esri(esri_fields, out_fields=None) -> QgsFields:
+    """Build QgsFields from an Esri JSON ``fields`` list."""
+    keep = set(out_fields) if out_fields else None
+    fields = QgsFields()
+    for esri_field in esri_fields or []:
+        name = esri_field["name"]
+        if keep is not None and name not in keep:
+            continue
+        field_type = _FIELD_TYPES.get(esri_field.get("type"), QMetaType.Type.QString)
+        field = QgsField(name, field_type)
+        if esri_field.get("length"):
+            field.setLength(int(esri_field["length"]))
+        fields.append(field)
+    return fields
+
+
+def wkb_type_from_esri(layer_meta):
+    wkb_type = QgsArcGisRestUtils.convertGeometryType(
+        layer_meta.get("geometryType", "")
+    )
+    if layer_meta.get("hasZ"):
+        wkb_type = QgsWkbTypes.addZ(wkb_type)
+    if layer_meta.get("hasM"):
+        wkb_type = QgsWkbTypes.addM(wkb_type)
+    return wkb_type
+
+
+def convert_value(field: QgsField, value):
+    if value is None:
+        return None
+    if field.type() == QMetaType.Type.QDateTime:
+        return QDateTime.fromMSecsSinceEpoch(int(value), Qt.TimeSpec.UTC)
+    if field.type() == QMetaType.Type.QDate:
+        if isinstance(value, str):
+            return QDate.fromString(value, Qt.DateFormat.ISODate)
+        return QDateTime.fromMSecsSinceEpoch(int(value), Qt.TimeSpec.UTC).date()
+    return value
+
+
+def feature_from_esri(
+    item,
+    fields,
+    geometry_type,
+    has_z=False,
+    has_m=False,
+    transform=None,
+    quantization=None,
+):
+    """Convert an Esri JSON feature to a QgsFeature with ``fields``.
+
+    ``transform`` reprojects the geometry; ``quantization`` is the
+    ``transform`` object of a quantized ``/query`` page, if any.
+
+    Raises:
+        QgsCsException: If ``transform`` fails for the geometry.
+    """
+    feature = QgsFeature(fields)
+    attributes = item.get("attributes") or {}
+    feature.setAttributes([convert_value(f, attributes.get(f.name())) for f in fields])
+
+    if item.get("geometry"):
+        geometry = None
+        wkb = esri_wkb.encode(
+            item["geometry"], geometry_type, has_z, has_m, quantization
+        )
+        if wkb is not None:
+            geometry = QgsGeometry()
+            geometry.fromWkb(wkb)
+        else:
+            # Curves and anything else the encoder does not handle.
+            geom = QgsArcGisRestUtils.convertGeometry(
+                item["geometry"], geometry_type, has_m, has_z
+            )
+            if geom is not None:
+                geometry = QgsGeometry(geom)
+        if geometry is not None:
+            if transform is not None:
+                geometry.transform(transform)
+            feature.setGeometry(geometry)
+    return feature
+
+
+class FeatureStream:
+    """Lazily fetched features of the first layer of a FeatureServer.
+
+    Args:
+        url: FeatureServer URL.
+        where: SQL where clause evaluated by the server.
+        out_fields: Field names to request, or None for all fields.
+        bbox: Envelope filter as a QgsRectangle or (xmin, ymin, xmax, ymax).
+        bbox_crs: CRS of ``bbox``; defaults to the layer CRS.
+        crs: Output CRS; features are reprojected when it differs.
+        page_size: Records per request, capped by ``maxRecordCount``;
+            smaller pages are used after timeouts. Adaptive when None.
+    """
+
+    def __init__(
+        self,
+        url,
+        where="1=1",
+        out_fields=None,
+        bbox=None,
+        bbox_crs=None,
+        crs=None,
+        page_size=None,
+    ):
+        self.url = url
+        self.layer_url, self.service_meta, self.layer_meta = fetch_metadata(url)
+        self.source_crs = layer_crs(self.service_meta, self.layer_meta)
+        self.crs = QgsCoordinateReferenceSystem(crs) if crs else self.source_crs
+        self.out_fields = list(out_fields) if out_fields else None
+        self.fields = fields_from_esri(self.layer_meta.get("fields"), self.out_fields)
+        self.wkb_type = wkb_type_from_esri(self.layer_meta)
+        self.page_size = page_size
+
+        self.params = {"where": where or "1=1"}
+        if self.out_fields:
+            self.params["outFields"] = ",".join(self.out_fields)
+        if bbox is not None:
+            if isinstance(bbox, QgsRectangle):
+                bbox = (
+                    bbox.xMinimum(),
+                    bbox.yMinimum(),
+                    bbox.xMaximum(),
+                    bbox.yMaximum(),
+                )
+            self.params.update(
+                {
+                    "geometry": ",".join(str(v) for v in bbox),
+                    "geometryType": "esriGeometryEnvelope",
+                    "spatialRel": "esriSpatialRelIntersects",
+                }
+            )
+            bbox_crs = QgsCoordinateReferenceSystem(bbox_crs) if bbox_crs else None
+            if bbox_crs and bbox_crs.isValid() and bbox_crs.postgisSrid():
+                self.params["inSR"] = bbox_crs.postgisSrid()
+
+        self._transform = None
+        if (
+            self.source_crs is not None
+            and self.crs is not None
+            and self.crs.isValid()
+            and self.crs != self.source_crs
+        ):
+            self._transform = QgsCoordinateTransform(
+                self.source_crs, self.crs, QgsProject.instance().transformContext()
+            )
+
+    def count(self) -> int:
+        data = esri_rest.fetch_json(
+            f"{self.layer_url}/query", {**self.params, "returnCountOnly": "true"}
+        )
+        return int(data.get("count", 0))
+
+    def pages(self):
+        """Yield raw Esri JSON ``/query`` pages."""
+        for _, page in esri_rest.iter_query_pages(
+            self.layer_url, self.layer_meta, self.params, self.page_size
+        ):
+            yield page
+
+    def esri_features(self):
+        """Yield raw Esri JSON features."""
+        for page in self.pages():
+            yield from page.get("features") or []
+
+    def __iter__(self):
+        geometry_type = self.layer_meta.get("geometryType", "")
+        has_z = bool(self.layer_meta.get("hasZ"))
+        has_m = bool(self.layer_meta.get("hasM"))
+
+        for page in self.pages():
+            quantization = page.get("transform")
+            for item in page.get("features") or []:
+                yield feature_from_esri(
+                    item,
+                    self.fields,
+                    geometry_type,
+                    has_z,
+                    has_m,
+                    self._transform,
+                    quantization,
+                )
+
+
+def stream(dataset_key, pref_code=None, base_url=None, **kwargs) -> FeatureStream:
+    """Open a FeatureStream for a dataset of the catalog.
+
+    Keyword arguments are passed to FeatureStream.
+    """
+    return FeatureStream(
+        resolve_dataset_url(dataset_key, pref_code, base_url), **kwargs
+    )
+
+
+def iter_features(dataset_key, pref_code=None, **kwargs):
+    """Yield QgsFeatures of a dataset; see FeatureStream for the options."""
+    yield from stream(dataset_key, pref_code, **kwargs)
@@ -0,0 +1,380 @@
+"""
+Headless batch runner for the MOE GeoPortal loader.
+
+Reads a JSON (or YAML, if PyYAML is installed) job list and runs every job
+through the ``moe:moe_geoportal_loader`` Processing algorithm in a pool of
+standalone QGIS worker processes::
+
+    python -m data_loader.batch jobs.json --workers 4 --report report.json
+
+A job list is either a list of jobs or a mapping with ``defaults`` and
+``jobs``::
+
+    {
+      "defaults": {"crs": "EPSG:6677", "mirror_dir": "/srv/moe-mirror"},
+      "jobs": [
+        {"dataset": "vg_50000", "prefectures": ["13", "14"],
+         "output": "out/{dataset}_{pref_code}.gpkg"},
+        {"dataset": "anaguma", "output": "out/anaguma.gpkg"}
+      ]
+    }
+
+``prefectures`` may be ``"all"``. Workers share the mirror directory given
+in the jobs, so a mirrored service is read from disk by every worker.
+
+Before the workers start, every job is sized with ``data_loader.estimator``
+and the queue is ordered largest-first, so the longest downloads do not end
+up running alone at the tail of the batch. ``--no-estimate`` skips this.
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from multiprocessing import get_context
+
+from . import esri_rest, estimator
+from .catalog import resolve_dataset_url
+from .settings_datasets import DATASETS
+from .settings_prefecture import PREFECTURES
+
+ALGORITHM_ID = "moe:moe_geoportal_loader"
+DEFAULT_WORKERS = 2
+ESTIMATE_WORKERS = 8
+# What a job's future raises when its worker dies (BrokenProcessPool is a
+# RuntimeError), fails outside the algorithm or returns an unpicklable result.
+WORKER_ERRORS = (RuntimeError, OSError, TypeError, pickle.PickleError)
+
+_JOB_KEYS = {
+    "dataset",
+    "prefectures",
+    "output",
+    "crs",
+    "mirror_dir",
+    "base_url",
+    "repair_geometries",
+    "grid_size",
+}
+
+
+def load_jobs(path: str) -> list[dict]:
+    """Read and expand a job list file."""
+    with open(path, encoding="utf-8") as f:
+        if path.lower().endswith((".yaml", ".yml")):
+            try:
+                import yaml  # type: ignore[import-untyped]
+            except ImportError as e:
+                raise ValueError("PyYAML is required to read YAML job lists") from e
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    return expand_jobs(data)
+
+
+def expand_jobs(data) -> list[dict]:
+    """Expand a job list into one job per dataset and prefecture.
+
+    Raises:
+        ValueError: If a job is incomplete or refers to unknown data.
+    """
+    if isinstance(data, dict):
+        defaults = data.get("defaults") or {}
+        entries = data.get("jobs") or []
+    else:
+        defaults = {}
+        entries = data or []
+
+    jobs = []
+    for entry in entries:
+        job = {**defaults, **entry}
+        unknown = set(job) - _JOB_KEYS
+        if unknown:
+            raise ValueError(f"Unknown job keys: {', '.join(sorted(unknown))}")
+
+        dataset_key = job.get("dataset")
+        if dataset_key not in DATASETS:
+            raise ValueError(f"Unknown dataset: {dataset_key}")
+        if not job.get("output"):
+            raise ValueError(f"Job for {dataset_key} has no output")
+
+        if DATASETS[dataset_key]["has_prefecture"]:
+            pref_codes = job.get("prefectures") or []
+            if pref_codes == "all":
+                pref_codes = list(PREFECTURES)
+            if isinstance(pref_codes, str):
+                pref_codes = [pref_codes]
+            if not pref_codes:
+                raise ValueError(f"{dataset_key} requires prefectures")
+        else:
+            pref_codes = [None]
+
+        for code in pref_codes:
+            pref_code = None if code is None else f"{int(code):02d}"
+            if pref_code is not None and pref_code not in PREFECTURES:
+                raise ValueError(f"Unknown prefecture code: {pref_code}")
+            output = job["output"].format(
+                dataset=dataset_key, pref_code=pref_code or ""
+            )
+            jobs.append(
+                {
+                    "id": len(jobs),
+                    "dataset": dataset_key,
+                    "pref_code": pref_code,
+                    "output": output,
+                    "crs": job.get("crs"),
+                    "mirror_dir": job.get("mirror_dir"),
+                    "base_url": job.get("base_url"),
+                    "repair_geometries": bool(job.get("repair_geometries")),
+                    "grid_size": job.get("grid_size"),
+                }
+            )
+    return jobs
+
+
+def job_parameters(job: dict) -> dict:
+    """Translate a job into ``moe:moe_geoportal_loader`` parameters."""
+    parameters = {
+        "CATEGORY": list(DATASETS).index(job["dataset"]),
+        "OUTPUT": job["output"],
+    }
+    if job.get("pref_code"):
+        parameters["PREFECTURE"] = list(PREFECTURES).index(job["pref_code"])
+    if job.get("crs"):
+        parameters["CRS"] = job["crs"]
+    if job.get("mirror_dir"):
+        parameters["MIRROR_DIR"] = job["mirror_dir"]
+    if job.get("base_url"):
+        parameters["BASE_URL"] = job["base_url"]
+    if job.get("repair_geometries"):
+        parameters["REPAIR_GEOMETRIES"] = True
+    if job.get("grid_size"):
+        parameters["GRID_SIZE"] = job["grid_size"]
+    return parameters
+
+
+def estimate_jobs(jobs: list[dict], workers: int = ESTIMATE_WORKERS) -> None:
+    """Attach a download estimate to every job, or None if it failed."""
+
+    def _estimate(job):
+        url = resolve_dataset_url(job["dataset"], job["pref_code"], job.get("base_url"))
+        try:
+            return estimator.estimate_service(url)
+        except esri_rest.REQUEST_ERRORS:
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for job, estimate in zip(jobs, executor.map(_estimate, jobs)):
+            job["estimate"] = estimate
+
+
+def order_jobs(jobs: list[dict]) -> list[dict]:
+    """Order jobs largest-first by estimated bytes; unknown sizes go last."""
+    return sorted(
+        jobs,
+        key=lambda job: (
+            job.get("estimate") is None,
+            -((job.get("estimate") or {}).get("bytes") or 0),
+            job["id"],
+        ),
+    )
+
+
+def build_report(results: list[dict], workers: int, started: float) -> dict:
+    finished = time.time()
+    ok = [r for r in results if r["status"] == "ok"]
+    return {
+        "started": datetime.datetime.fromtimestamp(started).isoformat(),
+        "finished": datetime.datetime.fromtimestamp(finished).isoformat(),
+        "workers": workers,
+        "summary": {
+            "jobs": len(results),
+            "ok": len(ok),
+            "failed": len(results) - len(ok),
+            "wall_seconds": round(finished - started, 3),
+            "job_seconds": round(sum(r["seconds"] for r in results), 3),
+            "features": sum(r.get("features") or 0 for r in ok),
+            "bytes": sum(r.get("bytes") or 0 for r in ok),
+            "invalid_geometries": sum(r.get("invalid_geometries") or 0 for r in ok),
+        },
+        "jobs": sorted(results, key=lambda r: r["id"]),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Worker process
+# ---------------------------------------------------------------------------
+
+# Keeps the worker's QgsApplication alive for the life of the process.
+_worker = {}
+
+
+def _prefix_path() -> str:
+    """QGIS prefix of this process for the workers, or "" if not known here."""
+    try:
+        from qgis.core import QgsApplication
+    except ImportError:
+        return ""
+    return QgsApplication.prefixPath()
+
+
+def _init_worker(prefix_path):
+    from qgis.core import QgsApplication
+
+    # Without a prefix from the parent, QgsApplication finds its own
+    # (QGIS_PREFIX_PATH or the executable's location).
+    if prefix_path:
+        QgsApplication.setPrefixPath(prefix_path, True)
+    qgs_app = QgsApplication([], False)
+    qgs_app.initQgis()
+    _worker["app"] = qgs_app
+
+    # The processing plugin is not on sys.path outside the QGIS desktop.
+    plugins_dir = os.path.join(QgsApplication.pkgDataPath(), "python", "plugins")
+    if plugins_dir not in sys.path:
+        sys.path.append(plugins_dir)
+
+    from processing.core.Processing import Processing
+
+    from .provider import MOELoaderProvider
+
+    Processing.initialize()
+    QgsApplication.processingRegistry().addProvider(MOELoaderProvider())
+
+
+def _run_job(job: dict) -> dict:
+    import processing
+    from qgis.core import (
+        QgsProcessingException,
+        QgsProcessingFeedback,
+        QgsVectorLayer,
+    )
+
+    class _CollectingFeedback(QgsProcessingFeedback):
+        def __init__(self):
+            super().__init__()
+            self.errors = []
+
+        def reportError(self, error, fatalError=False):
+            self.errors.append(error)
+            super().reportError(error, fatalError)
+
+    result = {**job, "status": "failed", "error": None, "seconds": 0.0}
+    feedback = _CollectingFeedback()
+    start = time.perf_counter()
+    try:
+        outputs = processing.run(ALGORITHM_ID, job_parameters(job), feedback=feedback)
+        if outputs.get("OUTPUT"):
+            result["status"] = "ok"
+            for key in ("INVALID", "REPAIRED", "FAILED"):
+                if f"{key}_GEOMETRIES" in outputs:
+                    result[f"{key.lower()}_geometries"] = outputs[f"{key}_GEOMETRIES"]
+        else:
+            result["error"] = "; ".join(feedback.errors) or "No output produced"
+    except QgsProcessingException as e:
+        result["error"] = str(e)
+    result["seconds"] = round(time.perf_counter() - start, 3)
+
+    if result["status"] == "ok" and os.path.exists(job["output"]):
+        result["bytes"] = os.path.getsize(job["output"])
+        layer = QgsVectorLayer(job["output"], "output", "ogr")
+        if layer.isValid():
+            result["features"] = layer.featureCount()
+    return result
+
+
+def collect_results(futures: dict, log=print) -> list[dict]:
+    """Gather results as jobs finish.
+
+    Args:
+        futures: Mapping of future to its job.
+        log: Callable receiving one status line per job.
+
+    A job whose future raised gets a failed result, so one crashed worker
+    does not lose the results of the other jobs.
+    """
+    results = []
+    for future in as_completed(futures):
+        try:
+            result = future.result()
+        except WORKER_ERRORS as e:
+            job = futures[future]
+            result = {
+                **job,
+                "status": "failed",
+                "error": f"Worker failed: {e!r}",
+                "seconds": 0.0,
+            }
+        log(
+            f"{result['status']:>6}  {result['seconds']:8.1f}s  "
+            f"{result['dataset']} {result['pref_code'] or ''}".rstrip()
+        )
+        results.append(result)
+    return results
+
+
+def run_jobs(
+    jobs: list[dict],
+    workers: int = DEFAULT_WORKERS,
+    log=print,
+    estimate: bool = True,
+) -> dict:
+    """Run jobs across a pool of QGIS worker processes and return a report."""
+    started = time.time()
+    for job in jobs:
+        output_dir = os.path.dirname(os.path.abspath(job["output"]))
+        os.makedirs(output_dir, exist_ok=True)
+
+    if estimate:
+        estimate_jobs(jobs)
+        jobs = order_jobs(jobs)
+
+    with ProcessPoolExecutor(
+        max_workers=max(1, workers),
+        mp_context=get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(_prefix_path(),),
+    ) as executor:
+        futures = {executor.submit(_run_job, job): job for job in jobs}
+        results = collect_results(futures, log)
+
+    return build_report(results, workers, started)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Run MOE GeoPortal loader jobs in standalone QGIS workers."
+    )
+    parser.add_argument("jobs", help="JSON or YAML job list")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--report", help="Write the JSON report to this file")
+    parser.add_argument(
+        "--no-estimate",
+        action="store_true",
+        help="Run jobs in list order without estimating their size first",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        jobs = load_jobs(args.jobs)
+    except ValueError as e:
+        print(f"Invalid job list: {e}", file=sys.stderr)
+        return 2
+
+    report = run_jobs(jobs, args.workers, estimate=not args.no_estimate)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0 if report["summary"]["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Dataset catalog helpers.
+
+Resolves the FeatureServer URLs of the entries in ``settings_datasets``,
+expanding per-prefecture datasets over ``settings_prefecture``.
+"""
+
+from __future__ import annotations
+
+from .settings_datasets import DATASETS
+from .settings_prefecture import PREFECTURES
+
+DEFAULT_BASE_URL = "https://svr-moej.gisservice.jp/arcgis/rest/services"
+
+
+def resolve_pref_code(dataset_key: str, pref_code: str) -> str:
+    # Handle specific URL for Hokkaido
+    if dataset_key == "vg_50000" and pref_code == "01":
+        return f"{pref_code}_0420"
+    return pref_code
+
+
+def resolve_dataset_url(
+    dataset_key: str, pref_code: str | None = None, base_url: str | None = None
+) -> str:
+    """Return the FeatureServer URL of a dataset.
+
+    ``base_url`` replaces the MOE GeoPortal services root, e.g. to use a
+    LAN mirror served by ``data_loader.mirror_server``.
+
+    Raises:
+        KeyError: If the dataset key is unknown.
+        ValueError: If a per-prefecture dataset is given no prefecture code.
+    """
+    dataset = DATASETS[dataset_key]
+    url = dataset["url"]
+    if dataset["has_prefecture"]:
+        if pref_code is None:
+            raise ValueError(f"{dataset_key} requires a prefecture code")
+        url = url.format(pref_code=resolve_pref_code(dataset_key, pref_code))
+    if base_url and url.startswith(DEFAULT_BASE_URL):
+        url = base_url.rstrip("/") + url[len(DEFAULT_BASE_URL) :]
+    return url
+
+
+def iter_dataset_urls(dataset_keys=None, base_url=None):
+    """Yield (dataset_key, pref_code, url) for every service in the catalog.
+
+    ``pref_code`` is None for datasets that are not split by prefecture.
+    ``base_url`` is passed on to ``resolve_dataset_url``.
+    """
+    for dataset_key, dataset in DATASETS.items():
+        if dataset_keys and dataset_key not in dataset_keys:
+            continue
+        if dataset["has_prefecture"]:
+            for pref_code in PREFECTURES:
+                yield (
+                    dataset_key,
+                    pref_code,
+                    resolve_dataset_url(dataset_key, pref_code, base_url),
+                )
+        else:
+            yield dataset_key, None, resolve_dataset_url(dataset_key, None, base_url)
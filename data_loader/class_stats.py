@@ -0,0 +1,105 @@
+"""
+Per-class statistics collected while features are written.
+
+``StatisticsSink`` sits in the output sink chain and feeds every feature
+into one ``ClassStatistics`` per chosen attribute: feature count, total
+(ellipsoidal) area and bounding box per attribute value. The results are
+written as a CSV next to the output, so no second pass over the data is
+needed.
+"""
+
+from __future__ import annotations
+
+import csv
+import math
+
+CSV_COLUMNS = ("field", "value", "count", "area_m2", "xmin", "ymin", "xmax", "ymax")
+
+
+def _is_null(value) -> bool:
+    return value is None or (hasattr(value, "isNull") and value.isNull())
+
+
+class ClassStatistics:
+    """Running count, area and bbox per value of one attribute."""
+
+    def __init__(self, field: str):
+        self.field = field
+        self._classes: dict = {}
+
+    def add(self, value, area: float = 0.0, bbox=None) -> None:
+        """Add one feature; ``bbox`` is (xmin, ymin, xmax, ymax) or None."""
+        key = None if _is_null(value) else value
+        entry = self._classes.get(key)
+        if entry is None:
+            entry = [0, 0.0, math.inf, math.inf, -math.inf, -math.inf]
+            self._classes[key] = entry
+        entry[0] += 1
+        if area and not math.isnan(area):
+            entry[1] += area
+        if bbox is not None:
+            entry[2] = min(entry[2], bbox[0])
+            entry[3] = min(entry[3], bbox[1])
+            entry[4] = max(entry[4], bbox[2])
+            entry[5] = max(entry[5], bbox[3])
+
+    def __len__(self) -> int:
+        return len(self._classes)
+
+    def rows(self) -> list[dict]:
+        """One dict per class (keys ``CSV_COLUMNS``), largest area first."""
+        rows = []
+        for value, (count, area, xmin, ymin, xmax, ymax) in self._classes.items():
+            has_bbox = xmin <= xmax
+            rows.append(
+                {
+                    "field": self.field,
+                    "value": value,
+                    "count": count,
+                    "area_m2": area,
+                    "xmin": xmin if has_bbox else None,
+                    "ymin": ymin if has_bbox else None,
+                    "xmax": xmax if has_bbox else None,
+                    "ymax": ymax if has_bbox else None,
+                }
+            )
+        rows.sort(key=lambda row: (-row["area_m2"], -row["count"], str(row["value"])))
+        return rows
+
+
+def write_csv(path: str, statistics) -> int:
+    """Write the rows of several ClassStatistics to one CSV; returns rows."""
+    written = 0
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        for stats in statistics:
+            for row in stats.rows():
+                row["area_m2"] = round(row["area_m2"], 2)
+                writer.writerow(row)
+                written += 1
+    return written
+
+
+class StatisticsSink:
+    """Sink wrapper accumulating ClassStatistics for passing features.
+
+    Args:
+        sink: The sink that receives the features unchanged.
+        statistics: Mapping of attribute index to ClassStatistics.
+        measure: Callable ``feature -> (area, bbox)``; bbox may be None.
+    """
+
+    def __init__(self, sink, statistics: dict, measure):
+        self.sink = sink
+        self.statistics = statistics
+        self.measure = measure
+
+    def addFeature(self, feature, flags=None) -> bool:
+        area, bbox = self.measure(feature)
+        attributes = feature.attributes()
+        for index, stats in self.statistics.items():
+            stats.add(attributes[index], area, bbox)
+        if flags is None:
+            return self.sink.addFeature(feature)
+        return self.sink.addFeature(feature, flags)
@@ -0,0 +1,233 @@
+"""
+Dictionary encoding of repetitive text attributes.
+
+Vegetation layers repeat long class names on every row. With encoding
+enabled the selected text fields are written as integer codes, assigned on
+the fly by ``DictionaryEncoder`` while features stream into the output.
+Afterwards every field gets a lookup table ``<layer>_<field>`` in the
+GeoPackage, and a ``<layer>_decoded`` view joins them back for reading.
+``recode_style`` rewrites categorized renderers to the codes, so the
+encoded layer and its overviews render as before. Other style elements
+using an encoded field (rule filters, graduated renderers, labels, data
+defined properties) are not rewritten; ``unrecoded_references`` lists them
+so they can be reported.
+"""
+
+from __future__ import annotations
+
+import re
+import sqlite3
+import xml.etree.ElementTree as ET
+
+
+def _is_null(value) -> bool:
+    return value is None or (hasattr(value, "isNull") and value.isNull())
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class DictionaryEncoder:
+    """Assign integer codes (from 1) to the values of several fields."""
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.codes: dict[str, dict[str, int]] = {name: {} for name in self.names}
+        self.encoded_bytes = 0
+
+    def encode(self, name: str, value):
+        """Return the code of ``value`` in field ``name``; NULL stays None."""
+        if _is_null(value):
+            return None
+        value = str(value)
+        codes = self.codes[name]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes) + 1
+        self.encoded_bytes += len(value.encode())
+        return code
+
+    def lookup(self, name: str) -> list[tuple[int, str]]:
+        return [(code, value) for value, code in self.codes[name].items()]
+
+    def distinct_values(self) -> int:
+        return sum(len(codes) for codes in self.codes.values())
+
+
+class EncodingSink:
+    """Sink wrapper replacing the encoded attributes by their codes.
+
+    Args:
+        sink: The sink that receives the features; its fields must declare
+            the encoded fields as integers.
+        encoder: The DictionaryEncoder collecting the codes.
+        indexes: Mapping of attribute index to encoded field name.
+    """
+
+    def __init__(self, sink, encoder: DictionaryEncoder, indexes: dict):
+        self.sink = sink
+        self.encoder = encoder
+        self.indexes = indexes
+
+    def addFeature(self, feature, flags=None) -> bool:
+        attributes = feature.attributes()
+        for index, name in self.indexes.items():
+            attributes[index] = self.encoder.encode(name, attributes[index])
+        feature.setAttributes(attributes)
+        if flags is None:
+            return self.sink.addFeature(feature)
+        return self.sink.addFeature(feature, flags)
+
+
+def lookup_table_name(table: str, field: str) -> str:
+    return f"{table}_{field}"
+
+
+def write_lookup_tables(path: str, encoder: DictionaryEncoder, table=None) -> str:
+    """Store the lookup tables and a decoding view in a GeoPackage.
+
+    Args:
+        path: GeoPackage holding the encoded layer.
+        encoder: The encoder used while writing it.
+        table: Encoded feature table; defaults to the first one.
+
+    Returns:
+        Name of the ``<table>_decoded`` view, registered as a feature layer.
+    """
+    with sqlite3.connect(path) as conn:
+        if table is None:
+            row = conn.execute(
+                "SELECT table_name FROM gpkg_contents WHERE data_type = 'features' "
+                "ORDER BY rowid LIMIT 1"
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"No feature table in {path}")
+            table = row[0]
+
+        joins = {}
+        for index, name in enumerate(encoder.names):
+            lookup = lookup_table_name(table, name)
+            conn.execute(f"DROP TABLE IF EXISTS {_quote(lookup)}")
+            conn.execute(
+                f"CREATE TABLE {_quote(lookup)} "
+                "(code INTEGER PRIMARY KEY, value TEXT NOT NULL)"
+            )
+            conn.executemany(
+                f"INSERT INTO {_quote(lookup)} (code, value) VALUES (?, ?)",
+                encoder.lookup(name),
+            )
+            conn.execute("DELETE FROM gpkg_contents WHERE table_name = ?", (lookup,))
+            conn.execute(
+                "INSERT INTO gpkg_contents (table_name, data_type, identifier) "
+                "VALUES (?, 'attributes', ?)",
+                (lookup, lookup),
+            )
+            joins[name] = (f"l{index}", lookup)
+
+        columns = [
+            row[1] for row in conn.execute(f"PRAGMA table_info({_quote(table)})")
+        ]
+        select = []
+        for column in columns:
+            if column in joins:
+                alias = joins[column][0]
+                select.append(f"{alias}.value AS {_quote(column)}")
+            else:
+                select.append(f"t.{_quote(column)}")
+        join_sql = "".join(
+            f" LEFT JOIN {_quote(lookup)} {alias} ON {alias}.code = t.{_quote(name)}"
+            for name, (alias, lookup) in joins.items()
+        )
+
+        view = f"{table}_decoded"
+        conn.execute(f"DROP VIEW IF EXISTS {_quote(view)}")
+        conn.execute(
+            f"CREATE VIEW {_quote(view)} AS SELECT {', '.join(select)} "
+            f"FROM {_quote(table)} t{join_sql}"
+        )
+        conn.execute("DELETE FROM gpkg_geometry_columns WHERE table_name = ?", (view,))
+        conn.execute("DELETE FROM gpkg_contents WHERE table_name = ?", (view,))
+        conn.execute(
+            "INSERT INTO gpkg_contents (table_name, data_type, identifier, "
+            "min_x, min_y, max_x, max_y, srs_id) "
+            "SELECT ?, 'features', ?, min_x, min_y, max_x, max_y, srs_id "
+            "FROM gpkg_contents WHERE table_name = ?",
+            (view, view, table),
+        )
+        conn.execute(
+            "INSERT INTO gpkg_geometry_columns "
+            "(table_name, column_name, geometry_type_name, srs_id, z, m) "
+            "SELECT ?, column_name, geometry_type_name, srs_id, z, m "
+            "FROM gpkg_geometry_columns WHERE table_name = ?",
+            (view, table),
+        )
+    return view
+
+
+def recode_style(xml: str, encoder: DictionaryEncoder) -> str:
+    """Point categorized renderers on encoded fields at the codes.
+
+    Category values are replaced by their codes (values only in the legend
+    get codes too); labels are kept. Other renderers are left unchanged.
+    """
+    root = ET.fromstring(xml)
+    changed = False
+    for renderer in root.iter("renderer-v2"):
+        if renderer.get("type") != "categorizedSymbol":
+            continue
+        attr = renderer.get("attr", "").strip('"')
+        if attr not in encoder.codes:
+            continue
+        for category in renderer.iter("category"):
+            value = category.get("value", "")
+            if value:
+                category.set("value", str(encoder.encode(attr, value)))
+                changed = True
+    if not changed:
+        return xml
+
+    doctype = ""
+    if xml.lstrip().startswith("<!DOCTYPE"):
+        doctype = xml.lstrip().split(">", 1)[0] + ">\n"
+    return doctype + ET.tostring(root, encoding="unicode")
+
+
+def _uses_field(expression: str, name: str) -> bool:
+    escaped = re.escape(name)
+    # The field quoted as a column, or as a bare word outside strings and calls.
+    pattern = rf'"{escaped}"|(?<![\w."\']){escaped}(?![\w"\'(])'
+    return re.search(pattern, expression) is not None
+
+
+def unrecoded_references(xml: str, names) -> list[str]:
+    """Describe the style elements using ``names`` that ``recode_style`` skips.
+
+    Expressions are matched textually: a field counts as used when it
+    appears quoted or as a bare identifier.
+    """
+    root = ET.fromstring(xml)
+    references = []
+
+    def check(kind, expression):
+        if not expression:
+            return
+        for name in names:
+            if _uses_field(expression, name):
+                references.append(f"{kind} ({name}): {expression}")
+
+    for renderer in root.iter("renderer-v2"):
+        renderer_type = renderer.get("type")
+        attr = renderer.get("attr", "")
+        if renderer_type == "graduatedSymbol":
+            check("graduated renderer", attr)
+        elif renderer_type == "categorizedSymbol" and attr.strip('"') not in names:
+            check("categorized renderer expression", attr)
+    for rule in root.iter("rule"):
+        check("rule filter", rule.get("filter"))
+    for text_style in root.iter("text-style"):
+        check("label", text_style.get("fieldName"))
+    for option in root.iter("Option"):
+        if option.get("name") == "expression":
+            check("data defined property", option.get("value"))
+    return references
@@ -0,0 +1,237 @@
+"""
+Minimal ArcGIS REST client.
+
+Only the Python standard library is used, so these helpers work in headless
+scripts as well as inside QGIS.
+"""
+
+from __future__ import annotations
+
+import http.client
+import json
+import re
+import time
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+from .page_sizing import START_PAGE_SIZE, AdaptivePageSizer
+
+DEFAULT_TIMEOUT = 120
+DEFAULT_MAX_RECORD_COUNT = 1000
+
+
+class RestError(Exception):
+    """Raised when the server answers with an ArcGIS error document."""
+
+    def __init__(self, message: str, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+# What a failed request can raise: network and HTTP errors (OSError),
+# undecodable responses (ValueError) and ArcGIS error documents.
+REQUEST_ERRORS = (OSError, ValueError, http.client.HTTPException, RestError)
+
+
+def build_url(url: str, params: dict | None = None) -> str:
+    query = {"f": "json"}
+    query.update(params or {})
+    return f"{url}?{urlencode(query)}"
+
+
+def fetch_bytes(url: str, params: dict | None = None, timeout=DEFAULT_TIMEOUT) -> bytes:
+    full_url = build_url(url, params)
+    if not full_url.startswith(("https://", "http://")):
+        raise ValueError(f"Unsupported URL scheme: {url}")
+    with urlopen(full_url, timeout=timeout) as response:  # nosec B310 - scheme validated above
+        return response.read()
+
+
+def parse_json(raw: bytes) -> dict:
+    data = json.loads(raw.decode())
+    if isinstance(data, dict) and "error" in data:
+        error = data["error"] or {}
+        raise RestError(
+            f"{error.get('code', '')} {error.get('message', '')}".strip(),
+            error.get("code"),
+        )
+    return data
+
+
+def fetch_json(url: str, params: dict | None = None, timeout=DEFAULT_TIMEOUT) -> dict:
+    return parse_json(fetch_bytes(url, params, timeout))
+
+
+def object_id_field(layer_meta: dict) -> str:
+    if layer_meta.get("objectIdField"):
+        return layer_meta["objectIdField"]
+    for field in layer_meta.get("fields") or []:
+        if field.get("type") == "esriFieldTypeOID":
+            return field["name"]
+    return "objectid"
+
+
+def service_entries(service_meta: dict) -> list[dict]:
+    """Layers followed by tables of a FeatureServer, each with a ``kind``."""
+    entries = []
+    for kind in ("layers", "tables"):
+        for entry in service_meta.get(kind) or []:
+            entries.append({**entry, "kind": kind[:-1]})
+    return entries
+
+
+def table_names(entries) -> list[str]:
+    """Unique output table names for service entries, from their names."""
+    names = []
+    used = set()
+    for entry in entries:
+        base = re.sub(r"[^\w]+", "_", entry.get("name") or "").strip("_")
+        base = base or f"{entry.get('kind', 'layer')}_{entry.get('id')}"
+        name = base
+        suffix = 2
+        while name.lower() in used:
+            name = f"{base}_{suffix}"
+            suffix += 1
+        used.add(name.lower())
+        names.append(name)
+    return names
+
+
+def supports_pagination(layer_meta: dict) -> bool:
+    capabilities = layer_meta.get("advancedQueryCapabilities") or {}
+    return bool(capabilities.get("supportsPagination"))
+
+
+def max_record_count(layer_meta: dict) -> int:
+    return int(layer_meta.get("maxRecordCount") or DEFAULT_MAX_RECORD_COUNT)
+
+
+def query_count(layer_url: str, where: str = "1=1", timeout=DEFAULT_TIMEOUT) -> int:
+    data = fetch_json(
+        f"{layer_url}/query",
+        {"where": where, "returnCountOnly": "true"},
+        timeout,
+    )
+    return int(data.get("count", 0))
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether a failed request may succeed again, e.g. with a smaller page."""
+    if isinstance(error, HTTPError):
+        return error.code >= 500
+    if isinstance(error, RestError):
+        return isinstance(error.code, int) and error.code >= 500
+    return isinstance(error, (TimeoutError, URLError))
+
+
+def _fetch_sized_page(query_url, build_params, sizer, timeout):
+    """Fetch one page at the sizer's size, retrying smaller on failure.
+
+    Returns (raw_bytes, page, size).
+    """
+    while True:
+        size = sizer.size
+        started = time.monotonic()
+        try:
+            raw = fetch_bytes(query_url, build_params(size), timeout)
+            page = parse_json(raw)
+        except REQUEST_ERRORS as e:
+            if not is_transient(e) or not sizer.failure():
+                raise
+            continue
+        sizer.record(
+            len(page.get("features") or []), time.monotonic() - started, len(raw)
+        )
+        return raw, page, size
+
+
+def iter_query_pages(
+    layer_url: str,
+    layer_meta: dict,
+    params: dict | None = None,
+    page_size: int | None = None,
+    timeout=DEFAULT_TIMEOUT,
+    sizer: AdaptivePageSizer | None = None,
+):
+    """Yield (raw_bytes, page) for successive ``/query`` pages of a layer.
+
+    Layers that support pagination are read with ``resultOffset``; others
+    are read in chunks of object IDs. At least one page is always yielded
+    so callers can read the field schema of empty layers.
+
+    Page sizes are chosen by ``sizer``, by default an AdaptivePageSizer
+    limited to ``maxRecordCount`` (and to ``page_size`` if given). Pass a
+    sizer to read its ``summary()`` afterwards.
+    """
+    base = {"where": "1=1", "outFields": "*", "returnGeometry": "true"}
+    base.update(params or {})
+    if sizer is None:
+        limit = min(
+            page_size or max_record_count(layer_meta), max_record_count(layer_meta)
+        )
+        sizer = AdaptivePageSizer(limit, start=page_size or START_PAGE_SIZE)
+    query_url = f"{layer_url}/query"
+
+    if supports_pagination(layer_meta):
+        offset = 0
+        while True:
+            raw, page, size = _fetch_sized_page(
+                query_url,
+                lambda size, offset=offset: {
+                    **base,
+                    "orderByFields": object_id_field(layer_meta),
+                    "resultOffset": offset,
+                    "resultRecordCount": size,
+                },
+                sizer,
+                timeout,
+            )
+            yield raw, page
+
+            features = page.get("features") or []
+            offset += len(features)
+            if not features:
+                break
+            if not page.get("exceededTransferLimit") and len(features) < size:
+                break
+        return
+
+    ids_page = fetch_json(
+        query_url, {"where": base["where"], "returnIdsOnly": "true"}, timeout
+    )
+    object_ids = sorted(ids_page.get("objectIds") or [])
+    if not object_ids:
+        raw = fetch_bytes(query_url, {**base, "where": "1=0"}, timeout)
+        yield raw, parse_json(raw)
+        return
+
+    start = 0
+    while start < len(object_ids):
+        raw, page, size = _fetch_sized_page(
+            query_url,
+            lambda size, start=start: {
+                **base,
+                "objectIds": ",".join(
+                    str(oid) for oid in object_ids[start : start + size]
+                ),
+            },
+            sizer,
+            timeout,
+        )
+        yield raw, page
+        start += size
+
+
+def statistics_params(
+    out_statistics: list[dict], group_by=(), where: str = "1=1"
+) -> dict:
+    """``/query`` parameters for server-side statistics without geometries."""
+    params = {
+        "where": where,
+        "outStatistics": json.dumps(out_statistics),
+        "returnGeometry": "false",
+    }
+    if group_by:
+        params["groupByFieldsForStatistics"] = ",".join(group_by)
+    return params
@@ -0,0 +1,259 @@
+"""
+Direct Esri JSON geometry to WKB encoder.
+
+Coordinates are copied from the Esri JSON lists into ``array('d')`` buffers
+and written as ISO WKB, without building QGIS point or ring objects per
+vertex. Polygon rings are classified by orientation (clockwise rings are
+exteriors, counter-clockwise rings are holes, as in the Esri model) and
+holes are assigned to the exterior that contains them.
+
+Responses requested with ``quantizationParameters`` carry delta encoded
+integer coordinates and a ``transform``; pass it to ``encode`` to decode
+them on the way.
+
+The output matches ``QgsArcGisRestUtils.convertGeometry``: polygons become
+MultiPolygon, polylines MultiLineString, points Point and multipoints
+MultiPoint.
+"""
+
+from __future__ import annotations
+
+import math
+import struct
+import sys
+from array import array
+from itertools import accumulate, chain
+from operator import mul
+
+WKB_POINT = 1
+WKB_MULTIPOINT = 4
+WKB_MULTILINESTRING = 5
+WKB_MULTIPOLYGON = 6
+WKB_LINESTRING = 2
+WKB_POLYGON = 3
+
+_HEADER = struct.Struct("<BI")
+_COUNT = struct.Struct("<I")
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def wkb_type(base: int, has_z=False, has_m=False) -> int:
+    """Return the ISO WKB type code for a base type and dimensions."""
+    return base + (1000 if has_z else 0) + (2000 if has_m else 0)
+
+
+def _dimension(has_z, has_m) -> int:
+    return 2 + bool(has_z) + bool(has_m)
+
+
+def dequantize(parts, transform):
+    """Decode delta encoded quantized parts to real coordinates.
+
+    Args:
+        parts: List of parts, each a list of [dx, dy, ...] integer offsets
+            where the first vertex is absolute. Z and M values are not
+            quantized and are kept as they are.
+        transform: The ``transform`` object of the query response.
+    """
+    sx, sy = transform["scale"][:2]
+    tx, ty = transform["translate"][:2]
+    sign = -1 if transform.get("originPosition", "upperLeft") == "upperLeft" else 1
+
+    decoded = []
+    for part in parts:
+        xs = accumulate(pt[0] for pt in part)
+        ys = accumulate(pt[1] for pt in part)
+        decoded.append(
+            [
+                [tx + x * sx, ty + sign * y * sy, *pt[2:]]
+                for x, y, pt in zip(xs, ys, part)
+            ]
+        )
+    return decoded
+
+
+def _ordinates(pt, dim) -> list:
+    values = (list(pt) + [0.0] * dim)[:dim]
+    return [math.nan if value is None else value for value in values]
+
+
+def _flatten(part, dim) -> array:
+    try:
+        flat = array("d", chain.from_iterable(part))
+    except TypeError:
+        # Null Z or M ordinates; they become NaN below.
+        flat = None
+    if flat is None or len(flat) != dim * len(part):
+        # Vertices carry more (or fewer) ordinates than the layer declares.
+        flat = array("d", chain.from_iterable(_ordinates(pt, dim) for pt in part))
+    return flat
+
+
+def _to_bytes(flat: array) -> bytes:
+    if not _LITTLE_ENDIAN:
+        flat = array("d", flat)
+        flat.byteswap()
+    return flat.tobytes()
+
+
+def signed_area(flat: array, dim: int = 2) -> float:
+    """Shoelace area of a flattened ring; negative for clockwise rings."""
+    xs = flat[0::dim]
+    ys = flat[1::dim]
+    if len(xs) < 3:
+        return 0.0
+    return (sum(map(mul, xs, ys[1:] + ys[:1])) - sum(map(mul, ys, xs[1:] + xs[:1]))) / 2
+
+
+def _bbox(flat: array, dim: int):
+    xs = flat[0::dim]
+    ys = flat[1::dim]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _contains(flat: array, dim: int, x: float, y: float) -> bool:
+    """Ray casting point-in-ring test."""
+    xs = flat[0::dim]
+    ys = flat[1::dim]
+    inside = False
+    j = len(xs) - 1
+    for i in range(len(xs)):
+        if (ys[i] > y) != (ys[j] > y) and x < (xs[j] - xs[i]) * (y - ys[i]) / (
+            ys[j] - ys[i]
+        ) + xs[i]:
+            inside = not inside
+        j = i
+    return inside
+
+
+def _ring_bytes(flat: array, dim: int) -> bytes:
+    return _COUNT.pack(len(flat) // dim) + _to_bytes(flat)
+
+
+def _polygons(rings, dim):
+    """Group rings into [exterior, holes...] lists by orientation."""
+    polygons = []
+    holes = []
+    for ring in rings:
+        if len(ring) < 3:
+            continue
+        flat = _flatten(ring, dim)
+        area = signed_area(flat, dim)
+        if area <= 0:
+            polygons.append([flat])
+        else:
+            holes.append(flat)
+
+    if not polygons:
+        # No clockwise ring: treat every ring as an exterior.
+        return [[hole] for hole in holes]
+
+    bboxes = [_bbox(polygon[0], dim) for polygon in polygons]
+    for hole in holes:
+        x, y = hole[0], hole[1]
+        owner = None
+        for index in range(len(polygons) - 1, -1, -1):
+            xmin, ymin, xmax, ymax = bboxes[index]
+            if not (xmin <= x <= xmax and ymin <= y <= ymax):
+                continue
+            if len(polygons) == 1 or _contains(polygons[index][0], dim, x, y):
+                owner = index
+                break
+        if owner is None:
+            polygons.append([hole])
+            bboxes.append(_bbox(hole, dim))
+        else:
+            polygons[owner].append(hole)
+    return polygons
+
+
+def encode(
+    geometry: dict | None,
+    geometry_type: str,
+    has_z=False,
+    has_m=False,
+    transform: dict | None = None,
+) -> bytes | None:
+    """Encode an Esri JSON geometry as ISO WKB.
+
+    Args:
+        geometry: Esri JSON geometry.
+        geometry_type: Layer geometry type, e.g. ``esriGeometryPolygon``.
+        has_z: Whether vertices carry Z values.
+        has_m: Whether vertices carry M values.
+        transform: Quantization ``transform`` of the response, if any.
+
+    Returns:
+        WKB bytes, or None for empty or unsupported geometries (e.g. curves).
+    """
+    if not geometry:
+        return None
+    dim = _dimension(has_z, has_m)
+
+    if geometry_type == "esriGeometryPolygon":
+        rings = geometry.get("rings")
+        if not rings:
+            return None
+        if transform:
+            rings = dequantize(rings, transform)
+        polygons = _polygons(rings, dim)
+        chunks = [
+            _HEADER.pack(1, wkb_type(WKB_MULTIPOLYGON, has_z, has_m)),
+            _COUNT.pack(len(polygons)),
+        ]
+        part_type = wkb_type(WKB_POLYGON, has_z, has_m)
+        for polygon in polygons:
+            chunks.append(_HEADER.pack(1, part_type))
+            chunks.append(_COUNT.pack(len(polygon)))
+            chunks.extend(_ring_bytes(ring, dim) for ring in polygon)
+        return b"".join(chunks)
+
+    if geometry_type == "esriGeometryPolyline":
+        paths = geometry.get("paths")
+        if not paths:
+            return None
+        if transform:
+            paths = dequantize(paths, transform)
+        part_type = wkb_type(WKB_LINESTRING, has_z, has_m)
+        chunks = [
+            _HEADER.pack(1, wkb_type(WKB_MULTILINESTRING, has_z, has_m)),
+            _COUNT.pack(len(paths)),
+        ]
+        for path in paths:
+            chunks.append(_HEADER.pack(1, part_type))
+            chunks.append(_ring_bytes(_flatten(path, dim), dim))
+        return b"".join(chunks)
+
+    if geometry_type == "esriGeometryPoint":
+        if geometry.get("x") is None or geometry.get("y") is None:
+            return None
+        values = [geometry["x"], geometry["y"]]
+        if transform:
+            values = dequantize([[values]], transform)[0][0]
+        if has_z:
+            values.append(geometry.get("z"))
+        if has_m:
+            values.append(geometry.get("m"))
+        values = [math.nan if value is None else value for value in values]
+        point_type = wkb_type(WKB_POINT, has_z, has_m)
+        return _HEADER.pack(1, point_type) + _to_bytes(array("d", values))
+
+    if geometry_type == "esriGeometryMultipoint":
+        points = geometry.get("points")
+        if not points:
+            return None
+        if transform:
+            points = dequantize([points], transform)[0]
+        part_type = wkb_type(WKB_POINT, has_z, has_m)
+        data = _to_bytes(_flatten(points, dim))
+        size = 8 * dim
+        chunks = [
+            _HEADER.pack(1, wkb_type(WKB_MULTIPOINT, has_z, has_m)),
+            _COUNT.pack(len(points)),
+        ]
+        for index in range(len(points)):
+            chunks.append(_HEADER.pack(1, part_type))
+            chunks.append(data[index * size : (index + 1) * size])
+        return b"".join(chunks)
+
+    return None
@@ -0,0 +1,158 @@
+"""
+Pre-download size and time estimates for FeatureServer layers.
+
+Uses ``returnCountOnly`` and ``returnExtentOnly`` queries plus one sampled
+page to extrapolate the feature count, transfer size, vertex density and
+expected duration at the bandwidth measured for the sample, without
+downloading the layer.
+"""
+
+from __future__ import annotations
+
+import time
+
+from . import esri_rest, page_sizing
+
+DEFAULT_SAMPLE_SIZE = 200
+
+
+def count_vertices(geometry: dict | None) -> int:
+    if not geometry:
+        return 0
+    if "x" in geometry:
+        return 1
+    parts = geometry.get("rings") or geometry.get("paths") or []
+    return sum(len(part) for part in parts) + len(geometry.get("points") or [])
+
+
+def build_estimate(
+    count,
+    extent,
+    sample_bytes,
+    sample_features,
+    sample_vertices,
+    sample_seconds,
+    request_seconds,
+    page_size,
+) -> dict:
+    """Extrapolate a full download from one sampled page.
+
+    Args:
+        count: Number of features matching the query.
+        extent: Esri JSON extent of the matching features, or None.
+        sample_bytes: Size of the sampled page in bytes.
+        sample_features: Number of features in the sampled page.
+        sample_vertices: Number of vertices in the sampled page.
+        sample_seconds: Time taken to download the sampled page.
+        request_seconds: Round trip time of a small request (count query).
+        page_size: Largest page of the real download (``maxRecordCount``).
+            Pages start at ``page_sizing.START_PAGE_SIZE`` and grow to it,
+            so ``pages`` is a lower bound.
+    """
+    per_feature_bytes = sample_bytes / sample_features if sample_features else 0
+    per_feature_vertices = sample_vertices / sample_features if sample_features else 0
+    transfer_seconds = max(sample_seconds - request_seconds, 1e-6)
+    bandwidth = sample_bytes / transfer_seconds if sample_bytes else 0
+
+    total_bytes = per_feature_bytes * count
+    pages = page_sizing.pages_needed(count, page_size) if page_size else 0
+    seconds = pages * request_seconds
+    if bandwidth:
+        seconds += total_bytes / bandwidth
+
+    return {
+        "features": count,
+        "extent": extent,
+        "pages": pages,
+        "bytes": int(total_bytes),
+        "bytes_per_feature": round(per_feature_bytes, 1),
+        "vertices": int(per_feature_vertices * count),
+        "vertices_per_feature": round(per_feature_vertices, 1),
+        "bandwidth_bytes_per_second": int(bandwidth),
+        "seconds": round(seconds, 1),
+    }
+
+
+def estimate_layer(
+    layer_url, layer_meta, where="1=1", sample_size=DEFAULT_SAMPLE_SIZE
+) -> dict:
+    """Estimate the download of a layer from count, extent and a sample page."""
+    query_url = f"{layer_url}/query"
+
+    start = time.perf_counter()
+    count = esri_rest.query_count(layer_url, where)
+    request_seconds = time.perf_counter() - start
+
+    try:
+        extent = esri_rest.fetch_json(
+            query_url, {"where": where, "returnExtentOnly": "true"}
+        ).get("extent")
+    except esri_rest.RestError:
+        extent = None
+
+    page_size = esri_rest.max_record_count(layer_meta)
+    sample_size = min(sample_size, page_size)
+    params = {"where": where, "outFields": "*", "returnGeometry": "true"}
+    if esri_rest.supports_pagination(layer_meta):
+        params.update({"resultOffset": 0, "resultRecordCount": sample_size})
+    else:
+        ids = esri_rest.fetch_json(
+            query_url, {"where": where, "returnIdsOnly": "true"}
+        ).get("objectIds")
+        params["objectIds"] = ",".join(str(i) for i in sorted(ids or [])[:sample_size])
+
+    start = time.perf_counter()
+    raw = esri_rest.fetch_bytes(query_url, params)
+    sample_seconds = time.perf_counter() - start
+    features = esri_rest.parse_json(raw).get("features") or []
+
+    return build_estimate(
+        count,
+        extent,
+        len(raw) if features else 0,
+        len(features),
+        sum(count_vertices(f.get("geometry")) for f in features),
+        sample_seconds,
+        request_seconds,
+        page_size,
+    )
+
+
+def estimate_service(url: str, sample_size=DEFAULT_SAMPLE_SIZE) -> dict:
+    """Estimate the download of the first layer of a FeatureServer."""
+    service_meta = esri_rest.fetch_json(url)
+    layers = service_meta.get("layers") or []
+    if not layers:
+        raise esri_rest.RestError(f"No layers found in FeatureServer: {url}")
+    layer_url = f"{url}/{layers[0].get('id')}"
+    layer_meta = esri_rest.fetch_json(layer_url)
+    return estimate_layer(layer_url, layer_meta, sample_size=sample_size)
+
+
+def format_bytes(size: float) -> str:
+    if size < 1024:
+        return f"{int(size)} B"
+    for unit in ("KB", "MB"):
+        size /= 1024
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+    return f"{size / 1024:.1f} GB"
+
+
+def format_estimate(estimate: dict) -> list[str]:
+    """Return human readable lines describing an estimate."""
+    minutes, seconds = divmod(int(estimate["seconds"]), 60)
+    return [
+        f"Estimated features: {estimate['features']}",
+        f"Estimated requests: at least {estimate['pages']}",
+        (
+            f"Estimated transfer size: {format_bytes(estimate['bytes'])} "
+            f"({estimate['bytes_per_feature']} bytes/feature)"
+        ),
+        (
+            f"Estimated vertices: {estimate['vertices']} "
+            f"({estimate['vertices_per_feature']} per feature)"
+        ),
+        f"Measured bandwidth: {format_bytes(estimate['bandwidth_bytes_per_second'])}/s",
+        f"Estimated duration: {minutes} min {seconds} s",
+    ]
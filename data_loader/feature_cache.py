@@ -0,0 +1,338 @@
+"""
+Local feature cache for ArcGIS FeatureServer layers.
+
+Features are fetched tile by tile through the ``arcgisfeatureserver``
+provider and stored in a GeoPackage, keyed by service, layer and tile
+extent (see ``tile_index``). Only the tiles of the requested extent are
+fetched: when the layer is loaded that is the visible map extent, and a
+``CacheUpdater`` fetches further tiles as the map canvas moves. Tiles
+younger than the TTL are served from disk; missing or expired tiles are
+requested from the server. The layer style is stored with the cache, so
+the cached layer renders like the server layer, offline too.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import os
+import time
+
+from qgis.core import (
+    QgsApplication,
+    QgsCoordinateTransform,
+    QgsCsException,
+    QgsEditorWidgetSetup,
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsFeedback,
+    QgsField,
+    QgsFields,
+    QgsProject,
+    QgsRectangle,
+    QgsVectorFileWriter,
+    QgsVectorLayer,
+)
+from qgis.PyQt.QtCore import QCoreApplication, QMetaType, QObject, QTimer
+from qgis.PyQt.QtXml import QDomDocument
+
+from . import tile_index
+
+TILE_FIELD = "moe_cache_tile"
+
+_CACHE_FILE = "feature_cache.gpkg"
+
+
+def default_cache_dir() -> str:
+    return os.path.join(
+        QgsApplication.qgisSettingsDirPath(), "cache", "moe_geoportal_loader"
+    )
+
+
+def _table_name(service_url: str, layer_id) -> str:
+    digest = hashlib.md5(
+        f"{service_url}/{layer_id}".encode(), usedforsecurity=False
+    ).hexdigest()
+    return f"layer_{digest[:16]}"
+
+
+def _bounds(rect) -> tuple:
+    return rect.xMinimum(), rect.yMinimum(), rect.xMaximum(), rect.yMaximum()
+
+
+class FeatureCache:
+    """GeoPackage backed tile cache for a single FeatureServer layer."""
+
+    def __init__(self, cache_dir, service_url, layer_id, ttl_seconds):
+        self.cache_path = os.path.join(cache_dir, _CACHE_FILE)
+        self.service_url = service_url
+        self.layer_id = layer_id
+        self.ttl_seconds = ttl_seconds
+        self.table_name = _table_name(service_url, layer_id)
+        self.tiles = tile_index.TileIndex(
+            self.cache_path, self.table_name, service_url, layer_id
+        )
+
+    @classmethod
+    def find(cls, cache_dir, service_url, ttl_seconds):
+        """Return a cache for the first layer of a service cached earlier."""
+        cache_path = os.path.join(cache_dir, _CACHE_FILE)
+        if not os.path.exists(cache_path):
+            return None
+        layer_id = tile_index.find_layer(cache_path, service_url)
+        if layer_id is None:
+            return None
+        return cls(cache_dir, service_url, layer_id, ttl_seconds)
+
+    def layer(self, layer_name):
+        """Open the cached features with their saved style, or None if absent."""
+        layer = self._open(layer_name)
+        if layer is None:
+            return None
+        style_xml = self.tiles.style()
+        if style_xml:
+            doc = QDomDocument("qgis")
+            doc.setContent(style_xml)
+            layer.importNamedStyle(doc)
+        idx = layer.fields().indexOf(TILE_FIELD)
+        if idx >= 0:
+            layer.setEditorWidgetSetup(idx, QgsEditorWidgetSetup("Hidden", {}))
+        return layer
+
+    def save_style(self, style_xml: str) -> None:
+        """Keep the style of the server layer for ``layer()``."""
+        self.tiles.save_style(style_xml)
+
+    def _open(self, layer_name):
+        if not os.path.exists(self.cache_path):
+            return None
+        layer = QgsVectorLayer(
+            f"{self.cache_path}|layername={self.table_name}", layer_name, "ogr"
+        )
+        return layer if layer.isValid() else None
+
+    def sync(self, source_layer, feedback, extent=None):
+        """Fetch missing or expired tiles of ``source_layer`` into the cache.
+
+        Args:
+            source_layer: The ``arcgisfeatureserver`` layer.
+            feedback: QgsFeedback for progress and cancellation.
+            extent: QgsRectangle in the layer CRS to cover, or None for the
+                whole layer.
+
+        Returns:
+            Tuple of (fetched, reused, failed) tile counts.
+        """
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        layer_extent = _bounds(source_layer.extent())
+        full_grid = list(tile_index.tile_grid(layer_extent))
+        grid = full_grid
+        if extent is not None:
+            wanted = _bounds(extent)
+            grid = [tile for tile in grid if tile_index.intersects(tile[2], wanted)]
+
+        cache_layer = self._ensure_table(source_layer, feedback)
+        if cache_layer is None:
+            return 0, 0, len(grid)
+        self._drop_outdated_tiles(
+            cache_layer, {tile_index.tile_key(bounds) for _, _, bounds in full_grid}
+        )
+
+        now = time.time()
+        fresh = self.tiles.fresh(now, self.ttl_seconds)
+        fetched = reused = failed = 0
+        total = len(grid)
+
+        for i, (col, row, bounds) in enumerate(grid):
+            if feedback.isCanceled():
+                break
+            key = tile_index.tile_key(bounds)
+            if key in fresh:
+                reused += 1
+                continue
+
+            features = self._fetch_tile(
+                source_layer, cache_layer, layer_extent, col, row, bounds, key
+            )
+            if features is None:
+                feedback.pushInfo(f"Tile {key} could not be fetched, keeping cache")
+                failed += 1
+                continue
+
+            self._replace_tile(cache_layer, key, features)
+            self.tiles.mark(key, bounds, now)
+            fetched += 1
+            feedback.setProgress(int(((i + 1) / total) * 100))
+
+        return fetched, reused, failed
+
+    def _ensure_table(self, source_layer, feedback):
+        expected = [f.name() for f in source_layer.fields()] + [TILE_FIELD]
+        cache_layer = self._open("cache")
+        if cache_layer is not None:
+            names = [f.name() for f in cache_layer.fields()]
+            if [n for n in names if n != "fid"] == expected:
+                return cache_layer
+            feedback.pushInfo("Cached schema differs from server, rebuilding cache")
+            del cache_layer
+
+        fields = QgsFields()
+        for field in source_layer.fields():
+            fields.append(QgsField(field))
+        fields.append(QgsField(TILE_FIELD, QMetaType.Type.QString))
+
+        options = QgsVectorFileWriter.SaveVectorOptions()
+        options.driverName = "GPKG"
+        options.layerName = self.table_name
+        options.actionOnExistingFile = (
+            QgsVectorFileWriter.ActionOnExistingFile.CreateOrOverwriteLayer
+            if os.path.exists(self.cache_path)
+            else QgsVectorFileWriter.ActionOnExistingFile.CreateOrOverwriteFile
+        )
+        writer = QgsVectorFileWriter.create(
+            self.cache_path,
+            fields,
+            source_layer.wkbType(),
+            source_layer.crs(),
+            QgsProject.instance().transformContext(),
+            options,
+        )
+        if writer.hasError() != QgsVectorFileWriter.WriterError.NoError:
+            feedback.reportError(
+                f"Failed to create cache table: {writer.errorMessage()}"
+            )
+            return None
+        del writer
+
+        self.tiles.clear()
+        return self._open("cache")
+
+    def _drop_outdated_tiles(self, cache_layer, current_keys):
+        # Tiles from an earlier grid (the service extent changed) would
+        # otherwise leave duplicated features behind.
+        outdated = self.tiles.keys() - current_keys
+        for key in outdated:
+            self._replace_tile(cache_layer, key, [])
+        if outdated:
+            self.tiles.forget(outdated)
+
+    def _fetch_tile(self, source_layer, cache_layer, extent, col, row, bounds, key):
+        provider = source_layer.dataProvider()
+        provider.clearErrors()
+
+        features = []
+        request = QgsFeatureRequest().setFilterRect(QgsRectangle(*bounds))
+        for feature in source_layer.getFeatures(request):
+            center = feature.geometry().boundingBox().center()
+            if tile_index.owner_tile(center.x(), center.y(), extent) != (col, row):
+                continue
+
+            new_f = QgsFeature(cache_layer.fields())
+            new_f.setGeometry(feature.geometry())
+            for field in feature.fields():
+                new_f.setAttribute(field.name(), feature[field.name()])
+            new_f.setAttribute(TILE_FIELD, key)
+            features.append(new_f)
+
+        if provider.hasErrors():
+            return None
+        return features
+
+    def _replace_tile(self, cache_layer, key, features):
+        provider = cache_layer.dataProvider()
+        request = QgsFeatureRequest().setFilterExpression(f"\"{TILE_FIELD}\" = '{key}'")
+        request.setSubsetOfAttributes([TILE_FIELD], cache_layer.fields())
+        request.setFlags(QgsFeatureRequest.Flag.NoGeometry)
+        stale_ids = [f.id() for f in cache_layer.getFeatures(request)]
+        if stale_ids:
+            provider.deleteFeatures(stale_ids)
+        if features:
+            provider.addFeatures(features)
+
+
+def map_canvas():
+    """The map canvas of the QGIS window, or None when running headless."""
+    from qgis.utils import iface
+
+    return iface.mapCanvas() if iface is not None else None
+
+
+def canvas_extent(canvas, crs):
+    """Visible extent of ``canvas`` in ``crs``, or None if it can't be mapped."""
+    transform = QgsCoordinateTransform(
+        canvas.mapSettings().destinationCrs(), crs, QgsProject.instance()
+    )
+    try:
+        return transform.transformBoundingBox(canvas.extent())
+    except QgsCsException:
+        return None
+
+
+# Updaters of cached layers in the project, by layer id; they stop
+# themselves when their layer is removed.
+_updaters = {}
+
+
+class CacheUpdater(QObject):
+    """Fetch the tiles of the visible extent into a cached layer.
+
+    The map extent is checked shortly after the canvas stops moving; tiles
+    are fetched on the main thread, only those not cached yet or expired.
+
+    Args:
+        cache: The FeatureCache of the layer.
+        source_layer: The ``arcgisfeatureserver`` layer features come from.
+        cache_layer: The cached layer in the project.
+        canvas: The map canvas to follow.
+    """
+
+    DELAY_MS = 500
+
+    def __init__(self, cache, source_layer, cache_layer, canvas):
+        super().__init__()
+        self.cache = cache
+        self.source_layer = source_layer
+        self.cache_layer = cache_layer
+        self.canvas = canvas
+        self._layer_id = cache_layer.id()
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(self.DELAY_MS)
+        self._timer.timeout.connect(self.update)
+
+    def start(self):
+        self.canvas.extentsChanged.connect(self._timer.start)
+        self.cache_layer.willBeDeleted.connect(self.stop)
+        _updaters[self._layer_id] = self
+
+    def stop(self):
+        self._timer.stop()
+        with contextlib.suppress(TypeError, RuntimeError):
+            self.canvas.extentsChanged.disconnect(self._timer.start)
+        _updaters.pop(self._layer_id, None)
+
+    def update(self):
+        node = QgsProject.instance().layerTreeRoot().findLayer(self._layer_id)
+        if node is None or not node.isVisible():
+            return
+        extent = canvas_extent(self.canvas, self.source_layer.crs())
+        if extent is None:
+            return
+        fetched, _, _ = self.cache.sync(self.source_layer, QgsFeedback(), extent)
+        if fetched:
+            self.cache_layer.dataProvider().reloadData()
+            self.cache_layer.triggerRepaint()
+
+
+def follow_canvas(cache, source_layer, cache_layer, canvas) -> CacheUpdater:
+    """Keep ``cache_layer`` filled for the visible extent of ``canvas``.
+
+    May be called from a processing thread: the updater and the source
+    layer are handed over to the main thread, where the canvas lives.
+    """
+    main_thread = QCoreApplication.instance().thread()
+    source_layer.moveToThread(main_thread)
+    updater = CacheUpdater(cache, source_layer, cache_layer, canvas)
+    updater.moveToThread(main_thread)
+    updater.start()
+    return updater
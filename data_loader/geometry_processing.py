@@ -0,0 +1,245 @@
+"""
+Parallel geometry post-processing for downloaded features.
+
+``ProcessingSink`` wraps an output sink: features are buffered in chunks,
+the geometries of each chunk are reprojected, repaired with ``makeValid``
+and optionally snapped to a grid in a worker pool, and the results are
+written to the wrapped sink in their original order. Geometries cross the
+pool as WKB, so the same chunk function runs in worker processes when
+Python interpreters can be spawned (standalone scripts and batch workers)
+or in threads otherwise (QGIS desktop and ``qgis_process``, whose
+executable is not a Python interpreter).
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+
+from qgis.core import (
+    Qgis,
+    QgsApplication,
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransform,
+    QgsCoordinateTransformContext,
+    QgsCsException,
+    QgsFeatureSink,
+    QgsGeometry,
+    QgsWkbTypes,
+)
+
+from .pipeline import spawns_python
+
+CHUNK_SIZE = 1000
+STAT_KEYS = ("invalid", "repaired", "unrepaired", "failed")
+
+_local = threading.local()
+# Keeps the worker's QgsApplication alive for the life of the process.
+_worker = {}
+
+
+def default_workers() -> int:
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def use_processes() -> bool:
+    """Whether worker processes can be used, see ``spawns_python``."""
+    return spawns_python()
+
+
+def merge_stats(total: dict, stats: dict) -> dict:
+    for key in STAT_KEYS:
+        total[key] = total.get(key, 0) + stats.get(key, 0)
+    return total
+
+
+def _init_process(prefix_path):
+    # Without a prefix from the parent, QgsApplication finds its own
+    # (QGIS_PREFIX_PATH or the executable's location).
+    if prefix_path:
+        QgsApplication.setPrefixPath(prefix_path, True)
+    qgs_app = QgsApplication([], False)
+    qgs_app.initQgis()
+    _worker["app"] = qgs_app
+
+
+def _transform(source_wkt, dest_wkt):
+    # QgsCoordinateTransform is not thread safe; keep one per thread.
+    key = (source_wkt, dest_wkt)
+    cache = getattr(_local, "transforms", None)
+    if cache is None:
+        cache = _local.transforms = {}
+    if key not in cache:
+        cache[key] = QgsCoordinateTransform(
+            QgsCoordinateReferenceSystem.fromWkt(source_wkt),
+            QgsCoordinateReferenceSystem.fromWkt(dest_wkt),
+            QgsCoordinateTransformContext(),
+        )
+    return cache[key]
+
+
+def _coerce(geometry, target_type):
+    """Convert a repaired geometry to ``target_type``, keeping every part.
+
+    Returns None when the parts do not fit the type, e.g. a polygon split
+    in two for a single-part layer.
+    """
+    parts = geometry.coerceToType(target_type)
+    if len(parts) <= 1:
+        return parts[0] if parts else QgsGeometry()
+    if not QgsWkbTypes.isMultiType(target_type):
+        return None
+    collected = QgsGeometry.collectGeometry(parts).coerceToType(target_type)
+    return collected[0] if len(collected) == 1 else None
+
+
+def process_wkb_chunk(wkbs: list, options: dict):
+    """Reproject, repair and snap a chunk of WKB geometries.
+
+    Args:
+        wkbs: WKB bytes per feature, or None for features without geometry.
+        options: ``source_crs``/``dest_crs`` (WKT, reprojection is skipped
+            when absent), ``make_valid``, ``grid_size`` and ``wkb_type``
+            (target type that repaired geometries are coerced to).
+
+    Returns:
+        (results, stats): WKB bytes per feature (None when the geometry is
+        missing or could not be processed, see ``stats["failed"]``) and the
+        counts of invalid, repaired, unrepaired and failed geometries.
+    """
+    transform = None
+    if options.get("source_crs") and options.get("dest_crs"):
+        transform = _transform(options["source_crs"], options["dest_crs"])
+    make_valid = options.get("make_valid", False)
+    grid_size = options.get("grid_size") or 0
+    target_type = options.get("wkb_type")
+    if target_type is not None:
+        target_type = Qgis.WkbType(target_type)
+
+    stats = dict.fromkeys(STAT_KEYS, 0)
+    results = []
+    for wkb in wkbs:
+        if wkb is None:
+            results.append(None)
+            continue
+        geometry = QgsGeometry()
+        geometry.fromWkb(wkb)
+
+        if transform is not None:
+            try:
+                geometry.transform(transform)
+            except QgsCsException:
+                stats["failed"] += 1
+                results.append(None)
+                continue
+
+        if grid_size:
+            geometry = geometry.snappedToGrid(grid_size, grid_size, 0, 0)
+
+        if make_valid and not geometry.isGeosValid():
+            stats["invalid"] += 1
+            repaired = geometry.makeValid()
+            if target_type is not None and repaired.wkbType() != target_type:
+                # makeValid can return collections (e.g. polygons plus
+                # stray lines) or split a geometry into several parts.
+                repaired = _coerce(repaired, target_type)
+            if repaired is None:
+                # Keep the invalid original rather than drop parts.
+                stats["unrepaired"] += 1
+            elif repaired.isEmpty() or not repaired.isGeosValid():
+                geometry = repaired
+                stats["unrepaired"] += 1
+            else:
+                geometry = repaired
+                stats["repaired"] += 1
+
+        results.append(bytes(geometry.asWkb()) if not geometry.isNull() else None)
+    return results, stats
+
+
+class ProcessingSink:
+    """Sink wrapper that post-processes geometries in a worker pool.
+
+    Args:
+        sink: The sink that receives the processed features.
+        options: Chunk options, see ``process_wkb_chunk``.
+        workers: Number of worker processes or threads.
+        processes: Use processes instead of threads.
+        chunk_size: Features per chunk.
+    """
+
+    def __init__(
+        self,
+        sink,
+        options: dict,
+        workers: int | None = None,
+        processes: bool | None = None,
+        chunk_size: int = CHUNK_SIZE,
+    ):
+        self.sink = sink
+        self.options = options
+        self.workers = workers or default_workers()
+        self.processes = use_processes() if processes is None else processes
+        self.chunk_size = chunk_size
+        self.stats = dict.fromkeys(STAT_KEYS, 0)
+        self.written = 0
+
+        if self.processes:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=get_context("spawn"),
+                initializer=_init_process,
+                initargs=(QgsApplication.prefixPath(),),
+            )
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._buffer = []
+        self._pending = deque()
+
+    def addFeature(self, feature, flags=None) -> bool:
+        self._buffer.append(feature)
+        if len(self._buffer) >= self.chunk_size:
+            self._submit()
+        return True
+
+    def _submit(self):
+        chunk, self._buffer = self._buffer, []
+        wkbs = [bytes(f.geometry().asWkb()) if f.hasGeometry() else None for f in chunk]
+        future = self._executor.submit(process_wkb_chunk, wkbs, self.options)
+        self._pending.append((chunk, future))
+        # Bound the chunks in flight so memory stays flat when the pool
+        # is slower than the download.
+        while len(self._pending) > self.workers * 2:
+            self._write_oldest()
+
+    def _write_oldest(self):
+        chunk, future = self._pending.popleft()
+        results, stats = future.result()
+        merge_stats(self.stats, stats)
+        for feature, wkb in zip(chunk, results):
+            if wkb is None:
+                if feature.hasGeometry():
+                    continue
+            else:
+                geometry = QgsGeometry()
+                geometry.fromWkb(wkb)
+                feature.setGeometry(geometry)
+            self.sink.addFeature(feature, QgsFeatureSink.FastInsert)
+            self.written += 1
+
+    def flush(self):
+        """Process the remaining features and shut the pool down."""
+        if self._buffer:
+            self._submit()
+        try:
+            while self._pending:
+                self._write_oldest()
+        finally:
+            self.close()
+
+    def close(self):
+        """Shut the pool down, dropping unprocessed chunks."""
+        self._executor.shutdown(cancel_futures=True)
@@ -0,0 +1,76 @@
+"""
+Helpers for MBTiles vector tile archives.
+
+Zoom levels are written to separate archives in parallel and merged into
+one file with ``merge_mbtiles``. ``source_for_zoom`` picks the overview
+level (see ``overviews``) whose scale range covers a zoom level, so low
+zooms are cut from simplified geometries.
+"""
+
+from __future__ import annotations
+
+import math
+import shutil
+import sqlite3
+
+# Scale denominator of zoom level 0 in Web Mercator at 0.28 mm per pixel.
+ZOOM_0_SCALE = 559_082_264.028
+
+
+def scale_for_zoom(zoom: int) -> float:
+    return ZOOM_0_SCALE / (2**zoom)
+
+
+def zoom_for_scale(scale: float) -> float:
+    return math.log2(ZOOM_0_SCALE / scale)
+
+
+def source_for_zoom(zoom: int, scales) -> int | None:
+    """Return the overview scale to tile ``zoom`` from, or None for the base.
+
+    Mirrors the visibility ranges of ``overviews.scale_ranges``: an overview
+    is used from its own scale up to the next coarser one.
+    """
+    zoom_scale = scale_for_zoom(zoom)
+    chosen = None
+    for scale in sorted(scales):
+        if scale <= zoom_scale:
+            chosen = scale
+    return chosen
+
+
+def merge_mbtiles(target: str, parts, min_zoom: int, max_zoom: int) -> int:
+    """Merge the tiles of several MBTiles archives into ``target``.
+
+    The first part provides the metadata; ``minzoom``/``maxzoom`` are set to
+    the merged range. Returns the number of tiles in the target.
+    """
+    parts = list(parts)
+    if not parts:
+        raise ValueError("No MBTiles archives to merge")
+
+    shutil.copyfile(parts[0], target)
+    with sqlite3.connect(target) as conn:
+        for index, part in enumerate(parts[1:]):
+            alias = f"part{index}"
+            conn.execute(f"ATTACH DATABASE ? AS {alias}", (part,))
+            conn.execute(
+                "INSERT OR REPLACE INTO tiles "
+                "(zoom_level, tile_column, tile_row, tile_data) "
+                "SELECT zoom_level, tile_column, tile_row, tile_data "
+                f"FROM {alias}.tiles"
+            )
+            conn.commit()
+            conn.execute(f"DETACH DATABASE {alias}")
+
+        for name, value in (("minzoom", min_zoom), ("maxzoom", max_zoom)):
+            updated = conn.execute(
+                "UPDATE metadata SET value = ? WHERE name = ?", (str(value), name)
+            ).rowcount
+            if not updated:
+                conn.execute(
+                    "INSERT INTO metadata (name, value) VALUES (?, ?)",
+                    (name, str(value)),
+                )
+        count = conn.execute("SELECT COUNT(*) FROM tiles").fetchone()[0]
+    return count
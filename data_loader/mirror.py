@@ -0,0 +1,270 @@
+"""
+Local mirror of the MOE GeoPortal dataset catalog.
+
+Every FeatureServer in ``settings_datasets.DATASETS`` is stored below a
+mirror directory as gzip compressed ``/query`` pages plus the service and
+layer metadata::
+
+    <mirror_dir>/<service_name>/manifest.json
+    <mirror_dir>/<service_name>/service.json
+    <mirror_dir>/<service_name>/<layer_id>/layer.json
+    <mirror_dir>/<service_name>/<layer_id>/page_00000.json.gz
+
+Services whose edit dates and feature counts are unchanged since the last
+run are skipped, so the command is cheap enough for a nightly schedule::
+
+    python -m data_loader.mirror /path/to/mirror --workers 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import esri_rest
+from .catalog import iter_dataset_urls
+
+MANIFEST_FILE = "manifest.json"
+SERVICE_FILE = "service.json"
+LAYER_FILE = "layer.json"
+DEFAULT_WORKERS = 4
+
+
+def service_name(url: str) -> str:
+    """Return the service folder name of a FeatureServer URL."""
+    parts = url.rstrip("/").split("/")
+    return parts[parts.index("FeatureServer") - 1]
+
+
+def mirror_path(mirror_dir: str, url: str) -> str | None:
+    """Return the mirrored service directory of ``url``, or None if absent."""
+    if not mirror_dir:
+        return None
+    path = os.path.join(mirror_dir, service_name(url))
+    if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        return path
+    return None
+
+
+def _read_json(path: str):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_json(path: str, data) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def read_manifest(service_dir: str) -> dict | None:
+    path = os.path.join(service_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    return _read_json(path)
+
+
+def read_service_meta(service_dir: str) -> dict:
+    return _read_json(os.path.join(service_dir, SERVICE_FILE))
+
+
+def read_layer(service_dir: str, layer_id=None):
+    """Return (layer_meta, page_paths) of a mirrored layer.
+
+    ``layer_id`` defaults to the first layer of the service, matching what
+    the loader picks from a live FeatureServer.
+    """
+    if layer_id is None:
+        layers = read_service_meta(service_dir).get("layers") or []
+        if not layers:
+            return None, []
+        layer_id = layers[0].get("id")
+
+    manifest = read_manifest(service_dir) or {}
+    entry = (manifest.get("layers") or {}).get(str(layer_id))
+    if entry is None:
+        return None, []
+
+    layer_dir = os.path.join(service_dir, str(layer_id))
+    pages = [
+        os.path.join(layer_dir, _page_name(i)) for i in range(entry.get("pages", 0))
+    ]
+    return _read_json(os.path.join(layer_dir, LAYER_FILE)), pages
+
+
+def read_pages(page_paths):
+    """Yield the mirrored ``/query`` pages one at a time."""
+    for path in page_paths:
+        with gzip.open(path, "rb") as f:
+            yield esri_rest.parse_json(f.read())
+
+
+def feature_count(service_dir: str, layer_id) -> int:
+    """Return the number of mirrored features of a layer."""
+    manifest = read_manifest(service_dir) or {}
+    entry = (manifest.get("layers") or {}).get(str(layer_id)) or {}
+    return entry.get("features", 0)
+
+
+def _page_name(index: int) -> str:
+    return f"page_{index:05d}.json.gz"
+
+
+def _fingerprint(service_meta, layer_metas, counts) -> str:
+    state = {
+        "serviceItemId": service_meta.get("serviceItemId"),
+        "layers": {
+            str(layer_id): {
+                "editingInfo": meta.get("editingInfo"),
+                "count": counts[layer_id],
+            }
+            for layer_id, meta in layer_metas.items()
+        },
+    }
+    payload = json.dumps(state, sort_keys=True).encode()
+    return hashlib.md5(payload, usedforsecurity=False).hexdigest()
+
+
+def mirror_service(url: str, mirror_dir: str, force: bool = False) -> str:
+    """Mirror one FeatureServer.
+
+    Returns:
+        "updated" if the service was downloaded, "unchanged" if skipped.
+    """
+    service_meta = esri_rest.fetch_json(url)
+    entries = (service_meta.get("layers") or []) + (service_meta.get("tables") or [])
+    layer_metas = {}
+    counts = {}
+    for entry in entries:
+        layer_id = entry.get("id")
+        layer_url = f"{url}/{layer_id}"
+        layer_metas[layer_id] = esri_rest.fetch_json(layer_url)
+        counts[layer_id] = esri_rest.query_count(layer_url)
+
+    fingerprint = _fingerprint(service_meta, layer_metas, counts)
+    target = os.path.join(mirror_dir, service_name(url))
+    manifest = read_manifest(target)
+    if not force and manifest and manifest.get("fingerprint") == fingerprint:
+        return "unchanged"
+
+    # Download next to the old copy and swap at the end, so readers never
+    # see a half written service.
+    partial = f"{target}.partial"
+    shutil.rmtree(partial, ignore_errors=True)
+    os.makedirs(partial)
+    _write_json(os.path.join(partial, SERVICE_FILE), service_meta)
+
+    layers = {}
+    for layer_id, layer_meta in layer_metas.items():
+        layer_dir = os.path.join(partial, str(layer_id))
+        os.makedirs(layer_dir)
+        _write_json(os.path.join(layer_dir, LAYER_FILE), layer_meta)
+
+        pages = features = 0
+        for raw, page in esri_rest.iter_query_pages(f"{url}/{layer_id}", layer_meta):
+            with gzip.open(os.path.join(layer_dir, _page_name(pages)), "wb") as f:
+                f.write(raw)
+            pages += 1
+            features += len(page.get("features") or [])
+
+        layers[str(layer_id)] = {
+            "name": layer_meta.get("name", ""),
+            "pages": pages,
+            "features": features,
+        }
+
+    _write_json(
+        os.path.join(partial, MANIFEST_FILE),
+        {
+            "url": url,
+            "fingerprint": fingerprint,
+            "mirrored_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "layers": layers,
+        },
+    )
+
+    previous = f"{target}.previous"
+    shutil.rmtree(previous, ignore_errors=True)
+    if os.path.exists(target):
+        os.rename(target, previous)
+    os.rename(partial, target)
+    shutil.rmtree(previous, ignore_errors=True)
+    return "updated"
+
+
+def mirror_catalog(
+    mirror_dir: str,
+    dataset_keys=None,
+    workers: int = DEFAULT_WORKERS,
+    force: bool = False,
+    log=print,
+):
+    """Mirror every service of the catalog in parallel.
+
+    Returns:
+        List of result dicts with dataset, pref_code, url, status and error.
+    """
+    os.makedirs(mirror_dir, exist_ok=True)
+    targets = {}
+    for dataset_key, pref_code, url in iter_dataset_urls(dataset_keys):
+        targets.setdefault(url, (dataset_key, pref_code))
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            executor.submit(mirror_service, url, mirror_dir, force): url
+            for url in targets
+        }
+        for future in as_completed(futures):
+            url = futures[future]
+            dataset_key, pref_code = targets[url]
+            result = {
+                "dataset": dataset_key,
+                "pref_code": pref_code,
+                "url": url,
+                "status": None,
+                "error": None,
+            }
+            try:
+                result["status"] = future.result()
+            except esri_rest.REQUEST_ERRORS as e:
+                result["status"] = "failed"
+                result["error"] = str(e)
+            log(f"{result['status']:>9}  {service_name(url)}")
+            results.append(result)
+
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Mirror the MOE GeoPortal FeatureServers to a local directory."
+    )
+    parser.add_argument("mirror_dir", help="Directory that holds the mirror")
+    parser.add_argument(
+        "--dataset",
+        action="append",
+        dest="datasets",
+        help="Dataset key to mirror (repeatable, default: all)",
+    )
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument(
+        "--force", action="store_true", help="Download unchanged services too"
+    )
+    args = parser.parse_args(argv)
+
+    results = mirror_catalog(args.mirror_dir, args.datasets, args.workers, args.force)
+    failed = [r for r in results if r["status"] == "failed"]
+    for result in failed:
+        print(f"{result['url']}: {result['error']}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,333 @@
+"""
+Serve a local mirror as a FeatureServer stand-in.
+
+Exposes the services written by ``data_loader.mirror`` with the endpoints
+the loader consumes::
+
+    .../<service_name>/FeatureServer?f=json
+    .../<service_name>/FeatureServer/<layer_id>?f=json
+    .../<service_name>/FeatureServer/<layer_id>/query
+
+``/query`` supports paging (``resultOffset``/``resultRecordCount``),
+envelope filters (``geometry`` with ``esriGeometryEnvelope``), ``outFields``,
+``objectIds``, ``returnGeometry``, ``returnCountOnly`` and
+``returnIdsOnly``. Coordinates are served in the mirrored spatial reference;
+``inSR``/``outSR`` must name it, and ``where`` may only be ``1=1`` or
+``1=0``. Other values are answered with an error document instead of
+unfiltered features.
+Start it with::
+
+    python -m data_loader.mirror_server /path/to/mirror --port 8080
+
+and point the loader's base URL at ``http://<host>:8080/arcgis/rest/services``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from . import mirror
+
+DEFAULT_PORT = 8080
+
+_PATH_RE = re.compile(
+    r"/(?P<service>[^/]+)/FeatureServer(?:/(?P<layer>\d+))?(?:/(?P<op>query))?/?$"
+)
+
+
+def geometry_bbox(geometry: dict | None):
+    """Return (xmin, ymin, xmax, ymax) of an Esri JSON geometry, or None."""
+    if not geometry:
+        return None
+    if "x" in geometry and "y" in geometry:
+        return geometry["x"], geometry["y"], geometry["x"], geometry["y"]
+    if "xmin" in geometry:
+        return geometry["xmin"], geometry["ymin"], geometry["xmax"], geometry["ymax"]
+
+    parts = geometry.get("rings") or geometry.get("paths") or []
+    points = [pt for part in parts for pt in part]
+    points += geometry.get("points") or []
+    if not points:
+        return None
+    xs = [pt[0] for pt in points]
+    ys = [pt[1] for pt in points]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def parse_envelope(value: str):
+    """Parse ``xmin,ymin,xmax,ymax`` or an Esri JSON envelope."""
+    value = value.strip()
+    if value.startswith("{"):
+        data = json.loads(value)
+        return data["xmin"], data["ymin"], data["xmax"], data["ymax"]
+    xmin, ymin, xmax, ymax = (float(v) for v in value.split(","))
+    return xmin, ymin, xmax, ymax
+
+
+def parse_spatial_reference(value) -> set:
+    """Return the WKIDs named by a ``4326`` or ``{"wkid": ...}`` value."""
+    if isinstance(value, str):
+        value = value.strip()
+        value = json.loads(value) if value.startswith("{") else int(value)
+    if isinstance(value, dict):
+        return {value[k] for k in ("wkid", "latestWkid") if value.get(k)}
+    return {int(value)}
+
+
+def _intersects(a, b) -> bool:
+    return a[0] <= b[2] and a[2] >= b[0] and a[1] <= b[3] and a[3] >= b[1]
+
+
+class MirroredLayer:
+    """Features of one mirrored layer, loaded once and kept in memory."""
+
+    def __init__(self, layer_meta: dict, pages: list[str]):
+        self.meta = layer_meta
+        self.header = {}
+        self.features = []
+        for page_path in pages:
+            with gzip.open(page_path, "rb") as f:
+                page = json.loads(f.read().decode())
+            if not self.header:
+                self.header = {k: v for k, v in page.items() if k not in ("features",)}
+                self.header.pop("exceededTransferLimit", None)
+            self.features.extend(page.get("features") or [])
+
+        self.oid_field = (
+            self.header.get("objectIdFieldName")
+            or layer_meta.get("objectIdField")
+            or "objectid"
+        )
+        self.bboxes = [geometry_bbox(f.get("geometry")) for f in self.features]
+        self.index_of = {
+            (f.get("attributes") or {}).get(self.oid_field): i
+            for i, f in enumerate(self.features)
+        }
+
+        spatial_ref = (
+            self.header.get("spatialReference")
+            or (layer_meta.get("extent") or {}).get("spatialReference")
+            or {}
+        )
+        self.wkids = parse_spatial_reference(spatial_ref)
+
+    def _check_spatial_reference(self, name, value) -> None:
+        # Coordinates are never reprojected, so any other reference would
+        # silently compare or return coordinates in the wrong units.
+        if value and not parse_spatial_reference(value) & self.wkids:
+            raise ValueError(f"Unsupported {name}: {value}")
+
+    def select(self, params: dict) -> list[int]:
+        """Return the indexes of the features matching the query filters.
+
+        Raises:
+            ValueError: For filters the mirror cannot evaluate.
+        """
+        indexes = range(len(self.features))
+
+        self._check_spatial_reference("inSR", params.get("inSR"))
+        self._check_spatial_reference("outSR", params.get("outSR"))
+
+        where = "".join(params.get("where", "1=1").split())
+        if where == "1=0":
+            return []
+        if where not in ("", "1=1"):
+            raise ValueError(f"Unsupported where clause: {params['where']}")
+
+        if params.get("objectIds"):
+            wanted = {int(v) for v in params["objectIds"].split(",") if v}
+            indexes = sorted(
+                self.index_of[oid] for oid in wanted if oid in self.index_of
+            )
+
+        if params.get("geometry"):
+            spatial_rel = params.get("spatialRel", "esriSpatialRelIntersects")
+            if spatial_rel != "esriSpatialRelIntersects":
+                raise ValueError(f"Unsupported spatialRel: {spatial_rel}")
+            envelope = parse_envelope(params["geometry"])
+            if params["geometry"].strip().startswith("{"):
+                self._check_spatial_reference(
+                    "geometry spatialReference",
+                    json.loads(params["geometry"]).get("spatialReference"),
+                )
+            indexes = [
+                i
+                for i in indexes
+                if self.bboxes[i] is not None and _intersects(self.bboxes[i], envelope)
+            ]
+
+        return list(indexes)
+
+    def query(self, params: dict) -> dict:
+        matched = self.select(params)
+
+        if params.get("returnCountOnly", "").lower() == "true":
+            return {"count": len(matched)}
+
+        if params.get("returnIdsOnly", "").lower() == "true":
+            return {
+                "objectIdFieldName": self.oid_field,
+                "objectIds": [
+                    self.features[i]["attributes"].get(self.oid_field) for i in matched
+                ],
+            }
+
+        offset = int(params.get("resultOffset") or 0)
+        max_count = int(self.meta.get("maxRecordCount") or 1000)
+        count = min(int(params.get("resultRecordCount") or max_count), max_count)
+        page = matched[offset : offset + count]
+
+        out_fields = params.get("outFields", "*")
+        keep = None
+        if out_fields.strip() != "*":
+            keep = {name.strip() for name in out_fields.split(",")}
+            keep.add(self.oid_field)
+
+        return_geometry = params.get("returnGeometry", "true").lower() != "false"
+        features = []
+        for i in page:
+            src = self.features[i]
+            attributes = src.get("attributes") or {}
+            if keep is not None:
+                attributes = {k: v for k, v in attributes.items() if k in keep}
+            feature = {"attributes": attributes}
+            if return_geometry and "geometry" in src:
+                feature["geometry"] = src["geometry"]
+            features.append(feature)
+
+        result = dict(self.header)
+        if keep is not None and "fields" in result:
+            result["fields"] = [f for f in result["fields"] if f["name"] in keep]
+        result["features"] = features
+        result["exceededTransferLimit"] = offset + count < len(matched)
+        return result
+
+
+class MirrorStore:
+    """Resolves services of a mirror directory and caches loaded layers."""
+
+    def __init__(self, mirror_dir: str):
+        self.mirror_dir = mirror_dir
+        self._layers = {}
+        self._lock = threading.Lock()
+
+    def service_dir(self, service: str) -> str | None:
+        path = os.path.join(self.mirror_dir, service)
+        if os.path.exists(os.path.join(path, mirror.MANIFEST_FILE)):
+            return path
+        return None
+
+    def layer(self, service_dir: str, layer_id: int) -> MirroredLayer | None:
+        key = (service_dir, layer_id)
+        # A nightly refresh swaps the service directory; reload when the
+        # manifest fingerprint changes.
+        fingerprint = (mirror.read_manifest(service_dir) or {}).get("fingerprint")
+        with self._lock:
+            cached = self._layers.get(key)
+            if cached is None or cached[0] != fingerprint:
+                layer_meta, pages = mirror.read_layer(service_dir, layer_id)
+                if layer_meta is None:
+                    return None
+                cached = (fingerprint, MirroredLayer(layer_meta, pages))
+                self._layers[key] = cached
+            return cached[1]
+
+
+class MirrorRequestHandler(BaseHTTPRequestHandler):
+    store: MirrorStore = None  # set by make_server()
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        self._handle(url.path, dict(parse_qsl(url.query)))
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode() if length else ""
+        params = dict(parse_qsl(url.query))
+        params.update(parse_qsl(body))
+        self._handle(url.path, params)
+
+    def _handle(self, path, params):
+        match = _PATH_RE.search(path)
+        service_dir = self.store.service_dir(match["service"]) if match else None
+        if service_dir is None:
+            self._send_error(404, "Service not found")
+            return
+
+        try:
+            if match["layer"] is None:
+                self._send_json(mirror.read_service_meta(service_dir))
+                return
+
+            layer = self.store.layer(service_dir, int(match["layer"]))
+            if layer is None:
+                self._send_error(404, "Layer not found")
+            elif match["op"] == "query":
+                self._send_json(layer.query(params))
+            else:
+                meta = dict(layer.meta)
+                capabilities = dict(meta.get("advancedQueryCapabilities") or {})
+                capabilities["supportsPagination"] = True
+                meta["advancedQueryCapabilities"] = capabilities
+                self._send_json(meta)
+        except (ValueError, KeyError) as e:
+            self._send_error(400, f"Invalid query: {e}")
+
+    def _send_json(self, data):
+        body = json.dumps(data, ensure_ascii=False).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, code, message):
+        # ArcGIS answers errors with HTTP 200 and an error document.
+        self._send_json({"error": {"code": code, "message": message, "details": []}})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(mirror_dir: str, host: str = "", port: int = DEFAULT_PORT):
+    handler = type(
+        "BoundMirrorRequestHandler",
+        (MirrorRequestHandler,),
+        {"store": MirrorStore(mirror_dir)},
+    )
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Serve a local mirror as an ArcGIS FeatureServer stand-in."
+    )
+    parser.add_argument("mirror_dir", help="Directory written by data_loader.mirror")
+    parser.add_argument("--host", default="", help="Address to bind (default: all)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args(argv)
+
+    server = make_server(args.mirror_dir, args.host, args.port)
+    host, port = server.server_address[:2]
+    print(f"Serving {args.mirror_dir} on http://{host or 'localhost'}:{port}")
+    print(f"Base URL: http://{host or 'localhost'}:{port}/arcgis/rest/services")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+Simplified overview tables inside a GeoPackage output.
+
+For every overview scale a copy of the layer is written next to it, with
+geometries simplified by GEOS' topology-preserving simplifier at a
+tolerance of about one screen pixel at that scale. Features that collapse
+below a pixel are dropped. Each overview is derived from the previous,
+finer one, so coarse levels are cheap to build.
+
+Features are simplified one at a time, so neighbouring polygons are not
+simplified consistently: small gaps and overlaps can appear along shared
+boundaries. At the pixel tolerance they stay below about a pixel on screen,
+which is fine for display but not for analysis.
+"""
+
+from __future__ import annotations
+
+import contextlib
+
+from osgeo import ogr
+
+DEFAULT_SCALES = (200_000, 1_000_000)
+
+# OGC standardized rendering pixel size in metres.
+_PIXEL_METRES = 0.00028
+_METRES_PER_DEGREE = 111_320
+
+
+def overview_tolerance(scale: float, geographic: bool = False) -> float:
+    """Simplification tolerance in layer units for a map scale."""
+    tolerance = scale * _PIXEL_METRES
+    if geographic:
+        tolerance /= _METRES_PER_DEGREE
+    return tolerance
+
+
+def overview_table_name(base_name: str, scale: int) -> str:
+    if scale % 1_000_000 == 0:
+        return f"{base_name}_ov_{scale // 1_000_000}m"
+    if scale % 1000 == 0:
+        return f"{base_name}_ov_{scale // 1000}k"
+    return f"{base_name}_ov_{scale}"
+
+
+def scale_ranges(scales):
+    """Return [(scale, min_scale, max_scale)] visibility ranges.
+
+    The base layer is the entry with scale None. ``min_scale`` is the most
+    zoomed-out scale a layer is shown at (0 for no limit), following QGIS'
+    ``minimumScale`` convention.
+    """
+    levels = [None, *sorted(scales)]
+    ranges = []
+    for index, scale in enumerate(levels):
+        max_scale = scale or 0
+        min_scale = levels[index + 1] if index + 1 < len(levels) else 0
+        ranges.append((scale, min_scale, max_scale))
+    return ranges
+
+
+def _delete_layer(ds, name):
+    for index in range(ds.GetLayerCount()):
+        if ds.GetLayer(index).GetName() == name:
+            ds.DeleteLayer(index)
+            return
+
+
+def _write_overview(ds, source, name, tolerance, progress=None):
+    _delete_layer(ds, name)
+
+    geom_type = source.GetGeomType()
+    layer = ds.CreateLayer(name, source.GetSpatialRef(), geom_type)
+    if layer is None:
+        raise RuntimeError(f"Failed to create overview table: {name}")
+    source_defn = source.GetLayerDefn()
+    for index in range(source_defn.GetFieldCount()):
+        layer.CreateField(source_defn.GetFieldDefn(index))
+
+    is_polygon = ogr.GT_Flatten(geom_type) in (ogr.wkbPolygon, ogr.wkbMultiPolygon)
+    min_area = tolerance * tolerance
+    total = source.GetFeatureCount() or 1
+    written = 0
+
+    ds.StartTransaction()
+    try:
+        source.ResetReading()
+        for index, feature in enumerate(source):
+            geometry = feature.GetGeometryRef()
+            if geometry is None:
+                continue
+            simplified = geometry.SimplifyPreserveTopology(tolerance)
+            if simplified is None or simplified.IsEmpty():
+                continue
+            if is_polygon and simplified.GetArea() < min_area:
+                continue
+
+            out = ogr.Feature(layer.GetLayerDefn())
+            out.SetFrom(feature)
+            out.SetGeometry(ogr.ForceTo(simplified, geom_type))
+            if layer.CreateFeature(out) != ogr.OGRERR_NONE:
+                raise RuntimeError(f"Failed to write overview table: {name}")
+            written += 1
+            if progress is not None and index % 1000 == 0:
+                progress(index / total)
+        if ds.CommitTransaction() != ogr.OGRERR_NONE:
+            raise RuntimeError(f"Failed to commit overview table: {name}")
+    except BaseException:
+        # The table itself was created outside the transaction; drop it so
+        # no half-written overview stays registered in gpkg_contents.
+        with contextlib.suppress(RuntimeError):
+            ds.RollbackTransaction()
+        _delete_layer(ds, name)
+        raise
+    return layer, written
+
+
+def build_overviews(path, scales=DEFAULT_SCALES, geographic=False, progress=None):
+    """Add overview tables for ``scales`` to the first layer of a GeoPackage.
+
+    Args:
+        path: GeoPackage file holding the full resolution layer.
+        scales: Map scale denominators, e.g. (200000, 1000000).
+        geographic: Whether the layer CRS uses degrees.
+        progress: Optional callable receiving the fraction done.
+
+    Returns:
+        List of (table_name, scale, feature_count), finest first.
+
+    Raises:
+        OSError: If the file cannot be opened for update.
+    """
+    ds = ogr.Open(path, update=1)
+    if ds is None:
+        raise OSError(f"Failed to open GeoPackage: {path}")
+
+    try:
+        source = ds.GetLayer(0)
+        base_name = source.GetName()
+        scales = sorted(scales)
+        created = []
+        for level, scale in enumerate(scales):
+            name = overview_table_name(base_name, scale)
+
+            def level_progress(fraction, level=level):
+                if progress is not None:
+                    progress((level + fraction) / len(scales))
+
+            source, written = _write_overview(
+                ds, source, name, overview_tolerance(scale, geographic), level_progress
+            )
+            created.append((name, scale, written))
+        return created
+    finally:
+        ds = None
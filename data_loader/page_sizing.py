@@ -0,0 +1,135 @@
+"""
+Adaptive ``resultRecordCount`` for paged ``/query`` downloads.
+
+``AdaptivePageSizer`` starts with small pages and doubles the page size
+while the measured throughput (features per second) improves, up to the
+layer's ``maxRecordCount``. If a larger page turns out slower, it goes back
+to the best size seen and stays there. Failed requests and pages slower
+than ``slow_seconds`` halve the size and cap it for the rest of the run,
+which backs off from dense polygon pages before the server times out.
+"""
+
+from __future__ import annotations
+
+import math
+
+START_PAGE_SIZE = 250
+MIN_PAGE_SIZE = 25
+GROWTH_FACTOR = 2
+# Relative throughput change that counts as better or worse.
+TOLERANCE = 0.1
+SLOW_PAGE_SECONDS = 30.0
+RETRIES_AT_MINIMUM = 2
+
+
+def pages_needed(count: int, max_size: int, start: int = START_PAGE_SIZE) -> int:
+    """Number of pages ``count`` features take with unhindered growth.
+
+    The size starts at ``start`` and grows by ``GROWTH_FACTOR`` after every
+    page up to ``max_size``, as ``AdaptivePageSizer`` does while throughput
+    keeps improving. Settling early or backing off only adds pages, so this
+    is a lower bound.
+    """
+    max_size = max(1, int(max_size))
+    size = max(1, min(int(start), max_size))
+    pages = 0
+    remaining = count
+    while remaining > 0 and size < max_size:
+        pages += 1
+        remaining -= size
+        size = min(size * GROWTH_FACTOR, max_size)
+    return pages + max(0, math.ceil(remaining / max_size))
+
+
+class AdaptivePageSizer:
+    """Pick the size of the next page from per-page measurements.
+
+    Args:
+        max_size: Largest page the server returns (``maxRecordCount``).
+        start: Size of the first page.
+        min_size: Smallest size backing off goes to.
+        slow_seconds: Pages taking longer are treated like a timeout.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        start: int = START_PAGE_SIZE,
+        min_size: int = MIN_PAGE_SIZE,
+        slow_seconds: float = SLOW_PAGE_SECONDS,
+    ):
+        self.max_size = max(1, int(max_size))
+        self.min_size = max(1, min(int(min_size), self.max_size))
+        self.slow_seconds = slow_seconds
+        self.size = max(self.min_size, min(int(start), self.max_size))
+        self.sizes = [self.size]
+        self.pages = 0
+        self.features = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.errors = 0
+        self._ceiling = self.max_size
+        self._best_size = None
+        self._best_rate = 0.0
+        self._settled = False
+        self._failures = 0
+
+    def _set(self, size: int) -> None:
+        size = max(self.min_size, min(size, self._ceiling))
+        if size != self.size:
+            self.size = size
+            self.sizes.append(size)
+
+    def _back_off(self) -> None:
+        self._ceiling = max(self.min_size, self.size // GROWTH_FACTOR)
+        self._best_size = None
+        self._best_rate = 0.0
+        self._settled = False
+        self._set(self._ceiling)
+
+    def record(self, features: int, seconds: float, nbytes: int = 0) -> None:
+        """Account for a page of ``features`` fetched at the current size."""
+        self.pages += 1
+        self.features += features
+        self.bytes += nbytes
+        self.seconds += seconds
+        self._failures = 0
+
+        if seconds > self.slow_seconds:
+            self._back_off()
+            return
+        if features < self.size:
+            # A short page (the last one) says nothing about the size.
+            return
+
+        rate = features / max(seconds, 1e-6)
+        if self._best_size is None or rate > self._best_rate * (1 + TOLERANCE):
+            self._best_size = self.size
+            self._best_rate = rate
+            if not self._settled:
+                self._set(self.size * GROWTH_FACTOR)
+        elif self.size == self._best_size:
+            self._best_rate = rate
+        elif rate < self._best_rate * (1 - TOLERANCE):
+            self._settled = True
+            self._set(self._best_size)
+        else:
+            self._settled = True
+
+    def failure(self) -> bool:
+        """Account for a failed page; False once retrying is pointless."""
+        self.errors += 1
+        if self.size > self.min_size:
+            self._back_off()
+            return True
+        self._failures += 1
+        return self._failures <= RETRIES_AT_MINIMUM
+
+    def summary(self) -> str:
+        rate = self.features / self.seconds if self.seconds else 0.0
+        kb_rate = self.bytes / 1024 / self.seconds if self.seconds else 0.0
+        return (
+            f"Page sizes {' → '.join(str(size) for size in self.sizes)}: "
+            f"{self.pages} page(s), {rate:,.0f} features/s, {kb_rate:,.0f} KB/s, "
+            f"{self.errors} failed request(s)"
+        )
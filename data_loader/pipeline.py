@@ -0,0 +1,269 @@
+"""
+Staged producer-consumer pipeline with bounded queues.
+
+A source stage runs on its own thread, a pool of worker threads transforms
+its items and the calling thread consumes the results in source order::
+
+    source ──queue──▶ workers ──queue──▶ consume (caller)
+
+Both queues are bounded: a slow consumer blocks the workers and the workers
+block the source. Results wait in a reorder buffer until the ones before
+them are consumed, so the source also takes a slot per item, released once
+the item is consumed; at most ``max_in_flight`` items are in flight at any
+time instead of the whole download, even when one worker stalls.
+
+Each stage records how long it was busy, blocked on a full output queue and
+starved on an empty input queue.
+"""
+
+from __future__ import annotations
+
+import ntpath
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import spawn
+
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 4
+
+_DONE = object()
+_POLL_SECONDS = 0.1
+
+
+def spawns_python(executable: str | None = None) -> bool:
+    """Whether ``spawn`` worker processes would start a Python interpreter.
+
+    Inside QGIS desktop or ``qgis_process`` the executable is the QGIS
+    binary, and spawning it would start another QGIS instead of a worker.
+
+    Args:
+        executable: Path to check; defaults to the one ``multiprocessing``
+            spawns (``sys.executable`` unless changed).
+    """
+    if executable is None:
+        executable = spawn.get_executable() or sys.executable
+    if not executable:
+        return False
+    # ntpath splits on both separators, so Windows paths work everywhere.
+    name = ntpath.basename(os.fsdecode(executable)).lower()
+    return re.fullmatch(r"(python|pypy)[0-9.]*w?(\.exe)?", name) is not None
+
+
+class StageMetrics:
+    """Counters of one pipeline stage, summed over its threads."""
+
+    def __init__(self, name: str, threads: int = 1):
+        self.name = name
+        self.threads = threads
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.starved_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, items=0, busy=0.0, blocked=0.0, starved=0.0):
+        with self._lock:
+            self.items += items
+            self.busy_seconds += busy
+            self.blocked_seconds += blocked
+            self.starved_seconds += starved
+
+    def utilization(self, wall_seconds: float) -> float:
+        if wall_seconds <= 0:
+            return 0.0
+        return min(self.busy_seconds / (wall_seconds * self.threads), 1.0)
+
+    def summary(self, wall_seconds: float) -> str:
+        return (
+            f"{self.name}: {self.items} item(s), "
+            f"{self.utilization(wall_seconds):.0%} busy, "
+            f"{self.blocked_seconds:.1f}s blocked, "
+            f"{self.starved_seconds:.1f}s waiting"
+        )
+
+
+class Pipeline:
+    """Run ``source`` → ``transform`` → ``consume`` as overlapping stages.
+
+    Args:
+        source: Iterable producing the input items; iterated on one thread.
+        transform: Function applied to every item on the worker threads.
+        workers: Number of transform threads.
+        queue_size: Capacity of each queue between stages.
+        max_in_flight: Items produced but not consumed yet; defaults to
+            what the queues and workers hold.
+        names: Stage names used in the metrics.
+    """
+
+    def __init__(
+        self,
+        source,
+        transform,
+        workers: int = DEFAULT_WORKERS,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        max_in_flight: int | None = None,
+        names=("source", "transform", "consume"),
+    ):
+        self.source = source
+        self.transform = transform
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.metrics = [
+            StageMetrics(names[0]),
+            StageMetrics(names[1], self.workers),
+            StageMetrics(names[2]),
+        ]
+        self.wall_seconds = 0.0
+
+        self._inputs = queue.Queue(self.queue_size)
+        self._outputs = queue.Queue(self.queue_size)
+        self.max_in_flight = max(1, max_in_flight or 2 * self.queue_size + self.workers)
+        self._slots = threading.Semaphore(self.max_in_flight)
+        self._abort = threading.Event()
+
+    def _acquire_slot(self, metrics) -> bool:
+        start = time.perf_counter()
+        try:
+            while not self._abort.is_set():
+                if self._slots.acquire(timeout=_POLL_SECONDS):
+                    return True
+            return False
+        finally:
+            metrics.add(blocked=time.perf_counter() - start)
+
+    def _put(self, q, item, metrics) -> bool:
+        start = time.perf_counter()
+        try:
+            while not self._abort.is_set():
+                try:
+                    q.put(item, timeout=_POLL_SECONDS)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            metrics.add(blocked=time.perf_counter() - start)
+
+    def _get(self, q, metrics):
+        start = time.perf_counter()
+        try:
+            while not self._abort.is_set():
+                try:
+                    return q.get(timeout=_POLL_SECONDS)
+                except queue.Empty:
+                    continue
+            return _DONE
+        finally:
+            metrics.add(starved=time.perf_counter() - start)
+
+    def _run_source(self):
+        # Errors propagate into the stage's future and are raised by run();
+        # leaving early stops every stage.
+        metrics = self.metrics[0]
+        finished = False
+        try:
+            iterator = iter(self.source)
+            seq = 0
+            while self._acquire_slot(metrics):
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    metrics.add(busy=time.perf_counter() - start)
+                metrics.add(items=1)
+                if not self._put(self._inputs, (seq, item), metrics):
+                    break
+                seq += 1
+            finished = True
+        finally:
+            if not finished:
+                self._abort.set()
+            for _ in range(self.workers):
+                if not self._put(self._inputs, _DONE, metrics):
+                    break
+
+    def _run_worker(self):
+        metrics = self.metrics[1]
+        finished = False
+        try:
+            while True:
+                entry = self._get(self._inputs, metrics)
+                if entry is _DONE:
+                    break
+                seq, item = entry
+                start = time.perf_counter()
+                try:
+                    result = self.transform(item)
+                finally:
+                    metrics.add(busy=time.perf_counter() - start)
+                metrics.add(items=1)
+                if not self._put(self._outputs, (seq, result), metrics):
+                    break
+            finished = True
+        finally:
+            if not finished:
+                self._abort.set()
+            self._put(self._outputs, _DONE, metrics)
+
+    def run(self, consume, cancelled=None) -> bool:
+        """Feed every transformed item to ``consume`` in source order.
+
+        Args:
+            consume: Function called on the caller's thread for each result.
+            cancelled: Optional callable; the pipeline stops when it returns
+                True.
+
+        Returns:
+            True if all items were consumed, False if cancelled.
+
+        Raises:
+            Exception: The error raised by the source or a transform.
+        """
+        metrics = self.metrics[2]
+        started = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=1 + self.workers)
+        stages = [executor.submit(self._run_source)]
+        stages += [executor.submit(self._run_worker) for _ in range(self.workers)]
+
+        pending = {}
+        next_seq = 0
+        finished_workers = 0
+        completed = False
+        try:
+            while finished_workers < self.workers:
+                if cancelled is not None and cancelled():
+                    break
+                entry = self._get(self._outputs, metrics)
+                if entry is _DONE:
+                    finished_workers += 1
+                    continue
+                seq, result = entry
+                pending[seq] = result
+                while next_seq in pending and not self._abort.is_set():
+                    start = time.perf_counter()
+                    consume(pending.pop(next_seq))
+                    metrics.add(items=1, busy=time.perf_counter() - start)
+                    self._slots.release()
+                    next_seq += 1
+            else:
+                completed = True
+        finally:
+            self._abort.set()
+            executor.shutdown(wait=True)
+            self.wall_seconds = time.perf_counter() - started
+
+        for stage in stages:
+            if stage.exception() is not None:
+                raise stage.exception()
+        return completed
+
+    def summary(self) -> list[str]:
+        """Return one metrics line per stage."""
+        return [m.summary(self.wall_seconds) for m in self.metrics]
@@ -0,0 +1,462 @@
+"""
+Rendering benchmark for converted RasterFill symbology.
+
+Renders synthetic vegetation polygons headless with
+``QgsMapRendererParallelJob`` for every pattern type ``style_converter``
+recognises, at several map scales, in four representations:
+
+``rasterfill``
+    The original RasterFill symbol with the tile image.
+``native``
+    The converted SimpleFill + PointPatternFill / LinePatternFill layers.
+``native_lod``
+    The converted layers with the flat average color beyond ``LOD_SCALE``.
+``flat``
+    Only a SimpleFill in the tile's average color.
+
+Each render is compared with the RasterFill render at the same scale after
+both are smoothed down to a thumbnail, which is roughly how the pattern
+reads on screen. The fastest representation within the tolerance is picked
+per pattern and scale, and per pattern over all scales::
+
+    python -m data_loader.render_benchmark --scales 5000 25000 100000 500000 \\
+        --repeat 5 --report render.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+PATTERNS = (
+    "dot_grid",
+    "dot_staggered",
+    "dot_grid_plus",
+    "diamond_hatch",
+    "semi_transparent_hatch",
+    "tricolor_dot",
+    "dot_sparse_pair",
+)
+VARIANTS = ("rasterfill", "native", "native_lod", "flat")
+REFERENCE = "rasterfill"
+DEFAULT_SCALES = (5_000, 25_000, 100_000, 500_000)
+DEFAULT_SIZE = 512
+DEFAULT_REPEAT = 3
+# Mean absolute channel difference (0-1) still considered the same look.
+DEFAULT_TOLERANCE = 0.03
+THUMBNAIL_SIZE = 64
+DPI = 96
+
+_CRS = "EPSG:6677"
+_GRID_CELLS = 80
+_CELL_METRES = 2_500
+_BACKGROUND = (255, 255, 255)
+_COLORS = {
+    "bg": (214, 232, 190, 255),
+    "fg": (70, 130, 60, 255),
+    "third": (196, 86, 70, 255),
+}
+
+
+# ---------------------------------------------------------------------------
+# Result evaluation
+# ---------------------------------------------------------------------------
+
+
+def mean_difference(pixels_a, pixels_b) -> float:
+    """Mean absolute per-channel difference of two RGB pixel sequences (0-1)."""
+    total = 0
+    count = 0
+    for a, b in zip(pixels_a, pixels_b):
+        total += abs(a[0] - b[0]) + abs(a[1] - b[1]) + abs(a[2] - b[2])
+        count += 3
+    return total / (count * 255) if count else 0.0
+
+
+def pick_fastest(results, tolerance: float = DEFAULT_TOLERANCE) -> dict:
+    """Pick the fastest visually equivalent variant per pattern.
+
+    Args:
+        results: Dicts with ``pattern``, ``variant``, ``scale``, ``seconds``
+            and ``difference`` (to the reference render at that scale).
+        tolerance: Largest ``difference`` still considered equivalent.
+
+    Returns:
+        ``{pattern: {"by_scale": {scale: variant}, "overall": variant}}``.
+        ``overall`` is the variant with the lowest total time among those
+        equivalent at every scale.
+    """
+    by_pattern: dict[str, list[dict]] = {}
+    for result in results:
+        by_pattern.setdefault(result["pattern"], []).append(result)
+
+    picks = {}
+    for pattern, rows in by_pattern.items():
+        by_scale = {}
+        for scale in sorted({row["scale"] for row in rows}):
+            candidates = [
+                row
+                for row in rows
+                if row["scale"] == scale and row["difference"] <= tolerance
+            ]
+            if candidates:
+                by_scale[scale] = min(candidates, key=lambda r: r["seconds"])["variant"]
+
+        totals: dict[str, float] = {}
+        rejected = set()
+        for row in rows:
+            if row["difference"] > tolerance:
+                rejected.add(row["variant"])
+            totals[row["variant"]] = totals.get(row["variant"], 0.0) + row["seconds"]
+        overall = min(
+            (variant for variant in totals if variant not in rejected),
+            key=totals.get,
+            default=None,
+        )
+        picks[pattern] = {"by_scale": by_scale, "overall": overall}
+    return picks
+
+
+def format_table(results, picks) -> list[str]:
+    """Human-readable result lines, marking the picked variants."""
+    lines = [
+        f"{'pattern':<24}{'scale':>10}  {'variant':<12}{'ms':>9}{'diff':>8}",
+    ]
+    for result in sorted(
+        results,
+        key=lambda r: (
+            PATTERNS.index(r["pattern"]) if r["pattern"] in PATTERNS else 99,
+            r["scale"],
+            r["seconds"],
+        ),
+    ):
+        pick = picks.get(result["pattern"], {})
+        picked = pick.get("by_scale", {}).get(result["scale"])
+        mark = "*" if picked == result["variant"] else " "
+        lines.append(
+            f"{result['pattern']:<24}{result['scale']:>10}{mark} "
+            f"{result['variant']:<12}{result['seconds'] * 1000:>9.1f}"
+            f"{result['difference']:>8.3f}"
+        )
+    lines.append("")
+    for pattern, pick in picks.items():
+        lines.append(f"{pattern:<24}fastest overall: {pick['overall']}")
+    return lines
+
+
+# ---------------------------------------------------------------------------
+# Synthetic data
+# ---------------------------------------------------------------------------
+
+
+def _tile_pixels(pattern: str):
+    """Return (size, {(x, y): color key}) for a tile classified as ``pattern``."""
+    pixels = {}
+    if pattern in ("dot_grid", "dot_grid_plus"):
+        size = 12
+        for y in range(0, 12, 2):
+            for x in range(0, 12, 2):
+                pixels[(x, y)] = "fg"
+        if pattern == "dot_grid_plus":
+            for y in (3, 7, 11):
+                for x in (1, 5, 9):
+                    pixels[(x, y)] = "fg"
+    elif pattern == "dot_staggered":
+        size = 12
+        for rows, cols in (((0, 4, 8), (0, 4, 8)), ((2, 6, 10), (2, 6, 10))):
+            for y in rows:
+                for x in cols:
+                    pixels[(x, y)] = "fg"
+    elif pattern == "diamond_hatch":
+        size = 40
+        for y in range(size):
+            for x in range(size):
+                if (x + y) % 8 < 3 or (x - y) % 8 < 3:
+                    pixels[(x, y)] = "fg"
+    elif pattern == "semi_transparent_hatch":
+        size = 64
+        for y in range(size):
+            for x in range(size):
+                pixels[(x, y)] = "fg" if (x + y) % 7 == 0 else "clear"
+    elif pattern == "tricolor_dot":
+        size = 64
+        for y in range(0, size, 8):
+            for x in range((y // 8) % 2 * 4, size, 8):
+                for dx, dy in ((0, 0), (1, 0), (0, 1), (1, 1)):
+                    pixels[(x + dx, y + dy)] = "fg"
+        for y in range(4, size, 16):
+            for x in range(2, size, 16):
+                for dx, dy in ((0, 0), (1, 0), (0, 1), (1, 1)):
+                    pixels[(x + dx, y + dy)] = "third"
+    elif pattern == "dot_sparse_pair":
+        size = 80
+        for y in range(0, size, 4):
+            for x in range(0, size, 4):
+                pixels[(x, y)] = "fg"
+    else:
+        raise ValueError(f"Unknown pattern type: {pattern}")
+    return size, pixels
+
+
+def _tile_base64(pattern: str, temp_dir: str) -> str:
+    from qgis.PyQt.QtGui import QColor, QImage
+
+    size, pixels = _tile_pixels(pattern)
+    image = QImage(size, size, QImage.Format.Format_ARGB32)
+    image.fill(QColor(*_COLORS["bg"]))
+    for (x, y), key in pixels.items():
+        color = QColor(0, 0, 0, 0) if key == "clear" else QColor(*_COLORS[key])
+        image.setPixelColor(x, y, color)
+
+    path = os.path.join(temp_dir, f"{pattern}.png")
+    image.save(path, "PNG")
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode()
+
+
+def _synthetic_layer():
+    """Memory layer of irregular polygons tiling the benchmark area."""
+    import random
+
+    from qgis.core import QgsFeature, QgsGeometry, QgsPointXY, QgsVectorLayer
+
+    rng = random.Random(0)
+    jitter = _CELL_METRES * 0.35
+    corners = {
+        (i, j): QgsPointXY(
+            i * _CELL_METRES + rng.uniform(-jitter, jitter),
+            j * _CELL_METRES + rng.uniform(-jitter, jitter),
+        )
+        for i in range(_GRID_CELLS + 1)
+        for j in range(_GRID_CELLS + 1)
+    }
+
+    layer = QgsVectorLayer(f"Polygon?crs={_CRS}", "vegetation", "memory")
+    features = []
+    for i in range(_GRID_CELLS):
+        for j in range(_GRID_CELLS):
+            ring = [
+                corners[(i, j)],
+                corners[(i + 1, j)],
+                corners[(i + 1, j + 1)],
+                corners[(i, j + 1)],
+                corners[(i, j)],
+            ]
+            feature = QgsFeature()
+            feature.setGeometry(QgsGeometry.fromPolygonXY([ring]))
+            features.append(feature)
+    layer.dataProvider().addFeatures(features)
+    layer.updateExtents()
+    return layer
+
+
+# ---------------------------------------------------------------------------
+# Symbols and rendering
+# ---------------------------------------------------------------------------
+
+
+def _symbol_from_layers(layers):
+    import xml.etree.ElementTree as ET
+
+    from qgis.core import QgsReadWriteContext, QgsSymbolLayerUtils
+    from qgis.PyQt.QtXml import QDomDocument
+
+    element = ET.Element(
+        "symbol",
+        {
+            "type": "fill",
+            "name": "benchmark",
+            "alpha": "1",
+            "clip_to_extent": "1",
+            "force_rhr": "0",
+        },
+    )
+    element.extend(layers)
+    doc = QDomDocument()
+    doc.setContent(ET.tostring(element, encoding="unicode"))
+    return QgsSymbolLayerUtils.loadSymbol(doc.documentElement(), QgsReadWriteContext())
+
+
+def build_symbols(pattern: str, temp_dir: str) -> tuple[dict, str]:
+    """Return ({variant: QgsFillSymbol}, detected pattern type) for a pattern."""
+    from qgis.core import QgsFillSymbol, QgsRasterFillSymbolLayer
+
+    from . import style_converter
+
+    b64 = _tile_base64(pattern, temp_dir)
+    info = style_converter._analyze_tile(b64, pattern)
+    size = info["w"]
+
+    raster = QgsFillSymbol()
+    raster.changeSymbolLayer(
+        0,
+        QgsRasterFillSymbolLayer.create(
+            {
+                "imageFile": f"base64:{b64}",
+                "width": str(size * style_converter.PIXEL_SIZE),
+                "width_unit": "Point",
+                "size_unit": "Point",
+            }
+        ),
+    )
+
+    symbols = {
+        "rasterfill": raster,
+        "native": _symbol_from_layers(
+            style_converter._convert_pattern_to_layers("benchmark", info)
+        ),
+        "native_lod": _symbol_from_layers(
+            style_converter._convert_pattern_to_layers(
+                "benchmark", info, style_converter.LOD_SCALE
+            )
+        ),
+        "flat": _symbol_from_layers(
+            [style_converter._build_simple_fill_layer(info["avg_qgis"])]
+        ),
+    }
+    return symbols, info["type"]
+
+
+def _map_settings(layer, scale: float, size: int):
+    from qgis.core import QgsMapSettings, QgsRectangle
+    from qgis.PyQt.QtCore import QSize
+    from qgis.PyQt.QtGui import QColor
+
+    center = layer.extent().center()
+    half = scale * size * 0.0254 / DPI / 2
+    settings = QgsMapSettings()
+    settings.setLayers([layer])
+    settings.setDestinationCrs(layer.crs())
+    settings.setOutputSize(QSize(size, size))
+    settings.setOutputDpi(DPI)
+    settings.setBackgroundColor(QColor(*_BACKGROUND))
+    settings.setExtent(
+        QgsRectangle(
+            center.x() - half, center.y() - half, center.x() + half, center.y() + half
+        )
+    )
+    return settings
+
+
+def _render(settings):
+    from qgis.core import QgsMapRendererParallelJob
+
+    job = QgsMapRendererParallelJob(settings)
+    start = time.perf_counter()
+    job.start()
+    job.waitForFinished()
+    return time.perf_counter() - start, job.renderedImage()
+
+
+def _thumbnail_pixels(image):
+    from qgis.PyQt.QtCore import Qt
+    from qgis.PyQt.QtGui import qBlue, qGreen, qRed
+
+    small = image.scaled(
+        THUMBNAIL_SIZE,
+        THUMBNAIL_SIZE,
+        Qt.AspectRatioMode.IgnoreAspectRatio,
+        Qt.TransformationMode.SmoothTransformation,
+    )
+    pixels = []
+    for y in range(small.height()):
+        for x in range(small.width()):
+            px = small.pixel(x, y)
+            pixels.append((qRed(px), qGreen(px), qBlue(px)))
+    return pixels
+
+
+def run_benchmark(
+    patterns=PATTERNS,
+    scales=DEFAULT_SCALES,
+    size: int = DEFAULT_SIZE,
+    repeat: int = DEFAULT_REPEAT,
+    log=print,
+) -> list[dict]:
+    """Render every pattern, variant and scale; needs an initialised QGIS.
+
+    Returns:
+        Result dicts for ``pick_fastest``. ``seconds`` is the median of
+        ``repeat`` timed renders after one untimed warm-up render.
+    """
+    from qgis.core import QgsSingleSymbolRenderer
+
+    layer = _synthetic_layer()
+    temp_dir = tempfile.mkdtemp(prefix="moe_render_")
+    results = []
+    try:
+        for pattern in patterns:
+            symbols, detected = build_symbols(pattern, temp_dir)
+            if detected != pattern:
+                log(f"warning: synthetic {pattern} tile was analysed as {detected}")
+
+            for scale in scales:
+                reference = None
+                for variant in VARIANTS:
+                    layer.setRenderer(QgsSingleSymbolRenderer(symbols[variant].clone()))
+                    settings = _map_settings(layer, scale, size)
+                    _, image = _render(settings)
+                    timings = [_render(settings)[0] for _ in range(max(1, repeat))]
+                    pixels = _thumbnail_pixels(image)
+                    if variant == REFERENCE:
+                        reference = pixels
+                    results.append(
+                        {
+                            "pattern": pattern,
+                            "variant": variant,
+                            "scale": scale,
+                            "seconds": statistics.median(timings),
+                            "difference": round(mean_difference(pixels, reference), 4),
+                        }
+                    )
+                log(f"{pattern} 1:{scale} done")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark converted pattern symbols against RasterFill."
+    )
+    parser.add_argument(
+        "--patterns", nargs="+", choices=PATTERNS, default=list(PATTERNS)
+    )
+    parser.add_argument("--scales", nargs="+", type=int, default=list(DEFAULT_SCALES))
+    parser.add_argument("--size", type=int, default=DEFAULT_SIZE, help="Pixels")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--report", help="Write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    from qgis.core import QgsApplication
+
+    QgsApplication.setPrefixPath(os.environ.get("QGIS_PREFIX_PATH", "/usr"), True)
+    qgs_app = QgsApplication([], False)
+    qgs_app.initQgis()
+    try:
+        results = run_benchmark(
+            args.patterns, args.scales, args.size, args.repeat, log=print
+        )
+    finally:
+        qgs_app.exitQgis()
+
+    picks = pick_fastest(results, args.tolerance)
+    print("\n".join(format_table(results, picks)))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(
+                {"results": results, "picks": picks}, f, ensure_ascii=False, indent=2
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+Class totals computed by the server (``outStatistics``).
+
+Instead of downloading polygons, the FeatureServer is asked for feature
+counts (and summed areas, when the layer has a shape area field) per
+combination of the group-by fields. Several services, e.g. the prefectures
+of a dataset, are queried concurrently.
+
+Summed areas are in the units of the service's spatial reference (e.g.
+square metres of Web Mercator, not ground area); each row carries the
+layer's ``spatialReference`` so the unit can be reported with the sum.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+
+from . import esri_rest
+
+DEFAULT_WORKERS = 8
+COUNT_FIELD = "feature_count"
+AREA_FIELD = "area_sum"
+AREA_UNIT_FIELD = "area_unit"
+SPATIAL_REFERENCE = "spatial_reference"
+
+_AREA_FIELD_NAMES = {"shape__area", "shape_area", "shape.starea()", "st_area(shape)"}
+
+
+def area_field(layer_meta: dict) -> str | None:
+    """Name of the layer's shape area field, if it has one."""
+    for field in layer_meta.get("fields") or []:
+        if (field.get("name") or "").lower() in _AREA_FIELD_NAMES:
+            return field["name"]
+    return None
+
+
+def layer_spatial_reference(service_meta: dict, layer_meta: dict) -> dict:
+    """The Esri ``spatialReference`` of a layer, falling back to its service."""
+    return (
+        (layer_meta.get("extent") or {}).get("spatialReference")
+        or layer_meta.get("spatialReference")
+        or service_meta.get("spatialReference")
+        or {}
+    )
+
+
+def resolve_fields(layer_meta: dict, names) -> list[str]:
+    """Map requested field names onto the layer's (case-insensitive).
+
+    Raises:
+        ValueError: If a field does not exist in the layer.
+    """
+    available = {
+        (field.get("name") or "").lower(): field["name"]
+        for field in layer_meta.get("fields") or []
+    }
+    resolved = []
+    for name in names:
+        if name.lower() not in available:
+            raise ValueError(f"Field not found: {name}")
+        resolved.append(available[name.lower()])
+    return resolved
+
+
+def statistics_definitions(layer_meta: dict) -> list[dict]:
+    definitions = [
+        {
+            "statisticType": "count",
+            "onStatisticField": esri_rest.object_id_field(layer_meta),
+            "outStatisticFieldName": COUNT_FIELD,
+        }
+    ]
+    shape_area = area_field(layer_meta)
+    if shape_area:
+        definitions.append(
+            {
+                "statisticType": "sum",
+                "onStatisticField": shape_area,
+                "outStatisticFieldName": AREA_FIELD,
+            }
+        )
+    return definitions
+
+
+def normalize_row(attributes: dict, group_fields) -> dict:
+    """Pick the group and statistic values out of a result row.
+
+    Servers may change the case of the output field names.
+    """
+    lowered = {key.lower(): value for key, value in attributes.items()}
+    row = {name: lowered.get(name.lower()) for name in group_fields}
+    row[COUNT_FIELD] = lowered.get(COUNT_FIELD) or 0
+    row[AREA_FIELD] = lowered.get(AREA_FIELD)
+    return row
+
+
+def service_statistics(url: str, group_fields, fetch=esri_rest.fetch_json) -> list:
+    """Class totals of the first layer of a FeatureServer."""
+    service_meta = fetch(url)
+    layers = service_meta.get("layers") or []
+    if not layers:
+        raise esri_rest.RestError(f"No layers found in FeatureServer: {url}")
+    layer_url = f"{url}/{layers[0].get('id')}"
+    layer_meta = fetch(layer_url)
+
+    fields = resolve_fields(layer_meta, group_fields)
+    data = fetch(
+        f"{layer_url}/query",
+        esri_rest.statistics_params(statistics_definitions(layer_meta), fields),
+    )
+    rows = [feature.get("attributes") or {} for feature in data.get("features") or []]
+    spatial_reference = layer_spatial_reference(service_meta, layer_meta)
+    return [
+        {**normalize_row(row, group_fields), SPATIAL_REFERENCE: spatial_reference}
+        for row in rows
+    ]
+
+
+def collect_statistics(
+    targets, group_fields, workers=DEFAULT_WORKERS, fetch=esri_rest.fetch_json
+):
+    """Query several services concurrently.
+
+    Args:
+        targets: Sequence of (label, FeatureServer URL).
+        group_fields: Fields to group by.
+        workers: Concurrent requests.
+        fetch: Callable ``(url, params=None) -> dict`` for the requests.
+
+    Returns:
+        (rows, errors): rows carry a ``source`` key with the target label,
+        in target order; errors maps labels to messages.
+    """
+    targets = list(targets)
+
+    def run(target):
+        _, url = target
+        try:
+            return service_statistics(url, group_fields, fetch), None
+        except esri_rest.REQUEST_ERRORS as e:
+            return None, str(e)
+
+    rows = []
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for (label, _), (result, error) in zip(targets, executor.map(run, targets)):
+            if error is not None:
+                errors[label] = error
+                continue
+            for row in sorted(result, key=lambda r: -(r[COUNT_FIELD] or 0)):
+                rows.append({"source": label, **row})
+    return rows, errors
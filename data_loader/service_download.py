@@ -0,0 +1,238 @@
+"""
+Download every layer and table of a FeatureServer into one GeoPackage.
+
+Each layer is fetched and decoded on its own thread into a staging
+GeoPackage, because SQLite allows only one writer per file. The staging
+files are appended to the output one table at a time once all downloads
+have finished; the output's spatial indexes are built by that copy.
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from osgeo import gdal
+from qgis.core import (
+    Qgis,
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransform,
+    QgsCsException,
+    QgsFeatureSink,
+)
+
+from . import api, esri_rest, mirror, page_sizing, writers
+
+DEFAULT_WORKERS = 4
+
+
+class _StagingWriter(writers.GeoPackageBulkWriter):
+    """Bulk writer for a staging file; the output gets the spatial index."""
+
+    def _finish(self):
+        pass
+
+
+def _server_pages(layer_url, layer_meta, sizer):
+    for _, page in esri_rest.iter_query_pages(layer_url, layer_meta, sizer=sizer):
+        yield page
+
+
+def _download_entry(
+    url,
+    service_meta,
+    entry,
+    table,
+    staging_path,
+    crs,
+    transform_context,
+    service_dir,
+    cancelled,
+):
+    sizer = None
+    if service_dir:
+        layer_meta, page_paths = mirror.read_layer(service_dir, entry.get("id"))
+        if layer_meta is None:
+            raise ValueError(f"Layer {entry.get('id')} is not in the mirror")
+        pages = mirror.read_pages(page_paths)
+    else:
+        layer_url = f"{url}/{entry.get('id')}"
+        layer_meta = esri_rest.fetch_json(layer_url)
+        sizer = page_sizing.AdaptivePageSizer(esri_rest.max_record_count(layer_meta))
+        pages = _server_pages(layer_url, layer_meta, sizer)
+
+    geometry_type = layer_meta.get("geometryType", "")
+    has_z = bool(layer_meta.get("hasZ"))
+    has_m = bool(layer_meta.get("hasM"))
+    fields = api.fields_from_esri(layer_meta.get("fields"))
+    transform = None
+    if geometry_type:
+        wkb_type = api.wkb_type_from_esri(layer_meta)
+        source_crs = api.layer_crs(service_meta, layer_meta)
+        output_crs = crs if crs is not None and crs.isValid() else source_crs
+        if source_crs is not None and output_crs != source_crs:
+            transform = QgsCoordinateTransform(
+                source_crs, output_crs, transform_context
+            )
+    else:
+        wkb_type = Qgis.WkbType.NoGeometry
+        output_crs = None
+
+    writer = _StagingWriter(
+        staging_path,
+        fields,
+        wkb_type,
+        output_crs or QgsCoordinateReferenceSystem(),
+        transform_context,
+        table,
+    )
+    if writer.hasError():
+        raise OSError(writer.errorMessage())
+
+    written = skipped = 0
+    try:
+        for page in pages:
+            if cancelled():
+                raise RuntimeError("Canceled")
+            quantization = page.get("transform")
+            for item in page.get("features") or []:
+                try:
+                    feature = api.feature_from_esri(
+                        item,
+                        fields,
+                        geometry_type,
+                        has_z,
+                        has_m,
+                        transform,
+                        quantization,
+                    )
+                except QgsCsException:
+                    skipped += 1
+                    continue
+                writer.addFeature(feature, QgsFeatureSink.FastInsert)
+                written += 1
+    finally:
+        writer.close()
+    return layer_meta, written, skipped, sizer.summary() if sizer else None
+
+
+def _append_table(output_path, staging_path, table, create):
+    options = gdal.VectorTranslateOptions(
+        format="GPKG",
+        accessMode=None if create else "update",
+        layerName=table,
+    )
+    ds = gdal.VectorTranslate(output_path, staging_path, options=options)
+    if ds is None:
+        raise OSError(f"Failed to copy {table} into {output_path}")
+    ds = None
+
+
+def download_service(
+    url,
+    service_meta,
+    output_path,
+    crs=None,
+    transform_context=None,
+    service_dir=None,
+    workers=DEFAULT_WORKERS,
+    feedback=None,
+):
+    """Write all layers and tables of a FeatureServer to one GeoPackage.
+
+    Args:
+        url: FeatureServer URL.
+        service_meta: Its service metadata.
+        output_path: GeoPackage to create. An existing file is replaced only
+            when at least one layer or table was written.
+        crs: Output CRS of the layers, or None to keep each layer's CRS.
+        transform_context: Coordinate transform context of the project.
+        service_dir: Mirrored service directory to read instead of the server.
+        workers: Layers downloaded at the same time.
+        feedback: Optional QgsFeedback for progress and cancellation.
+
+    Returns:
+        One dict per layer and table in service order, with ``entry``,
+        ``table``, ``layer_meta``, ``features``, ``skipped``,
+        ``page_sizes`` (the page sizer summary of server downloads) and
+        ``error`` (None, or the message if the layer failed and was left
+        out).
+    """
+    cancelled = feedback.isCanceled if feedback is not None else (lambda: False)
+    entries = esri_rest.service_entries(service_meta)
+    tables = esri_rest.table_names(entries)
+    results = [
+        {
+            "entry": entry,
+            "table": table,
+            "layer_meta": None,
+            "features": 0,
+            "skipped": 0,
+            "page_sizes": None,
+            "error": None,
+        }
+        for entry, table in zip(entries, tables)
+    ]
+    staging_dir = tempfile.TemporaryDirectory(
+        prefix="moe_layers_", dir=os.path.dirname(output_path) or None
+    )
+    with staging_dir as staging:
+        staging_paths = [
+            os.path.join(staging, f"{index}.gpkg") for index in range(len(entries))
+        ]
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = {
+                executor.submit(
+                    _download_entry,
+                    url,
+                    service_meta,
+                    result["entry"],
+                    result["table"],
+                    staging_path,
+                    crs,
+                    transform_context,
+                    service_dir,
+                    cancelled,
+                ): result
+                for result, staging_path in zip(results, staging_paths)
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                result = futures[future]
+                if future.cancelled():
+                    result["error"] = "Canceled"
+                    continue
+                try:
+                    (
+                        result["layer_meta"],
+                        result["features"],
+                        result["skipped"],
+                        result["page_sizes"],
+                    ) = future.result()
+                except (*esri_rest.REQUEST_ERRORS, RuntimeError, EOFError) as e:
+                    result["error"] = str(e) or type(e).__name__
+                except KeyError as e:
+                    # e.g. a field without a name in the layer metadata
+                    result["error"] = f"Malformed layer metadata, missing {e}"
+                if feedback is not None:
+                    feedback.setProgress(int(done / len(futures) * 90))
+                if cancelled():
+                    for pending in futures:
+                        pending.cancel()
+
+        # Assemble the output next to the staging files and move it into
+        # place at the end, so a failed run keeps the previous file.
+        assembled_path = os.path.join(staging, "output.gpkg")
+        create = True
+        for result, staging_path in zip(results, staging_paths):
+            if result["error"] is not None:
+                continue
+            try:
+                _append_table(assembled_path, staging_path, result["table"], create)
+            except (OSError, RuntimeError) as e:
+                result["error"] = str(e)
+                continue
+            create = False
+        if not create:
+            os.replace(assembled_path, output_path)
+    return results
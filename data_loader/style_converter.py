@@ -4,20 +4,32 @@ RasterFill to QGIS native symbol conversion module.
 Converts RasterFill symbols (base64 tile images) found in QML style files
 from the MOE vegetation maps into native QGIS symbols
 (SimpleFill + PointPatternFill / LinePatternFill).
+
+Categories whose tiles analyse to the same pattern share one set of
+converted layers, built once and copied per symbol. The generated layers
+are kept compact: no per-layer ids (QGIS assigns them on load), no map
+unit scale options (the defaults apply) and no empty data defined
+property collections.
+
+Pattern fills are only drawn when zoomed in past ``LOD_SCALE``; further out
+a flat SimpleFill in the tile's blended average color takes their place,
+switched by data defined ``enabled`` properties on ``@map_scale``.
 """
 
 from __future__ import annotations
 
 import base64
+import copy
 import hashlib
-import uuid
 
 import xml.etree.ElementTree as ET
 
 try:
-    from defusedxml.ElementTree import parse as _safe_parse  # type: ignore[import-not-found]
+    from defusedxml.ElementTree import (  # type: ignore[import-not-found]
+        fromstring as _safe_fromstring,
+    )
 except ImportError:
-    _safe_parse = ET.parse
+    _safe_fromstring = ET.fromstring
 from typing import TypedDict
 
 from qgis.core import Qgis, QgsMessageLog
@@ -25,9 +37,11 @@ from qgis.PyQt.QtCore import QByteArray
 from qgis.PyQt.QtGui import QImage, qAlpha, qBlue, qGreen, qRed
 
 PIXEL_SIZE = 0.75
-SCALE_3X = "3x:0,0,0,0,0,0"
+# Pattern layers are replaced by a flat average color fill beyond 1:LOD_SCALE.
+LOD_SCALE = 100_000
 
 _LOG_TAG = "RasterFill Converter"
+_DOCTYPE = "<!DOCTYPE qgis PUBLIC 'http://mrcc.com/qgis.dtd' 'SYSTEM'>\n"
 
 
 class PatternInfo(TypedDict, total=False):
@@ -41,6 +55,7 @@ class PatternInfo(TypedDict, total=False):
     num_colors: int
     third: tuple[int, int, int, int]
     third_qgis: str
+    avg_qgis: str
     dx: float
     dy: float
     disp_x: float
@@ -54,22 +69,42 @@ class PatternInfo(TypedDict, total=False):
     line_width: float
 
 
-def convert_rasterfill_qml(qml_path: str) -> bool:
+def convert_rasterfill_qml(qml_path: str, lod_scale: int | None = LOD_SCALE) -> bool:
     """Convert RasterFill symbols in a QML file to native QGIS symbols.
 
+    Args:
+        qml_path: QML file, rewritten in place.
+        lod_scale: Scale denominator beyond which patterns are drawn as a flat
+            average color, or None to always draw them.
+
     Returns:
         True if conversion was performed, False otherwise.
     """
-    tree = _safe_parse(qml_path)
-    root = tree.getroot()
-    if root is None:
+    with open(qml_path, encoding="utf-8") as f:
+        content = convert_rasterfill_xml(f.read(), lod_scale)
+    if content is None:
         return False
+    with open(qml_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return True
+
+
+def convert_rasterfill_xml(xml: str, lod_scale: int | None = LOD_SCALE) -> str | None:
+    """Convert RasterFill symbols in a QML document held in memory.
 
+    Same as ``convert_rasterfill_qml`` for a style exported with
+    ``QgsMapLayer.exportNamedStyle``.
+
+    Returns:
+        The converted document, or None if there was nothing to convert.
+    """
+    root = _safe_fromstring(xml)
     symbols = root.find(".//symbols")
     if symbols is None:
-        return False
+        return None
 
     pattern_cache: dict[str, PatternInfo] = {}
+    layer_cache: dict[tuple, list[ET.Element]] = {}
     converted = 0
 
     for symbol in symbols.findall("symbol"):
@@ -104,7 +139,10 @@ def convert_rasterfill_qml(qml_path: str) -> bool:
             layer_list = list(symbol)
             raster_idx = layer_list.index(raster_layer)
 
-            new_layers = _convert_pattern_to_layers(sym_name, info)
+            signature = _pattern_signature(info)
+            if signature not in layer_cache:
+                layer_cache[signature] = _convert_pattern_to_layers("", info, lod_scale)
+            new_layers = _copy_layers(layer_cache[signature], sym_name)
 
             symbol.remove(raster_layer)
             for i, nl in enumerate(new_layers):
@@ -113,24 +151,20 @@ def convert_rasterfill_qml(qml_path: str) -> bool:
             converted += 1
 
     if converted == 0:
-        return False
-
-    ET.indent(tree, space="  ")
-    tree.write(qml_path, encoding="unicode", xml_declaration=False)
+        return None
 
-    with open(qml_path, "r") as f:
-        content = f.read()
-    with open(qml_path, "w") as f:
-        f.write("<!DOCTYPE qgis PUBLIC 'http://mrcc.com/qgis.dtd' 'SYSTEM'>\n")
-        f.write(content)
+    ET.indent(root, space="  ")
+    content = _DOCTYPE + ET.tostring(root, encoding="unicode")
 
     QgsMessageLog.logMessage(
         f"Converted {converted} RasterFill symbol(s) "
-        f"({len(pattern_cache)} unique pattern(s))",
+        f"({len(pattern_cache)} unique tile(s), {len(layer_cache)} distinct "
+        f"symbol(s)); QML size {len(xml.encode()):,} -> "
+        f"{len(content.encode()):,} bytes",
         _LOG_TAG,
         Qgis.Info,
     )
-    return True
+    return content
 
 
 # ===========================================================================
@@ -144,19 +178,59 @@ def _rgba_to_qgis(rgba: tuple[int, int, int, int]) -> str:
     return f"{r},{g},{b},{a},rgb:{rf:.7g},{gf:.7g},{bf:.7g},{af:.7g}"
 
 
-def _new_uuid() -> str:
-    return "{" + str(uuid.uuid4()) + "}"
+def _add_options(opt: ET.Element, params) -> None:
+    """Append ``(name, value)`` string options to an Option map."""
+    for pname, pval in params:
+        ET.SubElement(opt, "Option", value=pval, type="QString", name=pname)
+
+
+def _average_color(
+    colors: dict[tuple[int, int, int, int], int],
+) -> tuple[int, int, int, int]:
+    """Alpha-weighted blend of a color histogram, as seen from afar."""
+    total = sum(colors.values())
+    weight = sum(rgba[3] * n for rgba, n in colors.items())
+    if not total or not weight:
+        return (0, 0, 0, 0)
+    r, g, b = (
+        round(sum(rgba[i] * rgba[3] * n for rgba, n in colors.items()) / weight)
+        for i in range(3)
+    )
+    return (r, g, b, round(weight / total))
 
 
-def _make_data_defined_properties() -> ET.Element:
+def _make_enabled_property(expression: str) -> ET.Element:
+    """Data defined properties enabling a layer where ``expression`` holds."""
     ddp = ET.Element("data_defined_properties")
     opt = ET.SubElement(ddp, "Option", type="Map")
     ET.SubElement(opt, "Option", value="", type="QString", name="name")
-    ET.SubElement(opt, "Option", name="properties")
+    props = ET.SubElement(opt, "Option", type="Map", name="properties")
+    enabled = ET.SubElement(props, "Option", type="Map", name="enabled")
+    ET.SubElement(enabled, "Option", value="true", type="bool", name="active")
+    ET.SubElement(
+        enabled, "Option", value=expression, type="QString", name="expression"
+    )
+    # 3 = QgsProperty::ExpressionBasedProperty
+    ET.SubElement(enabled, "Option", value="3", type="int", name="type")
     ET.SubElement(opt, "Option", value="collection", type="QString", name="type")
     return ddp
 
 
+def _pattern_signature(info: PatternInfo) -> tuple:
+    """Key under which patterns convert to identical layers."""
+    return tuple(sorted(info.items()))
+
+
+def _copy_layers(template: list[ET.Element], sym_name: str) -> list[ET.Element]:
+    """Copy cached converted layers and name their sub-symbols after ``sym_name``."""
+    layers = [copy.deepcopy(layer) for layer in template]
+    for idx, layer in enumerate(layers):
+        sub_symbol = layer.find("symbol")
+        if sub_symbol is not None:
+            sub_symbol.set("name", f"@{sym_name}@{idx}")
+    return layers
+
+
 # ===========================================================================
 # Tile pattern analysis (Qt QImage based)
 # ===========================================================================
@@ -216,6 +290,7 @@ def _analyze_tile(b64_data: str, cache_key: str = "") -> PatternInfo:
         bg_qgis=_rgba_to_qgis(bg_color),
         fg_qgis=_rgba_to_qgis(fg_color),
         num_colors=len(sorted_colors),
+        avg_qgis=_rgba_to_qgis(_average_color(colors)),
     )
 
     if len(sorted_colors) >= 3:
@@ -371,43 +446,21 @@ def _analyze_tile(b64_data: str, cache_key: str = "") -> PatternInfo:
 def _build_simple_fill_layer(color_qgis, outline="no", style="solid"):
     layer = ET.Element(
         "layer",
-        {
-            "pass": "0",
-            "locked": "0",
-            "class": "SimpleFill",
-            "enabled": "1",
-            "id": _new_uuid(),
-        },
+        {"pass": "0", "locked": "0", "class": "SimpleFill", "enabled": "1"},
     )
     opt = ET.SubElement(layer, "Option", type="Map")
-    ET.SubElement(
-        opt,
-        "Option",
-        value=SCALE_3X,
-        type="QString",
-        name="border_width_map_unit_scale",
-    )
-    ET.SubElement(opt, "Option", value=color_qgis, type="QString", name="color")
-    ET.SubElement(opt, "Option", value="bevel", type="QString", name="joinstyle")
-    ET.SubElement(opt, "Option", value="0,0", type="QString", name="offset")
-    ET.SubElement(
-        opt, "Option", value=SCALE_3X, type="QString", name="offset_map_unit_scale"
-    )
-    ET.SubElement(opt, "Option", value="MM", type="QString", name="offset_unit")
-    ET.SubElement(
-        opt,
-        "Option",
-        value="0,0,0,255,rgb:0,0,0,1",
-        type="QString",
-        name="outline_color",
-    )
-    ET.SubElement(opt, "Option", value=outline, type="QString", name="outline_style")
-    ET.SubElement(opt, "Option", value="0", type="QString", name="outline_width")
-    ET.SubElement(
-        opt, "Option", value="Point", type="QString", name="outline_width_unit"
-    )
-    ET.SubElement(opt, "Option", value=style, type="QString", name="style")
-    layer.append(_make_data_defined_properties())
+    params = [
+        ("color", color_qgis),
+        ("joinstyle", "bevel"),
+        ("offset", "0,0"),
+        ("offset_unit", "MM"),
+        ("outline_color", "0,0,0,255,rgb:0,0,0,1"),
+        ("outline_style", outline),
+        ("outline_width", "0"),
+        ("outline_width_unit", "Point"),
+        ("style", style),
+    ]
+    _add_options(opt, params)
     return layer
 
 
@@ -431,13 +484,7 @@ def _build_point_pattern_fill_layer(
 
     layer = ET.Element(
         "layer",
-        {
-            "pass": "0",
-            "locked": "0",
-            "class": "PointPatternFill",
-            "enabled": "1",
-            "id": _new_uuid(),
-        },
+        {"pass": "0", "locked": "0", "class": "PointPatternFill", "enabled": "1"},
     )
     opt = ET.SubElement(layer, "Option", type="Map")
 
@@ -446,37 +493,25 @@ def _build_point_pattern_fill_layer(
         ("clip_mode", "0"),
         ("coordinate_reference", "feature"),
         ("displacement_x", str(disp_x)),
-        ("displacement_x_map_unit_scale", SCALE_3X),
         ("displacement_x_unit", "Point"),
         ("displacement_y", "0"),
-        ("displacement_y_map_unit_scale", SCALE_3X),
         ("displacement_y_unit", "Point"),
         ("distance_x", str(dx)),
-        ("distance_x_map_unit_scale", SCALE_3X),
         ("distance_x_unit", "Point"),
         ("distance_y", str(dy)),
-        ("distance_y_map_unit_scale", SCALE_3X),
         ("distance_y_unit", "Point"),
         ("offset_x", str(offset_x)),
-        ("offset_x_map_unit_scale", SCALE_3X),
         ("offset_x_unit", "Point"),
         ("offset_y", str(offset_y)),
-        ("offset_y_map_unit_scale", SCALE_3X),
         ("offset_y_unit", "Point"),
-        ("outline_width_map_unit_scale", SCALE_3X),
         ("outline_width_unit", "Point"),
         ("random_deviation_x", "0"),
-        ("random_deviation_x_map_unit_scale", SCALE_3X),
         ("random_deviation_x_unit", "Point"),
         ("random_deviation_y", "0"),
-        ("random_deviation_y_map_unit_scale", SCALE_3X),
         ("random_deviation_y_unit", "Point"),
         ("seed", "0"),
     ]
-    for pname, pval in params:
-        ET.SubElement(opt, "Option", value=pval, type="QString", name=pname)
-
-    layer.append(_make_data_defined_properties())
+    _add_options(opt, params)
 
     # Sub-symbol (marker)
     sub_sym_name = f"@{sym_name}@{layer_idx}"
@@ -493,18 +528,11 @@ def _build_point_pattern_fill_layer(
             "alpha": "1",
         },
     )
-    marker_sym.append(_make_data_defined_properties())
 
     marker_layer = ET.SubElement(
         marker_sym,
         "layer",
-        {
-            "pass": "0",
-            "locked": "0",
-            "class": "SimpleMarker",
-            "enabled": "1",
-            "id": _new_uuid(),
-        },
+        {"pass": "0", "locked": "0", "class": "SimpleMarker", "enabled": "1"},
     )
     mopt = ET.SubElement(marker_layer, "Option", type="Map")
     marker_params = [
@@ -515,22 +543,17 @@ def _build_point_pattern_fill_layer(
         ("joinstyle", "bevel"),
         ("name", "square"),
         ("offset", "0,0"),
-        ("offset_map_unit_scale", SCALE_3X),
         ("offset_unit", "Point"),
         ("outline_color", color_qgis),
         ("outline_style", "no"),
         ("outline_width", "0"),
-        ("outline_width_map_unit_scale", SCALE_3X),
         ("outline_width_unit", "Point"),
         ("scale_method", "diameter"),
         ("size", str(marker_size)),
-        ("size_map_unit_scale", SCALE_3X),
         ("size_unit", "Point"),
         ("vertical_anchor_point", "1"),
     ]
-    for pname, pval in marker_params:
-        ET.SubElement(mopt, "Option", value=pval, type="QString", name=pname)
-    marker_layer.append(_make_data_defined_properties())
+    _add_options(mopt, marker_params)
 
     return layer
 
@@ -540,13 +563,7 @@ def _build_line_pattern_fill_layer(
 ):
     layer = ET.Element(
         "layer",
-        {
-            "pass": "0",
-            "locked": "0",
-            "class": "LinePatternFill",
-            "enabled": "1",
-            "id": _new_uuid(),
-        },
+        {"pass": "0", "locked": "0", "class": "LinePatternFill", "enabled": "1"},
     )
     opt = ET.SubElement(layer, "Option", type="Map")
     params = [
@@ -554,18 +571,13 @@ def _build_line_pattern_fill_layer(
         ("clip_mode", "0"),
         ("coordinate_reference", "feature"),
         ("distance", str(distance)),
-        ("distance_map_unit_scale", SCALE_3X),
         ("distance_unit", "Point"),
         ("line_width", str(line_width)),
-        ("line_width_map_unit_scale", SCALE_3X),
         ("line_width_unit", "Point"),
         ("offset", "0"),
-        ("offset_map_unit_scale", SCALE_3X),
         ("offset_unit", "Point"),
     ]
-    for pname, pval in params:
-        ET.SubElement(opt, "Option", value=pval, type="QString", name=pname)
-    layer.append(_make_data_defined_properties())
+    _add_options(opt, params)
 
     # Sub-symbol (line)
     sub_sym_name = f"@{sym_name}@{layer_idx}"
@@ -582,28 +594,19 @@ def _build_line_pattern_fill_layer(
             "alpha": "1",
         },
     )
-    line_sym.append(_make_data_defined_properties())
 
     line_layer = ET.SubElement(
         line_sym,
         "layer",
-        {
-            "pass": "0",
-            "locked": "0",
-            "class": "SimpleLine",
-            "enabled": "1",
-            "id": _new_uuid(),
-        },
+        {"pass": "0", "locked": "0", "class": "SimpleLine", "enabled": "1"},
     )
     lopt = ET.SubElement(line_layer, "Option", type="Map")
     line_params = [
         ("align_dash_pattern", "0"),
         ("capstyle", "square"),
         ("customdash", "5;2"),
-        ("customdash_map_unit_scale", SCALE_3X),
         ("customdash_unit", "MM"),
         ("dash_pattern_offset", "0"),
-        ("dash_pattern_offset_map_unit_scale", SCALE_3X),
         ("dash_pattern_offset_unit", "MM"),
         ("draw_inside_polygon", "0"),
         ("joinstyle", "bevel"),
@@ -612,22 +615,16 @@ def _build_line_pattern_fill_layer(
         ("line_width", str(line_width)),
         ("line_width_unit", "Point"),
         ("offset", "0"),
-        ("offset_map_unit_scale", SCALE_3X),
         ("offset_unit", "MM"),
         ("ring_filter", "0"),
         ("trim_distance_end", "0"),
-        ("trim_distance_end_map_unit_scale", SCALE_3X),
         ("trim_distance_end_unit", "MM"),
         ("trim_distance_start", "0"),
-        ("trim_distance_start_map_unit_scale", SCALE_3X),
         ("trim_distance_start_unit", "MM"),
         ("tweak_dash_pattern_on_corners", "0"),
         ("use_custom_dash", "0"),
-        ("width_map_unit_scale", SCALE_3X),
     ]
-    for pname, pval in line_params:
-        ET.SubElement(lopt, "Option", value=pval, type="QString", name=pname)
-    line_layer.append(_make_data_defined_properties())
+    _add_options(lopt, line_params)
 
     return layer
 
@@ -637,7 +634,7 @@ def _build_line_pattern_fill_layer(
 # ===========================================================================
 
 
-def _convert_pattern_to_layers(sym_name, info):
+def _convert_pattern_to_layers(sym_name, info, lod_scale=None):
     ptype = info["type"]
 
     # 1) Background SimpleFill (varies by pattern type)
@@ -777,4 +774,12 @@ def _convert_pattern_to_layers(sym_name, info):
             )
         )
 
+    # 3) Level of detail: average color fill instead of patterns when zoomed out
+    if lod_scale and "avg_qgis" in info and len(layers) > 1:
+        for pattern_layer in layers[1:]:
+            pattern_layer.append(_make_enabled_property(f"@map_scale <= {lod_scale}"))
+        lod_layer = _build_simple_fill_layer(info["avg_qgis"])
+        lod_layer.append(_make_enabled_property(f"@map_scale > {lod_scale}"))
+        layers.append(lod_layer)
+
     return layers
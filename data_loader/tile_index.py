@@ -0,0 +1,167 @@
+"""
+Tile bookkeeping of the local feature cache.
+
+``feature_cache`` keeps the features of a FeatureServer layer in a
+GeoPackage table and records here, per cached table, which tiles of a
+fixed grid over the layer extent were fetched and when. Only tiles a view
+intersects are fetched; tiles older than the TTL are fetched again, and
+the style of the layer is kept next to the tiles for offline use.
+
+Extents are plain ``(xmin, ymin, xmax, ymax)`` tuples.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import sqlite3
+
+TILES_PER_SIDE = 16
+
+_TILE_TABLE = "moe_cache_tiles"
+_STYLE_TABLE = "moe_cache_styles"
+
+
+def tile_key(bounds) -> str:
+    return ",".join(f"{value:.6f}" for value in bounds)
+
+
+def tile_grid(extent, tiles_per_side: int = TILES_PER_SIDE):
+    """Split a layer extent into a fixed grid of (col, row, bounds) tiles."""
+    xmin, ymin, xmax, ymax = extent
+    width = (xmax - xmin) / tiles_per_side
+    height = (ymax - ymin) / tiles_per_side
+    for row in range(tiles_per_side):
+        for col in range(tiles_per_side):
+            x0 = xmin + col * width
+            y0 = ymin + row * height
+            yield col, row, (x0, y0, x0 + width, y0 + height)
+
+
+def intersects(a, b) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def owner_tile(x, y, extent, tiles_per_side: int = TILES_PER_SIDE):
+    """Return the (col, row) of the tile storing a feature centred at x, y.
+
+    A feature may intersect several tiles; only the one holding the centre
+    of its bounding box stores it. Centres outside the extent go to the
+    nearest edge tile.
+    """
+    xmin, ymin, xmax, ymax = extent
+    col = int((x - xmin) / ((xmax - xmin) / tiles_per_side or 1))
+    row = int((y - ymin) / ((ymax - ymin) / tiles_per_side or 1))
+    return (
+        min(max(col, 0), tiles_per_side - 1),
+        min(max(row, 0), tiles_per_side - 1),
+    )
+
+
+@contextlib.contextmanager
+def _connect(path):
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {_TILE_TABLE} ("
+                "table_name TEXT NOT NULL, "
+                "service_url TEXT NOT NULL, "
+                "layer_id INTEGER NOT NULL, "
+                "tile TEXT NOT NULL, "
+                "xmin REAL, ymin REAL, xmax REAL, ymax REAL, "
+                "fetched_at REAL NOT NULL, "
+                "PRIMARY KEY (table_name, tile))"
+            )
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {_STYLE_TABLE} ("
+                "table_name TEXT PRIMARY KEY, qml TEXT NOT NULL)"
+            )
+            yield conn
+    finally:
+        conn.close()
+
+
+def find_layer(path: str, service_url: str):
+    """Return the id of the first cached layer of a service, or None."""
+    with _connect(path) as conn:
+        row = conn.execute(
+            f"SELECT layer_id FROM {_TILE_TABLE} WHERE service_url = ? "
+            "ORDER BY layer_id LIMIT 1",
+            (service_url,),
+        ).fetchone()
+    return row[0] if row else None
+
+
+class TileIndex:
+    """Fetch times of the tiles cached for one layer table.
+
+    Args:
+        path: SQLite database (the cache GeoPackage) holding the index.
+        table_name: Table of the cached features.
+        service_url: FeatureServer URL the features come from.
+        layer_id: Layer id within the service.
+    """
+
+    def __init__(self, path, table_name, service_url, layer_id):
+        self.path = path
+        self.table_name = table_name
+        self.service_url = service_url
+        self.layer_id = layer_id
+
+    def keys(self) -> set:
+        with _connect(self.path) as conn:
+            rows = conn.execute(
+                f"SELECT tile FROM {_TILE_TABLE} WHERE table_name = ?",
+                (self.table_name,),
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def fresh(self, now: float, ttl_seconds: float) -> set:
+        """Keys of the tiles fetched less than ``ttl_seconds`` before ``now``."""
+        with _connect(self.path) as conn:
+            rows = conn.execute(
+                f"SELECT tile FROM {_TILE_TABLE} "
+                "WHERE table_name = ? AND fetched_at >= ?",
+                (self.table_name, now - ttl_seconds),
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def mark(self, key: str, bounds, now: float) -> None:
+        with _connect(self.path) as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {_TILE_TABLE} "
+                "(table_name, service_url, layer_id, tile, "
+                "xmin, ymin, xmax, ymax, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.table_name, self.service_url, self.layer_id, key, *bounds, now),
+            )
+
+    def forget(self, keys) -> None:
+        with _connect(self.path) as conn:
+            conn.executemany(
+                f"DELETE FROM {_TILE_TABLE} WHERE table_name = ? AND tile = ?",
+                [(self.table_name, key) for key in keys],
+            )
+
+    def clear(self) -> None:
+        with _connect(self.path) as conn:
+            conn.execute(
+                f"DELETE FROM {_TILE_TABLE} WHERE table_name = ?", (self.table_name,)
+            )
+
+    def save_style(self, qml: str) -> None:
+        with _connect(self.path) as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {_STYLE_TABLE} (table_name, qml) "
+                "VALUES (?, ?)",
+                (self.table_name, qml),
+            )
+
+    def style(self):
+        """The QML document saved with ``save_style``, or None."""
+        with _connect(self.path) as conn:
+            row = conn.execute(
+                f"SELECT qml FROM {_STYLE_TABLE} WHERE table_name = ?",
+                (self.table_name,),
+            ).fetchone()
+        return row[0] if row else None
@@ -0,0 +1,239 @@
+"""
+Vector tile (MBTiles) export of downloaded layers.
+
+Each zoom level is written by its own ``QgsVectorTileWriter`` on a worker
+thread into a temporary archive, and the archives are merged afterwards
+(see ``mbtiles.merge_mbtiles``). Low zoom levels are cut from the overview
+tables when they exist. Only the requested attributes (plus those the
+style needs) are kept in the tiles.
+
+``tile_renderer`` turns the symbology of the saved layer (including the
+native symbols produced by ``style_converter``) into a matching vector tile
+renderer.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from qgis.core import (
+    QgsCategorizedSymbolRenderer,
+    QgsCoordinateTransformContext,
+    QgsExpression,
+    QgsGraduatedSymbolRenderer,
+    QgsRenderContext,
+    QgsRuleBasedRenderer,
+    QgsVectorFileWriter,
+    QgsVectorLayer,
+    QgsVectorTileBasicRenderer,
+    QgsVectorTileBasicRendererStyle,
+    QgsVectorTileWriter,
+)
+from qgis.PyQt.QtCore import QVariant
+
+from . import mbtiles
+
+DEFAULT_MIN_ZOOM = 4
+DEFAULT_MAX_ZOOM = 14
+
+
+def _subset_copy(uri, name, keep, temp_dir, index):
+    """Copy a layer to a temporary GeoPackage with only ``keep`` fields."""
+    layer = QgsVectorLayer(uri, name, "ogr")
+    options = QgsVectorFileWriter.SaveVectorOptions()
+    options.driverName = "GPKG"
+    options.attributes = [
+        i for i, field in enumerate(layer.fields()) if field.name() in keep
+    ]
+    path = os.path.join(temp_dir, f"source_{index}.gpkg")
+    error, message, _, _ = QgsVectorFileWriter.writeAsVectorFormatV3(
+        layer, path, QgsCoordinateTransformContext(), options
+    )
+    if error != QgsVectorFileWriter.WriterError.NoError:
+        raise OSError(f"Failed to prepare tile source: {message}")
+    return path
+
+
+def _write_zoom(uri, tile_layer_name, zoom, path):
+    layer = QgsVectorLayer(uri, tile_layer_name, "ogr")
+    if not layer.isValid():
+        raise OSError(f"Failed to open tile source: {uri}")
+
+    tile_layer = QgsVectorTileWriter.Layer(layer)
+    tile_layer.setLayerName(tile_layer_name)
+
+    writer = QgsVectorTileWriter()
+    writer.setDestinationUri(f"type=mbtiles&url={path}")
+    writer.setMinZoom(zoom)
+    writer.setMaxZoom(zoom)
+    writer.setLayers([tile_layer])
+    writer.setTransformContext(QgsCoordinateTransformContext())
+    if not writer.writeTiles():
+        raise OSError(f"Failed to write zoom {zoom}: {writer.errorMessage()}")
+    return path
+
+
+def export_mbtiles(
+    path,
+    sources,
+    tile_layer_name,
+    min_zoom=DEFAULT_MIN_ZOOM,
+    max_zoom=DEFAULT_MAX_ZOOM,
+    fields=None,
+    workers=None,
+    feedback=None,
+):
+    """Write an MBTiles archive from a layer and its overviews.
+
+    Args:
+        path: Target ``.mbtiles`` file.
+        sources: Mapping of overview scale (None for the full resolution
+            layer) to an OGR layer URI.
+        tile_layer_name: Layer name inside the tiles.
+        min_zoom, max_zoom: Zoom range to write.
+        fields: Attribute names to keep, or None for all.
+        workers: Number of zoom levels written at the same time.
+        feedback: Optional QgsFeedback for progress and cancellation.
+
+    Returns:
+        Number of tiles written.
+    """
+    temp_dir = tempfile.mkdtemp(prefix="moe_tiles_")
+    try:
+        if fields is not None:
+            sources = {
+                scale: _subset_copy(uri, tile_layer_name, set(fields), temp_dir, i)
+                for i, (scale, uri) in enumerate(sources.items())
+            }
+
+        overview_scales = [scale for scale in sources if scale is not None]
+        zooms = list(range(min_zoom, max_zoom + 1))
+        jobs = [
+            (
+                sources[mbtiles.source_for_zoom(zoom, overview_scales)],
+                zoom,
+                os.path.join(temp_dir, f"z{zoom:02d}.mbtiles"),
+            )
+            for zoom in zooms
+        ]
+
+        parts = []
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 2) as pool:
+            futures = [
+                pool.submit(_write_zoom, uri, tile_layer_name, zoom, part)
+                for uri, zoom, part in jobs
+            ]
+            for done, future in enumerate(futures, start=1):
+                if feedback is not None and feedback.isCanceled():
+                    for pending in futures:
+                        pending.cancel()
+                    return 0
+                parts.append(future.result())
+                if feedback is not None:
+                    feedback.setProgress(int(done / len(futures) * 100))
+
+        return mbtiles.merge_mbtiles(path, parts, min_zoom, max_zoom)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def style_attributes(layer) -> set:
+    """Attribute names the layer's renderer needs."""
+    renderer = layer.renderer()
+    if renderer is None:
+        return set()
+    return set(renderer.usedAttributes(QgsRenderContext()))
+
+
+def _is_else_value(value) -> bool:
+    return (
+        value is None or value == "" or (isinstance(value, QVariant) and value.isNull())
+    )
+
+
+def _all_of(*expressions) -> str:
+    """AND the non-empty expressions; an empty result matches everything."""
+    return " AND ".join(f"({expression})" for expression in expressions if expression)
+
+
+def _none_of(expressions) -> str:
+    """Expression matching features that none of ``expressions`` match.
+
+    Comparisons with NULL are NULL rather than false, so the negation is
+    wrapped in ``coalesce`` to keep features with NULL attributes.
+    """
+    parts = [f"({expression})" for expression in expressions if expression]
+    return f"NOT coalesce({' OR '.join(parts)}, false)" if parts else ""
+
+
+def tile_renderer(layer, tile_layer_name) -> QgsVectorTileBasicRenderer:
+    """Build a vector tile renderer matching the symbology of ``layer``."""
+    renderer = layer.renderer()
+    geometry_type = layer.geometryType()
+    styles = []
+
+    def add_style(label, symbol, expression=""):
+        if symbol is None:
+            return
+        style = QgsVectorTileBasicRendererStyle(label, tile_layer_name, geometry_type)
+        style.setSymbol(symbol.clone())
+        style.setFilterExpression(expression)
+        styles.append(style)
+
+    if isinstance(renderer, QgsCategorizedSymbolRenderer):
+        field = renderer.classAttribute()
+        matched = [
+            QgsExpression.createFieldEqualityExpression(field, category.value())
+            for category in renderer.categories()
+            if not _is_else_value(category.value())
+        ]
+        for category in renderer.categories():
+            if not category.renderState():
+                continue
+            if _is_else_value(category.value()):
+                # The "all other values" category draws what no other matches.
+                expression = _none_of(matched)
+            else:
+                expression = QgsExpression.createFieldEqualityExpression(
+                    field, category.value()
+                )
+            add_style(category.label(), category.symbol(), expression)
+    elif isinstance(renderer, QgsGraduatedSymbolRenderer):
+        field = QgsExpression.quotedColumnRef(renderer.classAttribute())
+        for class_range in renderer.ranges():
+            if class_range.renderState():
+                expression = (
+                    f"{field} >= {class_range.lowerValue()} AND "
+                    f"{field} <= {class_range.upperValue()}"
+                )
+                add_style(class_range.label(), class_range.symbol(), expression)
+    elif isinstance(renderer, QgsRuleBasedRenderer):
+
+        def add_rules(parent, parent_expression):
+            children = [rule for rule in parent.children() if rule.active()]
+            siblings = [
+                rule.filterExpression() for rule in children if not rule.isElse()
+            ]
+            for rule in children:
+                if rule.isElse():
+                    if "" in siblings:
+                        # A sibling without a filter leaves nothing for ELSE.
+                        continue
+                    own = _none_of(siblings)
+                else:
+                    own = rule.filterExpression()
+                expression = _all_of(parent_expression, own)
+                add_style(rule.label(), rule.symbol(), expression)
+                add_rules(rule, expression)
+
+        add_rules(renderer.rootRule(), "")
+    elif renderer is not None:
+        symbols = renderer.symbols(QgsRenderContext())
+        add_style(layer.name(), symbols[0] if symbols else None)
+
+    result = QgsVectorTileBasicRenderer()
+    result.setStyles(styles)
+    return result
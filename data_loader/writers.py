@@ -0,0 +1,337 @@
+"""
+Output writers tuned for large downloads.
+
+Each writer streams features straight into a GDAL dataset with creation
+options chosen for bulk output, and is picked by the output extension:
+
+- ``.gpkg``: ``GeoPackageBulkWriter`` writes without the R-tree triggers
+  that Processing sinks maintain on every insert, on a connection with a
+  large page cache, WAL journaling and ``synchronous=OFF``. The spatial
+  index is built in one pass when the writer is closed, followed by
+  ``ANALYZE``.
+- ``.fgb``: ``FlatGeobufWriter`` writes a FlatGeobuf file with its packed
+  Hilbert R-tree, which GDAL sorts and writes when the file is closed.
+- ``.parquet``: ``GeoParquetWriter`` writes GeoParquet in row groups with
+  WKB geometries and a ``bbox`` covering column. Arrow dictionary-encodes
+  the columns by default, which suits the repetitive class attributes.
+
+Temporary outputs go through ``SpillingSink``, which keeps small results in
+a memory layer and moves them to a temporary GeoPackage once they grow past
+a size limit. ``SortingSink`` reorders features along a space-filling curve
+before they reach the output.
+"""
+
+from __future__ import annotations
+
+import os
+
+from osgeo import gdal, ogr
+from qgis.core import (
+    QgsFeature,
+    QgsFeatureSink,
+    QgsGeometry,
+    QgsMemoryProviderUtils,
+    QgsProcessing,
+    QgsVectorFileWriter,
+    QgsVectorLayer,
+)
+from qgis.PyQt.QtCore import QVariant
+
+from . import spatial_sort
+
+# Negative cache_size is in KiB: 512 MiB of page cache for the load.
+BULK_LOAD_PRAGMAS = "cache_size=-524288,synchronous=OFF,journal_mode=WAL"
+PARQUET_ROW_GROUP_SIZE = 65536
+
+
+def is_geopackage(path: str) -> bool:
+    return bool(path) and path.lower().endswith(".gpkg")
+
+
+def is_memory_output(path: str) -> bool:
+    return path == QgsProcessing.TEMPORARY_OUTPUT or path.startswith("memory:")
+
+
+def _sql_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+class StreamingFileWriter:
+    """Feature sink that writes a new file through QgsVectorFileWriter.
+
+    Args:
+        path: File to create (an existing file is overwritten).
+        fields: Output fields.
+        wkb_type: Output geometry type.
+        crs: Output CRS.
+        transform_context: Coordinate transform context of the project.
+        layer_name: Layer name; defaults to the file base name.
+    """
+
+    driver_name = ""
+    layer_options: tuple[str, ...] = ()
+
+    def __init__(self, path, fields, wkb_type, crs, transform_context, layer_name=None):
+        self.path = path
+        self.layer_name = layer_name or os.path.splitext(os.path.basename(path))[0]
+
+        options = QgsVectorFileWriter.SaveVectorOptions()
+        options.driverName = self.driver_name
+        options.layerName = self.layer_name
+        options.fileEncoding = "UTF-8"
+        options.layerOptions = list(self.layer_options)
+        options.actionOnExistingFile = (
+            QgsVectorFileWriter.ActionOnExistingFile.CreateOrOverwriteFile
+        )
+        self._writer = self._create(
+            path, fields, wkb_type, crs, transform_context, options
+        )
+
+    def _create(self, path, fields, wkb_type, crs, transform_context, options):
+        return QgsVectorFileWriter.create(
+            path, fields, wkb_type, crs, transform_context, options
+        )
+
+    def hasError(self) -> bool:
+        return self._writer.hasError() != QgsVectorFileWriter.WriterError.NoError
+
+    def errorMessage(self) -> str:
+        return self._writer.errorMessage()
+
+    def addFeature(self, feature, flags=None) -> bool:
+        if flags is None:
+            return self._writer.addFeature(feature)
+        return self._writer.addFeature(feature, flags)
+
+    def close(self):
+        """Flush the remaining features and finalize the file."""
+        if self._writer is None:
+            return
+        # Deleting the writer commits the last batch and closes the GDAL
+        # dataset, which is when FlatGeobuf and Parquet write their index
+        # and footer.
+        self._writer = None
+        self._finish()
+
+    def _finish(self):
+        pass
+
+
+class GeoPackageBulkWriter(StreamingFileWriter):
+    """GeoPackage writer with a deferred spatial index."""
+
+    driver_name = "GPKG"
+    layer_options = ("SPATIAL_INDEX=NO",)
+
+    def _create(self, *args):
+        # GDAL applies the pragmas when the database is opened, so the
+        # config option only has to be set around create(). It is set for
+        # this thread only, as layers are written on several threads.
+        previous = gdal.GetThreadLocalConfigOption("OGR_SQLITE_PRAGMA")
+        gdal.SetThreadLocalConfigOption("OGR_SQLITE_PRAGMA", BULK_LOAD_PRAGMAS)
+        try:
+            return super()._create(*args)
+        finally:
+            gdal.SetThreadLocalConfigOption("OGR_SQLITE_PRAGMA", previous)
+
+    def _finish(self):
+        ds = ogr.Open(self.path, update=1)
+        if ds is None:
+            raise OSError(f"Failed to reopen GeoPackage: {self.path}")
+        try:
+            layer = ds.GetLayerByName(self.layer_name)
+            geometry_column = layer.GetGeometryColumn() if layer else ""
+            statements = []
+            if geometry_column:
+                statements.append(
+                    f"SELECT CreateSpatialIndex({_sql_literal(self.layer_name)}, "
+                    f"{_sql_literal(geometry_column)})"
+                )
+            statements += ["ANALYZE", "PRAGMA journal_mode=DELETE"]
+            for sql in statements:
+                result = ds.ExecuteSQL(sql)
+                if result is not None:
+                    ds.ReleaseResultSet(result)
+        finally:
+            ds = None
+
+
+class FlatGeobufWriter(StreamingFileWriter):
+    """FlatGeobuf writer with a packed Hilbert R-tree index."""
+
+    driver_name = "FlatGeobuf"
+    layer_options = ("SPATIAL_INDEX=YES",)
+
+
+class GeoParquetWriter(StreamingFileWriter):
+    """GeoParquet writer with row groups and a bbox covering column."""
+
+    driver_name = "Parquet"
+    layer_options = (
+        f"ROW_GROUP_SIZE={PARQUET_ROW_GROUP_SIZE}",
+        "COMPRESSION=ZSTD",
+        "GEOMETRY_ENCODING=WKB",
+        "WRITE_COVERING_BBOX=YES",
+    )
+
+
+WRITERS = {
+    ".gpkg": GeoPackageBulkWriter,
+    ".fgb": FlatGeobufWriter,
+    ".parquet": GeoParquetWriter,
+}
+
+
+def writer_class(path: str):
+    """Return the streaming writer class for an output path, or None."""
+    if not path:
+        return None
+    return WRITERS.get(os.path.splitext(path)[1].lower())
+
+
+def estimate_feature_size(feature) -> int:
+    """Rough in-memory size of a feature in bytes."""
+    size = feature.geometry().wkbSize() if feature.hasGeometry() else 0
+    for value in feature.attributes():
+        size += len(value) if isinstance(value, str) else 8
+    return size
+
+
+class SpillingSink:
+    """Temporary output that moves from memory to disk past a size limit.
+
+    Features are added to a memory layer until their estimated size exceeds
+    ``limit_bytes``; the buffered features are then copied to a temporary
+    GeoPackage at ``spill_path`` and the rest is streamed there. ``close()``
+    sets ``layer`` to whichever layer holds the result.
+    """
+
+    def __init__(
+        self, fields, wkb_type, crs, transform_context, spill_path, limit_bytes
+    ):
+        self.fields = fields
+        self.wkb_type = wkb_type
+        self.crs = crs
+        self.transform_context = transform_context
+        self.spill_path = spill_path
+        self.limit_bytes = limit_bytes
+        self.layer = None
+        self.spilled = False
+
+        self._memory = QgsMemoryProviderUtils.createMemoryLayer(
+            "output", fields, wkb_type, crs
+        )
+        self._buffered_bytes = 0
+        self._disk = None
+
+    def addFeature(self, feature, flags=None) -> bool:
+        if self._disk is not None:
+            return self._disk.addFeature(feature, flags)
+
+        if flags is None:
+            flags = QgsFeatureSink.Flags()
+        if not self._memory.dataProvider().addFeature(feature, flags):
+            return False
+        self._buffered_bytes += estimate_feature_size(feature)
+        if self._buffered_bytes > self.limit_bytes:
+            self._spill()
+        return True
+
+    def _spill(self):
+        disk = GeoPackageBulkWriter(
+            self.spill_path,
+            self.fields,
+            self.wkb_type,
+            self.crs,
+            self.transform_context,
+        )
+        if disk.hasError():
+            raise OSError(f"Failed to create spill file: {disk.errorMessage()}")
+        for feature in self._memory.getFeatures():
+            disk.addFeature(feature, QgsFeatureSink.FastInsert)
+        self._disk = disk
+        self._memory = None
+        self.spilled = True
+
+    def close(self):
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
+            self.layer = QgsVectorLayer(self.spill_path, "output", "ogr")
+        elif self._memory is not None:
+            self.layer = self._memory
+            self._memory = None
+
+
+class SortingSink:
+    """Sink wrapper that writes features in space-filling curve order.
+
+    Features are keyed by their bbox centre within ``extent`` and passed
+    through an external merge sort; ``flush()`` writes them to ``sink``.
+
+    Args:
+        sink: The sink that receives the sorted features.
+        fields: Fields of the features.
+        extent: QgsRectangle mapped onto the curve (the layer extent).
+        curve: ``spatial_sort.HILBERT`` or ``spatial_sort.Z_ORDER``.
+        run_size: Features held in memory per sorted run.
+    """
+
+    def __init__(
+        self,
+        sink,
+        fields,
+        extent,
+        curve=spatial_sort.HILBERT,
+        run_size=spatial_sort.DEFAULT_RUN_SIZE,
+    ):
+        self.sink = sink
+        self.fields = fields
+        self.bounds = (
+            extent.xMinimum(),
+            extent.yMinimum(),
+            extent.xMaximum(),
+            extent.yMaximum(),
+        )
+        self._key = spatial_sort.CURVES[curve]
+        self._sorter = spatial_sort.ExternalSorter(run_size)
+
+    def addFeature(self, feature, flags=None) -> bool:
+        key = 0
+        wkb = None
+        if feature.hasGeometry():
+            center = feature.geometry().boundingBox().center()
+            key = self._key(center.x(), center.y(), self.bounds)
+            wkb = bytes(feature.geometry().asWkb())
+        # Runs are pickled, so store plain values rather than QgsFeature.
+        attributes = [
+            None if isinstance(value, QVariant) and value.isNull() else value
+            for value in feature.attributes()
+        ]
+        self._sorter.add(key, (wkb, attributes))
+        return True
+
+    @property
+    def spilled_runs(self) -> int:
+        return self._sorter.spilled_runs
+
+    def flush(self) -> int:
+        """Write the sorted features and return how many were written."""
+        written = 0
+        try:
+            for wkb, attributes in self._sorter:
+                feature = QgsFeature(self.fields)
+                feature.setAttributes(attributes)
+                if wkb is not None:
+                    geometry = QgsGeometry()
+                    geometry.fromWkb(wkb)
+                    feature.setGeometry(geometry)
+                self.sink.addFeature(feature, QgsFeatureSink.FastInsert)
+                written += 1
+        finally:
+            self._sorter.close()
+        return written
+
+    def close(self):
+        """Remove the temporary sorted runs without writing them."""
+        self._sorter.close()
@@ -56,5 +56,130 @@ If necessary, it can be loaded as an ArcGIS Feature Service layer.</source>
         <source>Load the data from Environmental GeoPortal</source>
         <translation>環境ジオポータルのデータを読み込む</translation>
     </message>
+    <message>
+        <location filename="../data_loader/algorithm.py" line="116"/>
+        <source>Cache ArcGIS REST Server layer features locally</source>
+        <translation>ArcGIS REST Server layerの地物をローカルにキャッシュ</translation>
+    </message>
+    <message>
+        <location filename="../data_loader/algorithm.py" line="125"/>
+        <source>Cache lifetime (hours)</source>
+        <translation>キャッシュの有効期間（時間）</translation>
+    </message>
+    <message>
+        <location filename="../data_loader/algorithm.py" line="141"/>
+        <source>Local mirror directory</source>
+        <translation>ローカルミラーのディレクトリ</translation>
+    </message>
+    <message>
+        <location filename="../data_loader/algorithm.py" line="152"/>
+        <source>Server base URL (mirror server)</source>
+        <translation>サーバーのベースURL（ミラーサーバー）</translation>
+    </message>
+    <message>
+        <location filename="../data_loader/algorithm.py" line="158"/>
+        <source>Only estimate the download size (no download)</source>
+        <translation>ダウンロードサイズの見積もりのみ（ダウンロードしない）</translation>
+    </message>
+    <message>
+        <location filename="../data_loader/algorithm.py" line="168"/>
+        <source>Bulk-load GeoPackage output (build spatial index at the end)</source>
+        <translation>GeoPackage 出力を一括書き込み（空間インデックスは最後に作成）</translation>
+    </message>
+    <message>
+        <location filename="../data_loader/algorithm.py" line="179"/>
+        <source>Move temporary output to disk above (MB, 0 = never)</source>
+        <translation>一時出力をディスクに移すサイズ（MB、0 = 移さない）</translation>
+    </message>
+    <message>
+        <location filename="../data_loader/algorithm.py" line="202"/>
+        <source>Repair invalid geometries (parallel)</source>
+        <translation>無効なジオメトリを修復（並列処理）</translation>
+    </message>
+    <message>
+        <location filename="../data_loader/algorithm.py" line="211"/>
+        <source>Snap geometries to grid (0 = off)</source>
+        <translation>ジオメトリをグリッドにスナップ（0 = 無効）</translation>
+    </message>
+    <message>
+        <location filename="../data_loader/algorithm.py" line="224"/>
+        <source>Spatial order of the output</source>
+        <translation>出力の空間的な並び順</translation>
+    </message>
+    <message>
+        <location filename="../data_loader/algorithm.py" line="226"/>
+        <source>Server order</source>
+        <translation>サーバーの順序</translation>
+    </message>
+    <message>
+        <location filename="../data_loader/algorithm.py" line="227"/>
+        <source>Hilbert curve</source>
+        <translation>ヒルベルト曲線</translation>
+    </message>
+    <message>
+        <location filename="../data_loader/algorithm.py" line="228"/>
+        <source>Z-order curve</source>
+        <translation>Z オーダー曲線</translation>
+    </message>
+    <message>
+        <location filename="../data_loader/algorithm.py" line="240"/>
+        <source>Build overview layers for small scales (GeoPackage)</source>
+        <translation>小縮尺用の概観レイヤーを作成（GeoPackage）</translation>
+    </message>
+    <message>
+        <location filename="../data_loader/algorithm.py" line="302"/>
+        <source>Overviews are simplified feature by feature, so small gaps and overlaps can appear between neighbouring polygons. They are meant for display only; use the full resolution layer for analysis.</source>
+        <translation>概観レイヤーは地物ごとに簡略化されるため、隣接するポリゴンの間に小さな隙間や重なりが生じることがあります。表示専用とし、解析には元の解像度のレイヤーを使用してください。</translation>
+    </message>
+    <message>
+        <location filename="../data_loader/algorithm.py" line="256"/>
+        <source>Vector tile attributes (comma separated, empty = all)</source>
+        <translation>ベクタタイルに含める属性（カンマ区切り、空欄 = すべて）</translation>
+    </message>
+    <message>
+        <location filename="../data_loader/algorithm.py" line="264"/>
+        <source>Vector tile minimum zoom</source>
+        <translation>ベクタタイルの最小ズーム</translation>
+    </message>
+    <message>
+        <location filename="../data_loader/algorithm.py" line="276"/>
+        <source>Vector tile maximum zoom</source>
+        <translation>ベクタタイルの最大ズーム</translation>
+    </message>
+    <message>
+        <location filename="../data_loader/algorithm.py" line="296"/>
+        <source>Vector tiles (MBTiles)</source>
+        <translation>ベクタタイル（MBTiles）</translation>
+    </message>
+    <message>
+        <location filename="../data_loader/algorithm.py" line="298"/>
+        <source>Encode text fields as codes (comma separated, * = all, GeoPackage)</source>
+        <translation>テキスト属性をコード化（カンマ区切り、* = すべて、GeoPackage）</translation>
+    </message>
+    <message>
+        <location filename="../data_loader/algorithm.py" line="310"/>
+        <source>Per-class statistics CSV for fields (comma separated)</source>
+        <translation>属性値ごとの統計 CSV（カンマ区切りで属性を指定）</translation>
+    </message>
+    <message>
+        <location filename="../data_loader/algorithm.py" line="209"/>
+        <source>Only fetch class totals from the server (no geometries)</source>
+        <translation>サーバーで集計した分類ごとの件数のみ取得（ジオメトリなし）</translation>
+    </message>
+    <message>
+        <location filename="../data_loader/algorithm.py" line="218"/>
+        <source>Class totals for all prefectures</source>
+        <translation>全都道府県の分類集計</translation>
+    </message>
+    <message>
+        <location filename="../data_loader/algorithm.py" line="229"/>
+        <source>Download all layers and tables of the service (GeoPackage)</source>
+        <translation>サービスの全レイヤ・テーブルを取得（GeoPackage）</translation>
+    </message>
+    <message>
+        <location filename="../data_loader/algorithm.py" line="1067"/>
+        <source>Downloading all layers needs a GeoPackage file output.</source>
+        <translation>全レイヤの取得には GeoPackage ファイルの出力が必要です。</translation>
+    </message>
 </context>
 </TS>
@@ -0,0 +1,154 @@
+import json
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from data_loader.batch import (
+    build_report,
+    collect_results,
+    expand_jobs,
+    job_parameters,
+    load_jobs,
+    order_jobs,
+)
+from data_loader.settings_datasets import DATASETS
+from data_loader.settings_prefecture import PREFECTURES
+
+
+class TestBatchJobs(unittest.TestCase):
+    """Test job list parsing for the headless batch runner"""
+
+    def test_expand_prefectures(self):
+        """Verify that a job is expanded per prefecture with output templates"""
+        jobs = expand_jobs(
+            {
+                "defaults": {"crs": "EPSG:6677"},
+                "jobs": [
+                    {
+                        "dataset": "vg_50000",
+                        "prefectures": ["1", "13"],
+                        "output": "out/{dataset}_{pref_code}.gpkg",
+                    }
+                ],
+            }
+        )
+        self.assertEqual([j["pref_code"] for j in jobs], ["01", "13"])
+        self.assertEqual(jobs[1]["output"], "out/vg_50000_13.gpkg")
+        self.assertEqual(jobs[0]["crs"], "EPSG:6677")
+        self.assertEqual([j["id"] for j in jobs], [0, 1])
+
+    def test_expand_all_prefectures(self):
+        """Verify that "all" expands to every prefecture"""
+        jobs = expand_jobs(
+            [{"dataset": "vgsk_50000", "prefectures": "all", "output": "{pref_code}"}]
+        )
+        self.assertEqual(len(jobs), len(PREFECTURES))
+
+    def test_non_prefecture_dataset(self):
+        """Verify that datasets without prefectures produce one job"""
+        jobs = expand_jobs([{"dataset": "anaguma", "output": "a.gpkg"}])
+        self.assertEqual(len(jobs), 1)
+        self.assertIsNone(jobs[0]["pref_code"])
+
+    def test_invalid_jobs(self):
+        """Verify that incomplete or unknown jobs are rejected"""
+        invalid = [
+            [{"dataset": "missing", "output": "a.gpkg"}],
+            [{"dataset": "anaguma"}],
+            [{"dataset": "vg_50000", "output": "a.gpkg"}],
+            [{"dataset": "vg_50000", "prefectures": ["99"], "output": "a"}],
+            [{"dataset": "anaguma", "output": "a.gpkg", "typo": 1}],
+        ]
+        for data in invalid:
+            with self.subTest(data=data), self.assertRaises(ValueError):
+                expand_jobs(data)
+
+    def test_job_parameters(self):
+        """Verify that jobs map to algorithm parameter indexes"""
+        job = expand_jobs(
+            [
+                {
+                    "dataset": "vg_50000",
+                    "prefectures": ["13"],
+                    "output": "x.gpkg",
+                    "mirror_dir": "/mirror",
+                    "repair_geometries": True,
+                }
+            ]
+        )[0]
+        params = job_parameters(job)
+        self.assertTrue(params["REPAIR_GEOMETRIES"])
+        self.assertNotIn("GRID_SIZE", params)
+        self.assertEqual(params["CATEGORY"], list(DATASETS).index("vg_50000"))
+        self.assertEqual(params["PREFECTURE"], list(PREFECTURES).index("13"))
+        self.assertEqual(params["MIRROR_DIR"], "/mirror")
+        self.assertNotIn("CRS", params)
+
+    def test_load_json(self):
+        """Verify that job lists are read from JSON files"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "jobs.json")
+            with open(path, "w") as f:
+                json.dump([{"dataset": "anaguma", "output": "a.gpkg"}], f)
+            self.assertEqual(len(load_jobs(path)), 1)
+
+    def test_report_summary(self):
+        """Verify the report summary counts"""
+        results = [
+            {
+                "id": 1,
+                "status": "ok",
+                "seconds": 2.0,
+                "features": 10,
+                "bytes": 5,
+                "invalid_geometries": 3,
+            },
+            {"id": 0, "status": "failed", "seconds": 1.0, "error": "x"},
+        ]
+        report = build_report(results, 2, 0.0)
+        self.assertEqual(report["summary"]["ok"], 1)
+        self.assertEqual(report["summary"]["failed"], 1)
+        self.assertEqual(report["summary"]["features"], 10)
+        self.assertEqual(report["summary"]["invalid_geometries"], 3)
+        self.assertEqual([j["id"] for j in report["jobs"]], [0, 1])
+
+    def test_order_jobs_largest_first(self):
+        """Verify that jobs are ordered by estimated bytes, unknown sizes last"""
+        jobs = [
+            {"id": 0, "estimate": {"bytes": 10}},
+            {"id": 1, "estimate": None},
+            {"id": 2, "estimate": {"bytes": 500}},
+            {"id": 3, "estimate": {"bytes": 10}},
+        ]
+        self.assertEqual([j["id"] for j in order_jobs(jobs)], [2, 0, 3, 1])
+
+    def test_crashed_worker_is_reported(self):
+        """Verify that a job whose worker raised still gets a failed result"""
+        jobs = expand_jobs(
+            [
+                {"dataset": "anaguma", "output": "a.gpkg"},
+                {"dataset": "vg_50000", "prefectures": ["13"], "output": "b.gpkg"},
+            ]
+        )
+
+        def run(job):
+            if job["dataset"] == "vg_50000":
+                raise RuntimeError("A process in the process pool was terminated")
+            return {**job, "status": "ok", "error": None, "seconds": 1.0}
+
+        lines = []
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = {executor.submit(run, job): job for job in jobs}
+            results = collect_results(futures, lines.append)
+
+        by_dataset = {r["dataset"]: r for r in results}
+        self.assertEqual(by_dataset["anaguma"]["status"], "ok")
+        self.assertEqual(by_dataset["vg_50000"]["status"], "failed")
+        self.assertIn("terminated", by_dataset["vg_50000"]["error"])
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(build_report(results, 2, 0.0)["summary"]["failed"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
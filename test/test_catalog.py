@@ -0,0 +1,57 @@
+import unittest
+
+from data_loader.catalog import iter_dataset_urls, resolve_dataset_url
+from data_loader.settings_datasets import DATASETS
+from data_loader.settings_prefecture import PREFECTURES
+
+
+class TestCatalog(unittest.TestCase):
+    """Test dataset URL resolution"""
+
+    def test_hokkaido_vg_50000_url(self):
+        """Verify that Hokkaido vg_50000 resolves to the 01_0420 service"""
+        url = resolve_dataset_url("vg_50000", "01")
+        self.assertIn("/vg_01_0420/FeatureServer", url)
+
+    def test_hokkaido_rule_only_applies_to_vg_50000(self):
+        """Verify that other prefecture datasets keep the plain code"""
+        url = resolve_dataset_url("vgsk_50000", "01")
+        self.assertIn("/vgsk_01/FeatureServer", url)
+
+    def test_prefecture_required(self):
+        """Verify that per-prefecture datasets require a prefecture code"""
+        with self.assertRaises(ValueError):
+            resolve_dataset_url("vg_50000")
+
+    def test_iter_expands_prefectures(self):
+        """Verify that every dataset and prefecture combination is listed"""
+        entries = list(iter_dataset_urls())
+        expected = sum(
+            len(PREFECTURES) if dataset["has_prefecture"] else 1
+            for dataset in DATASETS.values()
+        )
+        self.assertEqual(len(entries), expected)
+        for dataset_key, pref_code, url in entries:
+            with self.subTest(dataset=dataset_key, pref_code=pref_code):
+                self.assertNotIn("{pref_code}", url)
+                self.assertEqual(
+                    pref_code is not None, DATASETS[dataset_key]["has_prefecture"]
+                )
+
+    def test_iter_filters_dataset_keys(self):
+        """Verify that iteration can be limited to selected datasets"""
+        entries = list(iter_dataset_urls(["anaguma"]))
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0][0], "anaguma")
+
+    def test_iter_uses_base_url(self):
+        """Verify that a mirror base URL replaces the services root"""
+        base_url = "http://mirror.local:8080/arcgis/rest/services"
+        entries = list(iter_dataset_urls(["anaguma", "vg_50000"], base_url))
+        self.assertTrue(entries)
+        for _, _, url in entries:
+            self.assertTrue(url.startswith(base_url + "/"), url)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import csv
+import math
+import os
+import tempfile
+import unittest
+
+from data_loader.class_stats import ClassStatistics, StatisticsSink, write_csv
+
+
+class Feature:
+    def __init__(self, attributes, area, bbox):
+        self._attributes = attributes
+        self.area = area
+        self.bbox = bbox
+
+    def attributes(self):
+        return list(self._attributes)
+
+
+class ListSink:
+    def __init__(self):
+        self.features = []
+
+    def addFeature(self, feature, flags=None):
+        self.features.append(feature)
+        return True
+
+
+class TestClassStatistics(unittest.TestCase):
+    """Test the streaming per-class statistics"""
+
+    def test_accumulate(self):
+        """Verify count, area and bbox per class, largest area first"""
+        stats = ClassStatistics("community")
+        stats.add("ブナ群落", 10.0, (0, 0, 1, 1))
+        stats.add("スギ植林", 50.0, (5, 5, 6, 7))
+        stats.add("ブナ群落", 5.0, (-1, 0.5, 0.5, 3))
+        stats.add(None, math.nan, None)
+
+        rows = stats.rows()
+        self.assertEqual(len(stats), 3)
+        self.assertEqual([row["value"] for row in rows], ["スギ植林", "ブナ群落", None])
+        self.assertEqual(rows[1]["count"], 2)
+        self.assertEqual(rows[1]["area_m2"], 15.0)
+        self.assertEqual(
+            (rows[1]["xmin"], rows[1]["ymin"], rows[1]["xmax"], rows[1]["ymax"]),
+            (-1, 0, 1, 3),
+        )
+        self.assertEqual(rows[2]["area_m2"], 0.0)
+        self.assertIsNone(rows[2]["xmin"])
+
+    def test_sink_and_csv(self):
+        """Verify that features pass through unchanged and end up in the CSV"""
+        stats = {1: ClassStatistics("community"), 2: ClassStatistics("naturalness")}
+        sink = ListSink()
+        wrapper = StatisticsSink(
+            sink, stats, lambda feature: (feature.area, feature.bbox)
+        )
+        features = [
+            Feature([1, "ブナ群落", "9"], 2.5, (0, 0, 1, 1)),
+            Feature([2, "ブナ群落", "8"], 1.25, (1, 1, 2, 2)),
+        ]
+        for feature in features:
+            wrapper.addFeature(feature)
+        self.assertEqual(sink.features, features)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "stats.csv")
+            self.assertEqual(write_csv(path, stats.values()), 3)
+            with open(path, encoding="utf-8-sig", newline="") as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual(rows[0]["field"], "community")
+        self.assertEqual(rows[0]["count"], "2")
+        self.assertEqual(rows[0]["area_m2"], "3.75")
+        self.assertEqual([row["value"] for row in rows[1:]], ["9", "8"])
+
+
+if __name__ == "__main__":
+    unittest.main()
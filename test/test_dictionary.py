@@ -0,0 +1,189 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from data_loader.dictionary import (
+    DictionaryEncoder,
+    EncodingSink,
+    recode_style,
+    unrecoded_references,
+    write_lookup_tables,
+)
+
+
+class Feature:
+    def __init__(self, attributes):
+        self._attributes = list(attributes)
+
+    def attributes(self):
+        return list(self._attributes)
+
+    def setAttributes(self, attributes):
+        self._attributes = list(attributes)
+
+
+class ListSink:
+    def __init__(self):
+        self.features = []
+
+    def addFeature(self, feature, flags=None):
+        self.features.append(feature.attributes())
+        return True
+
+
+def create_geopackage(path):
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE gpkg_contents (table_name TEXT PRIMARY KEY, "
+            "data_type TEXT, identifier TEXT UNIQUE, description TEXT, "
+            "last_change TEXT, min_x REAL, min_y REAL, max_x REAL, max_y REAL, "
+            "srs_id INTEGER)"
+        )
+        conn.execute(
+            "CREATE TABLE gpkg_geometry_columns (table_name TEXT, "
+            "column_name TEXT, geometry_type_name TEXT, srs_id INTEGER, "
+            "z INTEGER, m INTEGER)"
+        )
+        conn.execute(
+            "CREATE TABLE veg (fid INTEGER PRIMARY KEY, geom BLOB, "
+            "community INTEGER, area REAL)"
+        )
+        conn.execute(
+            "INSERT INTO gpkg_contents VALUES "
+            "('veg', 'features', 'veg', '', '', 0, 0, 1, 1, 6677)"
+        )
+        conn.execute(
+            "INSERT INTO gpkg_geometry_columns VALUES "
+            "('veg', 'geom', 'MULTIPOLYGON', 6677, 0, 0)"
+        )
+
+
+class TestDictionary(unittest.TestCase):
+    """Test dictionary encoding of text attributes"""
+
+    def test_encoder(self):
+        """Verify that codes are stable per field and NULL is kept"""
+        encoder = DictionaryEncoder(["a", "b"])
+        self.assertEqual(encoder.encode("a", "ブナ群落"), 1)
+        self.assertEqual(encoder.encode("a", "スギ植林"), 2)
+        self.assertEqual(encoder.encode("a", "ブナ群落"), 1)
+        self.assertEqual(encoder.encode("b", "ブナ群落"), 1)
+        self.assertIsNone(encoder.encode("a", None))
+        self.assertEqual(encoder.lookup("a"), [(1, "ブナ群落"), (2, "スギ植林")])
+        self.assertEqual(encoder.distinct_values(), 3)
+        self.assertEqual(encoder.encoded_bytes, 4 * 12)
+
+    def test_encoding_sink(self):
+        """Verify that only the encoded attributes are replaced"""
+        encoder = DictionaryEncoder(["community"])
+        sink = ListSink()
+        encoding = EncodingSink(sink, encoder, {1: "community"})
+        for row in ([1, "ブナ群落", 2.5], [2, "スギ植林", 1.0], [3, "ブナ群落", 0.5]):
+            encoding.addFeature(Feature(row))
+        self.assertEqual(sink.features, [[1, 1, 2.5], [2, 2, 1.0], [3, 1, 0.5]])
+
+    def test_lookup_tables_and_view(self):
+        """Verify that the decoded view joins the lookup values back"""
+        encoder = DictionaryEncoder(["community"])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "out.gpkg")
+            create_geopackage(path)
+            with sqlite3.connect(path) as conn:
+                for fid, name in ((1, "ブナ群落"), (2, "スギ植林"), (3, None)):
+                    conn.execute(
+                        "INSERT INTO veg VALUES (?, NULL, ?, 1.0)",
+                        (fid, encoder.encode("community", name)),
+                    )
+
+            self.assertEqual(write_lookup_tables(path, encoder), "veg_decoded")
+            with sqlite3.connect(path) as conn:
+                rows = conn.execute(
+                    "SELECT fid, community FROM veg_decoded ORDER BY fid"
+                ).fetchall()
+                contents = dict(
+                    conn.execute("SELECT table_name, data_type FROM gpkg_contents")
+                )
+                geometry_tables = [
+                    row[0]
+                    for row in conn.execute(
+                        "SELECT table_name FROM gpkg_geometry_columns"
+                    )
+                ]
+        self.assertEqual(rows, [(1, "ブナ群落"), (2, "スギ植林"), (3, None)])
+        self.assertEqual(contents["veg_community"], "attributes")
+        self.assertEqual(contents["veg_decoded"], "features")
+        self.assertIn("veg_decoded", geometry_tables)
+
+    def test_recode_style(self):
+        """Verify that categorized renderers on encoded fields use the codes"""
+        encoder = DictionaryEncoder(["community"])
+        encoder.encode("community", "スギ植林")
+        xml = (
+            "<!DOCTYPE qgis PUBLIC 'http://mrcc.com/qgis.dtd' 'SYSTEM'>\n"
+            '<qgis><renderer-v2 type="categorizedSymbol" attr="community">'
+            '<categories><category value="ブナ群落" label="ブナ群落" symbol="0"/>'
+            '<category value="スギ植林" label="スギ植林" symbol="1"/>'
+            '<category value="" label="その他" symbol="2"/></categories>'
+            "</renderer-v2></qgis>"
+        )
+        recoded = recode_style(xml, encoder)
+        self.assertTrue(recoded.startswith("<!DOCTYPE qgis"))
+        self.assertIn('value="2" label="ブナ群落"', recoded)
+        self.assertIn('value="1" label="スギ植林"', recoded)
+        self.assertIn('value="" label="その他"', recoded)
+        self.assertEqual(recode_style(xml, DictionaryEncoder(["other"])), xml)
+
+    def test_unrecoded_references(self):
+        """Verify that style elements recode_style skips are reported"""
+        xml = (
+            '<qgis><renderer-v2 type="RuleRenderer"><rules>'
+            '<rule filter="&quot;community&quot; = \'ブナ群落\'" symbol="0"/>'
+            '<rule filter="area &gt; 1 AND note = \'community\'" symbol="1"/>'
+            "</rules></renderer-v2>"
+            '<renderer-v2 type="categorizedSymbol" attr="community"/>'
+            '<renderer-v2 type="graduatedSymbol" attr="length(community)"/>'
+            '<labeling><settings><text-style fieldName="community"/></settings>'
+            "</labeling></qgis>"
+        )
+        references = unrecoded_references(xml, ["community"])
+        self.assertEqual(
+            references,
+            [
+                "graduated renderer (community): length(community)",
+                "rule filter (community): \"community\" = 'ブナ群落'",
+                "label (community): community",
+            ],
+        )
+        self.assertEqual(unrecoded_references(xml, ["other"]), [])
+
+    def test_encoding_shrinks_file(self):
+        """Verify that encoding repeated class names shrinks the GeoPackage"""
+        names = ["ブナ-ミズナラ群落", "スギ・ヒノキ・サワラ植林", "チシマザサ-ブナ群団"]
+        sizes = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            for encode in (False, True):
+                encoder = DictionaryEncoder(["community"])
+                path = os.path.join(tmp, f"{encode}.gpkg")
+                create_geopackage(path)
+                with sqlite3.connect(path) as conn:
+                    conn.executemany(
+                        "INSERT INTO veg VALUES (?, NULL, ?, 1.0)",
+                        (
+                            (
+                                fid,
+                                encoder.encode("community", names[fid % 3])
+                                if encode
+                                else names[fid % 3],
+                            )
+                            for fid in range(20000)
+                        ),
+                    )
+                if encode:
+                    write_lookup_tables(path, encoder)
+                sizes[encode] = os.path.getsize(path)
+        self.assertLess(sizes[True], sizes[False] / 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
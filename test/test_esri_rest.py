@@ -0,0 +1,38 @@
+import unittest
+
+from data_loader.esri_rest import service_entries, table_names
+
+
+class TestEsriRest(unittest.TestCase):
+    """Test the ArcGIS REST helpers"""
+
+    def test_service_entries(self):
+        """Verify that layers come before tables and keep their ids"""
+        service_meta = {
+            "layers": [{"id": 0, "name": "植生"}, {"id": 2, "name": "群落"}],
+            "tables": [{"id": 3, "name": "凡例"}],
+        }
+        entries = service_entries(service_meta)
+        self.assertEqual(
+            [(e["id"], e["kind"]) for e in entries],
+            [(0, "layer"), (2, "layer"), (3, "table")],
+        )
+        self.assertEqual(service_entries({"layers": None}), [])
+
+    def test_table_names(self):
+        """Verify that table names are sanitized and unique"""
+        entries = [
+            {"id": 0, "kind": "layer", "name": "植生 (1/50,000)"},
+            {"id": 1, "kind": "layer", "name": "植生_1_50_000"},
+            {"id": 2, "kind": "table", "name": ""},
+            {"id": 3, "kind": "layer", "name": "Veg"},
+            {"id": 4, "kind": "layer", "name": "veg"},
+        ]
+        self.assertEqual(
+            table_names(entries),
+            ["植生_1_50_000", "植生_1_50_000_2", "table_2", "Veg", "veg_2"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
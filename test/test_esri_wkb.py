@@ -0,0 +1,163 @@
+import math
+import struct
+import unittest
+
+from data_loader.esri_wkb import dequantize, encode, signed_area, wkb_type
+
+
+def read_wkb(data, offset=0):
+    """Minimal ISO WKB reader returning (type, value, next_offset)."""
+    _, geom_type = struct.unpack_from("<BI", data, offset)
+    offset += 5
+    base = geom_type % 1000
+    dim = 2 + (geom_type // 1000 in (1, 3)) + (geom_type // 1000 in (2, 3))
+
+    def read_points(offset):
+        (count,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        values = struct.unpack_from(f"<{count * dim}d", data, offset)
+        points = [list(values[i : i + dim]) for i in range(0, len(values), dim)]
+        return points, offset + 8 * count * dim
+
+    if base == 1:
+        values = struct.unpack_from(f"<{dim}d", data, offset)
+        return geom_type, list(values), offset + 8 * dim
+    if base == 2:
+        points, offset = read_points(offset)
+        return geom_type, points, offset
+    if base == 3:
+        (count,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        rings = []
+        for _ in range(count):
+            ring, offset = read_points(offset)
+            rings.append(ring)
+        return geom_type, rings, offset
+    (count,) = struct.unpack_from("<I", data, offset)
+    offset += 4
+    parts = []
+    for _ in range(count):
+        _, part, offset = read_wkb(data, offset)
+        parts.append(part)
+    return geom_type, parts, offset
+
+
+# Esri exterior rings are clockwise, holes counter-clockwise.
+OUTER = [[0, 0], [0, 10], [10, 10], [10, 0], [0, 0]]
+HOLE = [[2, 2], [4, 2], [4, 4], [2, 4], [2, 2]]
+OTHER = [[20, 0], [20, 5], [25, 5], [25, 0], [20, 0]]
+
+
+class TestEsriWkb(unittest.TestCase):
+    """Test the Esri JSON to WKB encoder"""
+
+    def test_point(self):
+        """Verify point encoding with and without Z"""
+        geom_type, value, _ = read_wkb(encode({"x": 1.5, "y": 2}, "esriGeometryPoint"))
+        self.assertEqual((geom_type, value), (1, [1.5, 2.0]))
+
+        data = encode({"x": 1, "y": 2, "z": 3}, "esriGeometryPoint", has_z=True)
+        self.assertEqual(read_wkb(data)[:2], (1001, [1.0, 2.0, 3.0]))
+
+    def test_polygon_holes_by_orientation(self):
+        """Verify that counter-clockwise rings become holes of their exterior"""
+        data = encode({"rings": [OUTER, OTHER, HOLE]}, "esriGeometryPolygon")
+        geom_type, polygons, end = read_wkb(data)
+        self.assertEqual(geom_type, 6)
+        self.assertEqual(end, len(data))
+        self.assertEqual(len(polygons), 2)
+        self.assertEqual(polygons[0], [OUTER, HOLE])
+        self.assertEqual(polygons[1], [OTHER])
+
+    def test_polygon_without_exterior(self):
+        """Verify that counter-clockwise only rings are kept as exteriors"""
+        _, polygons, _ = read_wkb(encode({"rings": [HOLE]}, "esriGeometryPolygon"))
+        self.assertEqual(polygons, [[HOLE]])
+
+    def test_polyline_and_multipoint(self):
+        """Verify polyline and multipoint encoding"""
+        paths = [[[0, 0], [1, 1]], [[2, 2], [3, 3], [4, 4]]]
+        geom_type, parts, _ = read_wkb(encode({"paths": paths}, "esriGeometryPolyline"))
+        self.assertEqual(geom_type, 5)
+        self.assertEqual(parts, paths)
+
+        points = [[0, 0], [5, 6]]
+        data = encode({"points": points}, "esriGeometryMultipoint")
+        self.assertEqual(read_wkb(data)[:2], (4, points))
+
+    def test_measures(self):
+        """Verify ZM ordinates and missing ordinates padded with zero"""
+        ring = [[0, 0, 1, 7], [0, 1, 1, 7], [1, 1, 1, 7], [0, 0, 1]]
+        data = encode({"rings": [ring]}, "esriGeometryPolygon", has_z=True, has_m=True)
+        geom_type, polygons, _ = read_wkb(data)
+        self.assertEqual(geom_type, wkb_type(6, True, True))
+        self.assertEqual(polygons[0][0][-1], [0.0, 0.0, 1.0, 0.0])
+
+    def test_unsupported(self):
+        """Verify that empty and curve geometries are left to the fallback"""
+        self.assertIsNone(encode(None, "esriGeometryPolygon"))
+        self.assertIsNone(encode({"rings": []}, "esriGeometryPolygon"))
+        self.assertIsNone(encode({"curveRings": [[]]}, "esriGeometryPolygon"))
+        self.assertIsNone(encode({"x": 1, "y": 2}, "esriGeometryEnvelope"))
+
+    def test_null_ordinates(self):
+        """Verify that null Z and M values are written as NaN"""
+        path = [[0, 0, None, 1], [1, 1, 2.5, None]]
+        data = encode({"paths": [path]}, "esriGeometryPolyline", True, True)
+        vertices = read_wkb(data)[1][0]
+        self.assertTrue(math.isnan(vertices[0][2]))
+        self.assertEqual(vertices[0][3], 1.0)
+        self.assertEqual(vertices[1][2], 2.5)
+        self.assertTrue(math.isnan(vertices[1][3]))
+
+    def test_null_point_ordinates(self):
+        """Verify that null Z and M values of points are written as NaN"""
+        geometry = {"x": 1, "y": 2, "z": None, "m": 4}
+        value = read_wkb(encode(geometry, "esriGeometryPoint", True, True))[1]
+        self.assertEqual(value[:2], [1.0, 2.0])
+        self.assertTrue(math.isnan(value[2]))
+        self.assertEqual(value[3], 4.0)
+
+        value = read_wkb(encode({"x": 1, "y": 2}, "esriGeometryPoint", True))[1]
+        self.assertTrue(math.isnan(value[2]))
+
+    def test_quantized(self):
+        """Verify decoding of delta encoded quantized coordinates"""
+        transform = {
+            "originPosition": "upperLeft",
+            "scale": [0.5, 0.5],
+            "translate": [100, 200],
+        }
+        parts = [[[0, 0], [2, 0], [0, 2], [-2, 0], [0, -2]]]
+        self.assertEqual(
+            dequantize(parts, transform),
+            [[[100, 200], [101, 200], [101, 199], [100, 199], [100, 200]]],
+        )
+        data = encode({"rings": parts}, "esriGeometryPolygon", transform=transform)
+        self.assertEqual(read_wkb(data)[1][0][0][2], [101.0, 199.0])
+
+        data = encode({"x": 4, "y": 2}, "esriGeometryPoint", transform=transform)
+        self.assertEqual(read_wkb(data)[1], [102.0, 199.0])
+
+    def test_quantized_keeps_z(self):
+        """Verify that Z values of quantized vertices are not decoded"""
+        transform = {
+            "originPosition": "bottomLeft",
+            "scale": [1, 1],
+            "translate": [10, 20],
+        }
+        path = [[0, 0, 5.5], [3, 4, 6.5]]
+        data = encode({"paths": [path]}, "esriGeometryPolyline", True, False, transform)
+        self.assertEqual(read_wkb(data)[1][0], [[10.0, 20.0, 5.5], [13.0, 24.0, 6.5]])
+
+    def test_signed_area(self):
+        """Verify the orientation sign convention"""
+        from array import array
+        from itertools import chain
+
+        self.assertLess(signed_area(array("d", chain.from_iterable(OUTER))), 0)
+        self.assertGreater(signed_area(array("d", chain.from_iterable(HOLE))), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+from data_loader.estimator import (
+    build_estimate,
+    count_vertices,
+    format_bytes,
+    format_estimate,
+)
+
+
+class TestEstimator(unittest.TestCase):
+    """Test the download estimate extrapolation"""
+
+    def test_count_vertices(self):
+        """Verify vertex counts of Esri JSON geometries"""
+        self.assertEqual(count_vertices(None), 0)
+        self.assertEqual(count_vertices({"x": 1, "y": 2}), 1)
+        self.assertEqual(count_vertices({"rings": [[[0, 0]] * 5, [[1, 1]] * 4]}), 9)
+        self.assertEqual(count_vertices({"paths": [[[0, 0], [1, 1]]]}), 2)
+        self.assertEqual(count_vertices({"points": [[0, 0], [1, 1], [2, 2]]}), 3)
+
+    def test_build_estimate(self):
+        """Verify extrapolation from a sampled page"""
+        estimate = build_estimate(
+            count=10000,
+            extent=None,
+            sample_bytes=100000,
+            sample_features=200,
+            sample_vertices=4000,
+            sample_seconds=1.1,
+            request_seconds=0.1,
+            page_size=1000,
+        )
+        # 250 + 500 + 10 pages of 1000 records
+        self.assertEqual(estimate["pages"], 12)
+        self.assertEqual(estimate["bytes"], 5000000)
+        self.assertEqual(estimate["bytes_per_feature"], 500.0)
+        self.assertEqual(estimate["vertices"], 200000)
+        self.assertEqual(estimate["bandwidth_bytes_per_second"], 100000)
+        # 12 round trips plus 5 MB at 100 kB/s
+        self.assertAlmostEqual(estimate["seconds"], 51.2)
+
+    def test_build_estimate_empty_layer(self):
+        """Verify that an empty layer estimates to zero"""
+        estimate = build_estimate(0, None, 0, 0, 0, 0.2, 0.1, 1000)
+        self.assertEqual(estimate["bytes"], 0)
+        self.assertEqual(estimate["pages"], 0)
+        self.assertEqual(estimate["seconds"], 0)
+
+    def test_format(self):
+        """Verify human readable sizes and estimate lines"""
+        self.assertEqual(format_bytes(512), "512 B")
+        self.assertEqual(format_bytes(1536), "1.5 KB")
+        self.assertEqual(format_bytes(3 * 1024**3), "3.0 GB")
+        lines = format_estimate(build_estimate(100, None, 1000, 10, 50, 0.5, 0.1, 1000))
+        self.assertIn("Estimated features: 100", lines)
+
+
+if __name__ == "__main__":
+    unittest.main()
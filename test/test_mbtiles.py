@@ -0,0 +1,75 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from data_loader.mbtiles import (
+    merge_mbtiles,
+    scale_for_zoom,
+    source_for_zoom,
+    zoom_for_scale,
+)
+
+
+def create_archive(path, zoom, tiles):
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE metadata (name TEXT, value TEXT)")
+        conn.execute(
+            "CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, "
+            "tile_row INTEGER, tile_data BLOB)"
+        )
+        conn.execute(
+            "CREATE UNIQUE INDEX tile_index ON tiles "
+            "(zoom_level, tile_column, tile_row)"
+        )
+        conn.executemany(
+            "INSERT INTO metadata VALUES (?, ?)",
+            [("name", "test"), ("minzoom", str(zoom)), ("maxzoom", str(zoom))],
+        )
+        conn.executemany(
+            "INSERT INTO tiles VALUES (?, ?, ?, ?)",
+            [(zoom, x, y, b"tile") for x, y in tiles],
+        )
+
+
+class TestMbtiles(unittest.TestCase):
+    """Test MBTiles zoom helpers and merging"""
+
+    def test_zoom_scale(self):
+        """Verify the zoom to scale conversion round trips"""
+        self.assertAlmostEqual(zoom_for_scale(scale_for_zoom(12)), 12)
+        self.assertAlmostEqual(scale_for_zoom(1), scale_for_zoom(0) / 2)
+
+    def test_source_for_zoom(self):
+        """Verify that zoom levels map onto the overview scale ranges"""
+        scales = (200_000, 1_000_000)
+        # z8 ~ 1:2.2M, z10 ~ 1:546k, z12 ~ 1:136k
+        self.assertEqual(source_for_zoom(8, scales), 1_000_000)
+        self.assertEqual(source_for_zoom(10, scales), 200_000)
+        self.assertIsNone(source_for_zoom(12, scales))
+        self.assertIsNone(source_for_zoom(5, ()))
+
+    def test_merge(self):
+        """Verify that per-zoom archives merge with updated zoom metadata"""
+        with tempfile.TemporaryDirectory() as tmp:
+            parts = []
+            for zoom, tiles in ((4, [(0, 0)]), (5, [(0, 0), (1, 0)])):
+                path = os.path.join(tmp, f"z{zoom}.mbtiles")
+                create_archive(path, zoom, tiles)
+                parts.append(path)
+
+            target = os.path.join(tmp, "out.mbtiles")
+            self.assertEqual(merge_mbtiles(target, parts, 4, 5), 3)
+            with sqlite3.connect(target) as conn:
+                metadata = dict(conn.execute("SELECT name, value FROM metadata"))
+            self.assertEqual(metadata["minzoom"], "4")
+            self.assertEqual(metadata["maxzoom"], "5")
+
+    def test_merge_requires_parts(self):
+        """Verify that merging nothing is an error"""
+        with self.assertRaises(ValueError):
+            merge_mbtiles("unused.mbtiles", [], 0, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
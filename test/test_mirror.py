@@ -0,0 +1,152 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from data_loader import esri_rest, mirror
+
+SERVICE_URL = "https://example.com/arcgis/rest/services/Hosted/demo/FeatureServer"
+
+
+def _fake_server(features, max_record_count=2, edit_date=1):
+    """Return a fetch_bytes replacement serving one paginated layer."""
+
+    def fetch_bytes(url, params=None, timeout=None):
+        params = params or {}
+        if url == SERVICE_URL:
+            data = {"layers": [{"id": 0, "name": "demo"}], "serviceItemId": "x"}
+        elif url == f"{SERVICE_URL}/0":
+            data = {
+                "id": 0,
+                "name": "demo",
+                "maxRecordCount": max_record_count,
+                "objectIdField": "objectid",
+                "editingInfo": {"lastEditDate": edit_date},
+                "advancedQueryCapabilities": {"supportsPagination": True},
+            }
+        elif params.get("returnCountOnly"):
+            data = {"count": len(features)}
+        else:
+            offset = params["resultOffset"]
+            size = params["resultRecordCount"]
+            page = features[offset : offset + size]
+            data = {
+                "features": page,
+                "exceededTransferLimit": offset + size < len(features),
+            }
+        return json.dumps(data).encode()
+
+    return fetch_bytes
+
+
+class TestQueryPages(unittest.TestCase):
+    """Test paged /query requests"""
+
+    def test_pagination_reads_all_features(self):
+        """Verify that offset pagination returns every feature once"""
+        features = [{"attributes": {"objectid": i}} for i in range(5)]
+        with mock.patch.object(esri_rest, "fetch_bytes", _fake_server(features)):
+            layer_meta = esri_rest.fetch_json(f"{SERVICE_URL}/0")
+            pages = list(esri_rest.iter_query_pages(f"{SERVICE_URL}/0", layer_meta))
+        ids = [f["attributes"]["objectid"] for _, p in pages for f in p["features"]]
+        self.assertEqual(ids, list(range(5)))
+        self.assertEqual(len(pages), 3)
+
+    def test_object_id_chunks(self):
+        """Verify that layers without pagination are read by object IDs"""
+        requested = []
+
+        def fetch_bytes(url, params=None, timeout=None):
+            if params.get("returnIdsOnly"):
+                return json.dumps({"objectIds": [5, 3, 1, 4, 2]}).encode()
+            requested.append(params["objectIds"])
+            return json.dumps({"features": []}).encode()
+
+        with mock.patch.object(esri_rest, "fetch_bytes", fetch_bytes):
+            list(esri_rest.iter_query_pages("https://x/0", {"maxRecordCount": 2}))
+        self.assertEqual(requested, ["1,2", "3,4", "5"])
+
+    def test_failed_page_is_retried_smaller(self):
+        """Verify that a server timeout shrinks the page and loses nothing"""
+        features = [{"attributes": {"objectid": i}} for i in range(300)]
+        server = _fake_server(features, max_record_count=1000)
+        sizes = []
+
+        def fetch_bytes(url, params=None, timeout=None):
+            if params and "resultRecordCount" in params:
+                sizes.append(params["resultRecordCount"])
+                if params["resultRecordCount"] > 200:
+                    body = {"error": {"code": 504, "message": "Timeout"}}
+                    return json.dumps(body).encode()
+            return server(url, params, timeout)
+
+        with mock.patch.object(esri_rest, "fetch_bytes", fetch_bytes):
+            layer_meta = esri_rest.fetch_json(f"{SERVICE_URL}/0")
+            pages = list(esri_rest.iter_query_pages(f"{SERVICE_URL}/0", layer_meta))
+        ids = [f["attributes"]["objectid"] for _, p in pages for f in p["features"]]
+        self.assertEqual(ids, list(range(300)))
+        self.assertEqual(sizes[:2], [250, 125])
+
+    def test_error_document_raises(self):
+        """Verify that ArcGIS error documents raise RestError"""
+        raw = json.dumps({"error": {"code": 400, "message": "bad"}}).encode()
+        with self.assertRaises(esri_rest.RestError):
+            esri_rest.parse_json(raw)
+
+
+class TestMirror(unittest.TestCase):
+    """Test the local catalog mirror"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.mirror_dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_service_name(self):
+        """Verify that the service folder name is taken from the URL"""
+        self.assertEqual(mirror.service_name(SERVICE_URL), "demo")
+
+    def test_mirror_writes_compressed_pages(self):
+        """Verify that pages and metadata are written to the mirror"""
+        features = [{"attributes": {"objectid": i}} for i in range(3)]
+        with mock.patch.object(esri_rest, "fetch_bytes", _fake_server(features)):
+            status = mirror.mirror_service(SERVICE_URL, self.mirror_dir)
+
+        self.assertEqual(status, "updated")
+        service_dir = mirror.mirror_path(self.mirror_dir, SERVICE_URL)
+        self.assertIsNotNone(service_dir)
+        layer_meta, pages = mirror.read_layer(service_dir)
+        self.assertEqual(layer_meta["name"], "demo")
+        self.assertEqual(len(pages), 2)
+        with gzip.open(pages[0]) as f:
+            self.assertEqual(len(json.load(f)["features"]), 2)
+        self.assertEqual(mirror.feature_count(service_dir, layer_meta["id"]), 3)
+        counts = [len(page["features"]) for page in mirror.read_pages(pages)]
+        self.assertEqual(counts, [2, 1])
+
+    def test_unchanged_service_is_skipped(self):
+        """Verify that an unchanged service is not downloaded again"""
+        features = [{"attributes": {"objectid": 1}}]
+        with mock.patch.object(esri_rest, "fetch_bytes", _fake_server(features)):
+            mirror.mirror_service(SERVICE_URL, self.mirror_dir)
+            status = mirror.mirror_service(SERVICE_URL, self.mirror_dir)
+        self.assertEqual(status, "unchanged")
+
+        server = _fake_server(features, edit_date=2)
+        with mock.patch.object(esri_rest, "fetch_bytes", server):
+            status = mirror.mirror_service(SERVICE_URL, self.mirror_dir)
+        self.assertEqual(status, "updated")
+        self.assertFalse(os.path.exists(os.path.join(self.mirror_dir, "demo.previous")))
+
+    def test_missing_service(self):
+        """Verify that services absent from the mirror are reported as None"""
+        self.assertIsNone(mirror.mirror_path(self.mirror_dir, SERVICE_URL))
+        self.assertIsNone(mirror.mirror_path("", SERVICE_URL))
+
+
+if __name__ == "__main__":
+    unittest.main()
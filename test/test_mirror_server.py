@@ -0,0 +1,160 @@
+import gzip
+import json
+import os
+import tempfile
+import threading
+import unittest
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+from data_loader import mirror
+from data_loader.catalog import resolve_dataset_url
+from data_loader.mirror_server import geometry_bbox, make_server
+
+
+def _square(x, y):
+    return {"rings": [[[x, y], [x + 1, y], [x + 1, y + 1], [x, y + 1], [x, y]]]}
+
+
+def _write_mirror(mirror_dir):
+    service_dir = os.path.join(mirror_dir, "demo")
+    layer_dir = os.path.join(service_dir, "0")
+    os.makedirs(layer_dir)
+    with open(os.path.join(service_dir, mirror.SERVICE_FILE), "w") as f:
+        json.dump({"layers": [{"id": 0, "name": "demo"}]}, f)
+    with open(os.path.join(layer_dir, mirror.LAYER_FILE), "w") as f:
+        json.dump({"id": 0, "name": "demo", "maxRecordCount": 3}, f)
+
+    features = [
+        {"attributes": {"objectid": i, "name": f"n{i}", "code": i}, "geometry": g}
+        for i, g in enumerate((_square(i * 10, 0) for i in range(5)), start=1)
+    ]
+    header = {
+        "objectIdFieldName": "objectid",
+        "geometryType": "esriGeometryPolygon",
+        "spatialReference": {"wkid": 102100, "latestWkid": 3857},
+        "fields": [{"name": n} for n in ("objectid", "name", "code")],
+    }
+    for index, chunk in enumerate((features[:3], features[3:])):
+        path = os.path.join(layer_dir, f"page_{index:05d}.json.gz")
+        with gzip.open(path, "wb") as f:
+            f.write(json.dumps({**header, "features": chunk}).encode())
+    with open(os.path.join(service_dir, mirror.MANIFEST_FILE), "w") as f:
+        json.dump({"fingerprint": "a", "layers": {"0": {"pages": 2}}}, f)
+
+
+class TestMirrorServer(unittest.TestCase):
+    """Test the FeatureServer stand-in for a local mirror"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        _write_mirror(cls.tmp.name)
+        cls.server = make_server(cls.tmp.name, "127.0.0.1", 0)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        host, port = cls.server.server_address[:2]
+        cls.base = (
+            f"http://{host}:{port}/arcgis/rest/services/Hosted/demo/FeatureServer"
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.tmp.cleanup()
+
+    def _get(self, path, **params):
+        params.setdefault("f", "json")
+        with urlopen(f"{self.base}{path}?{urlencode(params)}") as response:
+            return json.loads(response.read().decode())
+
+    def test_service_and_layer_metadata(self):
+        """Verify that metadata endpoints return the mirrored documents"""
+        self.assertEqual(self._get("")["layers"][0]["id"], 0)
+        layer = self._get("/0")
+        self.assertEqual(layer["name"], "demo")
+        self.assertTrue(layer["advancedQueryCapabilities"]["supportsPagination"])
+
+    def test_paging(self):
+        """Verify that resultOffset paging returns all features"""
+        first = self._get("/0/query", resultOffset=0, resultRecordCount=3)
+        second = self._get("/0/query", resultOffset=3, resultRecordCount=3)
+        self.assertTrue(first["exceededTransferLimit"])
+        self.assertFalse(second["exceededTransferLimit"])
+        ids = [f["attributes"]["objectid"] for f in first["features"]]
+        ids += [f["attributes"]["objectid"] for f in second["features"]]
+        self.assertEqual(ids, [1, 2, 3, 4, 5])
+
+    def test_bbox_filter(self):
+        """Verify that an envelope filter selects intersecting features"""
+        result = self._get(
+            "/0/query", geometry="9,0,21,1", geometryType="esriGeometryEnvelope"
+        )
+        ids = [f["attributes"]["objectid"] for f in result["features"]]
+        self.assertEqual(ids, [2, 3])
+
+    def test_out_fields(self):
+        """Verify that outFields limits attributes and keeps the object ID"""
+        result = self._get("/0/query", outFields="name", returnGeometry="false")
+        feature = result["features"][0]
+        self.assertEqual(set(feature["attributes"]), {"objectid", "name"})
+        self.assertNotIn("geometry", feature)
+        self.assertEqual([f["name"] for f in result["fields"]], ["objectid", "name"])
+
+    def test_count_and_ids(self):
+        """Verify returnCountOnly and returnIdsOnly queries"""
+        self.assertEqual(self._get("/0/query", returnCountOnly="true")["count"], 5)
+        ids = self._get("/0/query", returnIdsOnly="true", objectIds="4,99,2")
+        self.assertEqual(ids["objectIds"], [2, 4])
+
+    def test_unsupported_where(self):
+        """Verify that where clauses the mirror can't evaluate are rejected"""
+        self.assertEqual(len(self._get("/0/query", where="1 = 1")["features"]), 3)
+        self.assertEqual(self._get("/0/query", where="1=0")["features"], [])
+        result = self._get("/0/query", where="code > 2")
+        self.assertNotIn("features", result)
+        self.assertIn("where", result["error"]["message"])
+
+    def test_spatial_reference(self):
+        """Verify that inSR and outSR must name the mirrored reference"""
+        result = self._get("/0/query", geometry="9,0,21,1", inSR=3857, outSR=102100)
+        self.assertEqual(len(result["features"]), 2)
+        result = self._get("/0/query", outSR='{"wkid": 102100}')
+        self.assertIn("features", result)
+
+        for params in (
+            {"geometry": "9,0,21,1", "inSR": 4326},
+            {"outSR": 6668},
+            {
+                "geometry": '{"xmin": 0, "ymin": 0, "xmax": 1, "ymax": 1, '
+                '"spatialReference": {"wkid": 4326}}'
+            },
+        ):
+            result = self._get("/0/query", **params)
+            self.assertNotIn("features", result)
+            self.assertIn("error", result)
+
+    def test_unknown_service(self):
+        """Verify that unknown services answer with an error document"""
+        with urlopen(f"{self.base.replace('demo', 'missing')}?f=json") as response:
+            self.assertIn("error", json.loads(response.read().decode()))
+
+    def test_geometry_bbox(self):
+        """Verify bounding boxes of Esri JSON geometries"""
+        self.assertEqual(geometry_bbox(_square(2, 3)), (2, 3, 3, 4))
+        self.assertEqual(geometry_bbox({"x": 1, "y": 2}), (1, 2, 1, 2))
+        self.assertIsNone(geometry_bbox(None))
+
+    def test_base_url_replaces_host(self):
+        """Verify that a configured base URL replaces the MOE host"""
+        url = resolve_dataset_url(
+            "anaguma", base_url="http://lan:8080/arcgis/rest/services/"
+        )
+        self.assertEqual(
+            url, "http://lan:8080/arcgis/rest/services/Hosted/anaguma/FeatureServer"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
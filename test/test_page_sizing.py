@@ -0,0 +1,74 @@
+import unittest
+
+from data_loader.page_sizing import AdaptivePageSizer, pages_needed
+
+
+def feed(sizer, seconds_per_feature, pages, overhead=0.5):
+    """Record full pages whose time grows with the page size."""
+    for _ in range(pages):
+        size = sizer.size
+        sizer.record(size, overhead + size * seconds_per_feature, size * 100)
+
+
+class TestAdaptivePageSizer(unittest.TestCase):
+    """Test adaptive page sizing"""
+
+    def test_grows_to_max_while_faster(self):
+        """Verify that sizes double while throughput improves"""
+        sizer = AdaptivePageSizer(2000, start=250)
+        feed(sizer, 0.001, 6)
+        self.assertEqual(sizer.sizes, [250, 500, 1000, 2000])
+        self.assertEqual(sizer.size, 2000)
+
+    def test_returns_to_best_size(self):
+        """Verify that a slower larger page goes back to the best size"""
+        sizer = AdaptivePageSizer(4000, start=250)
+        sizer.record(250, 1.0)
+        sizer.record(500, 1.0)
+        sizer.record(1000, 4.0)
+        self.assertEqual(sizer.size, 500)
+        sizer.record(500, 1.0)
+        self.assertEqual(sizer.size, 500)
+        self.assertEqual(sizer.sizes, [250, 500, 1000, 500])
+
+    def test_short_page_is_ignored(self):
+        """Verify that the last, short page does not change the size"""
+        sizer = AdaptivePageSizer(1000, start=250)
+        sizer.record(10, 0.1)
+        self.assertEqual(sizer.size, 250)
+
+    def test_backs_off_on_failures_and_slow_pages(self):
+        """Verify that failures halve the size and cap further growth"""
+        sizer = AdaptivePageSizer(2000, start=1000, min_size=100, slow_seconds=10)
+        self.assertTrue(sizer.failure())
+        self.assertEqual(sizer.size, 500)
+        feed(sizer, 0.0001, 3)
+        self.assertEqual(sizer.size, 500)
+        sizer.record(500, 20.0)
+        self.assertEqual(sizer.size, 250)
+
+        sizer = AdaptivePageSizer(100, start=100, min_size=100)
+        self.assertTrue(sizer.failure())
+        self.assertTrue(sizer.failure())
+        self.assertFalse(sizer.failure())
+        self.assertEqual(sizer.errors, 3)
+
+    def test_start_is_clamped(self):
+        """Verify that the first size stays within maxRecordCount"""
+        self.assertEqual(AdaptivePageSizer(2).size, 2)
+        self.assertEqual(AdaptivePageSizer(1000, start=5, min_size=25).size, 25)
+        self.assertIn("250", AdaptivePageSizer(1000).summary())
+
+    def test_pages_needed(self):
+        """Verify the page count when sizes double up to maxRecordCount"""
+        self.assertEqual(pages_needed(0, 2000), 0)
+        self.assertEqual(pages_needed(250, 2000), 1)
+        self.assertEqual(pages_needed(251, 2000), 2)
+        # 250 + 500 + 1000 + 4 pages of 2000
+        self.assertEqual(pages_needed(9750, 2000), 7)
+        self.assertEqual(pages_needed(9751, 2000), 8)
+        self.assertEqual(pages_needed(300, 100), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
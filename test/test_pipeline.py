@@ -0,0 +1,146 @@
+import threading
+import time
+import unittest
+
+from data_loader.pipeline import Pipeline, StageMetrics, spawns_python
+
+
+class TestPipeline(unittest.TestCase):
+    """Test the bounded producer-consumer pipeline"""
+
+    def test_results_in_source_order(self):
+        """Verify that results are consumed in source order with several workers"""
+
+        def transform(item):
+            time.sleep(0.001 * (item % 3))
+            return item * 2
+
+        results = []
+        pipeline = Pipeline(range(50), transform, workers=4, queue_size=2)
+        self.assertTrue(pipeline.run(results.append))
+        self.assertEqual(results, [i * 2 for i in range(50)])
+        self.assertEqual([m.items for m in pipeline.metrics], [50, 50, 50])
+
+    def test_backpressure(self):
+        """Verify that the source never runs far ahead of the consumer"""
+        produced = []
+        consumed = []
+        lead = []
+
+        def source():
+            for i in range(40):
+                produced.append(i)
+                yield i
+
+        def consume(item):
+            lead.append(len(produced) - len(consumed))
+            time.sleep(0.002)
+            consumed.append(item)
+
+        Pipeline(source(), lambda x: x, workers=2, queue_size=2).run(consume)
+        self.assertEqual(consumed, list(range(40)))
+        # Only the queues, the workers and the reorder buffer hold items, so
+        # the lead stays far below the 40 items of the source.
+        self.assertLessEqual(max(lead), 16)
+
+    def test_stalled_worker(self):
+        """Verify that a stalled worker does not let the others run ahead"""
+        produced = []
+        lead = []
+
+        def source():
+            for i in range(200):
+                produced.append(i)
+                yield i
+
+        def transform(item):
+            if item == 0:
+                time.sleep(0.3)
+                lead.append(len(produced))
+            return item
+
+        results = []
+        pipeline = Pipeline(
+            source(), transform, workers=3, queue_size=2, max_in_flight=8
+        )
+        self.assertTrue(pipeline.run(results.append))
+        self.assertEqual(results, list(range(200)))
+        # The other workers drained the queues while item 0 stalled, but
+        # the source stopped once 8 items were waiting to be consumed.
+        self.assertLessEqual(lead[0], 9)
+
+    def test_transform_error(self):
+        """Verify that a transform error is raised in the caller"""
+
+        def transform(item):
+            if item == 5:
+                raise ValueError("bad item")
+            return item
+
+        with self.assertRaises(ValueError):
+            Pipeline(range(100), transform).run(lambda _: None)
+
+    def test_source_error(self):
+        """Verify that a source error is raised in the caller"""
+
+        def source():
+            yield 1
+            raise OSError("network down")
+
+        with self.assertRaises(OSError):
+            Pipeline(source(), lambda x: x).run(lambda _: None)
+
+    def test_cancel(self):
+        """Verify that cancelling stops the source"""
+        produced = []
+
+        def source():
+            for i in range(10000):
+                produced.append(i)
+                yield i
+
+        consumed = []
+        pipeline = Pipeline(source(), lambda x: x, queue_size=1)
+        completed = pipeline.run(consumed.append, lambda: len(consumed) >= 3)
+        self.assertFalse(completed)
+        self.assertLess(len(produced), 100)
+        self.assertEqual(threading.active_count(), 1)
+
+    def test_metrics(self):
+        """Verify utilization is bounded and summaries name every stage"""
+        metrics = StageMetrics("decode", threads=2)
+        metrics.add(items=3, busy=1.0)
+        self.assertAlmostEqual(metrics.utilization(1.0), 0.5)
+        self.assertEqual(metrics.utilization(0), 0.0)
+
+        pipeline = Pipeline(range(3), lambda x: x, names=("network", "decode", "write"))
+        pipeline.run(lambda _: None)
+        lines = pipeline.summary()
+        self.assertEqual(
+            [line.split(":")[0] for line in lines], ["network", "decode", "write"]
+        )
+
+    def test_spawns_python(self):
+        """Verify that worker processes are only used from Python interpreters"""
+        for path in (
+            "/usr/bin/python3",
+            "/usr/bin/python3.12",
+            r"C:\OSGeo4W\apps\Python312\python.exe",
+            r"C:\Python\pythonw.exe",
+        ):
+            with self.subTest(path=path):
+                self.assertTrue(spawns_python(path))
+        for path in (
+            "/usr/bin/qgis",
+            "/usr/bin/qgis_process",
+            r"C:\Program Files\QGIS 3.40\bin\qgis-bin.exe",
+            "/Applications/QGIS.app/Contents/MacOS/QGIS",
+            "",
+        ):
+            with self.subTest(path=path):
+                self.assertFalse(spawns_python(path))
+        self.assertTrue(spawns_python())
+
+
+if __name__ == "__main__":
+    unittest.main()
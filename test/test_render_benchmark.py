@@ -0,0 +1,63 @@
+import unittest
+
+from data_loader.render_benchmark import (
+    PATTERNS,
+    _tile_pixels,
+    format_table,
+    mean_difference,
+    pick_fastest,
+)
+
+
+def result(variant, scale, seconds, difference, pattern="dot_grid"):
+    return {
+        "pattern": pattern,
+        "variant": variant,
+        "scale": scale,
+        "seconds": seconds,
+        "difference": difference,
+    }
+
+
+class TestRenderBenchmark(unittest.TestCase):
+    """Test the rendering benchmark evaluation"""
+
+    def test_mean_difference(self):
+        """Verify the channel difference is normalised to 0-1"""
+        white = [(255, 255, 255)] * 4
+        black = [(0, 0, 0)] * 4
+        self.assertEqual(mean_difference(white, white), 0.0)
+        self.assertEqual(mean_difference(white, black), 1.0)
+        self.assertAlmostEqual(
+            mean_difference(white, [(255, 255, 255)] * 2 + black[:2]), 0.5
+        )
+
+    def test_pick_fastest(self):
+        """Verify that only equivalent variants are picked"""
+        results = [
+            result("rasterfill", 5000, 0.30, 0.0),
+            result("native", 5000, 0.20, 0.01),
+            result("flat", 5000, 0.01, 0.20),
+            result("rasterfill", 500000, 0.50, 0.0),
+            result("native", 500000, 0.90, 0.01),
+            result("flat", 500000, 0.02, 0.01),
+        ]
+        picks = pick_fastest(results, tolerance=0.03)["dot_grid"]
+        self.assertEqual(picks["by_scale"], {5000: "native", 500000: "flat"})
+        # flat fails at 1:5000, native is slower than rasterfill in total.
+        self.assertEqual(picks["overall"], "rasterfill")
+        lines = format_table(results, {"dot_grid": picks})
+        self.assertIn("fastest overall: rasterfill", lines[-1])
+
+    def test_synthetic_tiles(self):
+        """Verify that a tile is generated for every pattern type"""
+        for pattern in PATTERNS:
+            size, pixels = _tile_pixels(pattern)
+            self.assertTrue(pixels)
+            self.assertTrue(all(0 <= x < size and 0 <= y < size for x, y in pixels))
+        with self.assertRaises(ValueError):
+            _tile_pixels("unknown")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import json
+import threading
+import unittest
+
+from data_loader.esri_rest import statistics_params
+from data_loader.server_stats import (
+    AREA_FIELD,
+    COUNT_FIELD,
+    SPATIAL_REFERENCE,
+    collect_statistics,
+    layer_spatial_reference,
+    resolve_fields,
+    statistics_definitions,
+)
+
+WEB_MERCATOR = {"wkid": 102100, "latestWkid": 3857}
+
+LAYER_META = {
+    "objectIdField": "OBJECTID",
+    "extent": {
+        "xmin": 0,
+        "ymin": 0,
+        "xmax": 1,
+        "ymax": 1,
+        "spatialReference": WEB_MERCATOR,
+    },
+    "fields": [
+        {"name": "OBJECTID", "type": "esriFieldTypeOID"},
+        {"name": "HANREI_N", "type": "esriFieldTypeString"},
+        {"name": "Shape__Area", "type": "esriFieldTypeDouble"},
+    ],
+}
+
+
+class FakeServer:
+    """Answers metadata and statistics queries per service URL."""
+
+    def __init__(self, totals):
+        self.totals = totals
+        self.queries = []
+        self.lock = threading.Lock()
+
+    def __call__(self, url, params=None):
+        if url.endswith("/query"):
+            with self.lock:
+                self.queries.append(params)
+            service = url.rsplit("/", 2)[0]
+            return {
+                "features": [
+                    {
+                        "attributes": {
+                            "hanrei_n": name,
+                            "FEATURE_COUNT": count,
+                            "AREA_SUM": count * 10.0,
+                        }
+                    }
+                    for name, count in self.totals[service].items()
+                ]
+            }
+        if url.endswith("/0"):
+            return LAYER_META
+        if url not in self.totals:
+            return {"layers": []}
+        return {"layers": [{"id": 0}]}
+
+
+class TestServerStats(unittest.TestCase):
+    """Test the server-side class totals"""
+
+    def test_query_parameters(self):
+        """Verify the outStatistics query without geometries"""
+        definitions = statistics_definitions(LAYER_META)
+        self.assertEqual(
+            [(d["statisticType"], d["onStatisticField"]) for d in definitions],
+            [("count", "OBJECTID"), ("sum", "Shape__Area")],
+        )
+        params = statistics_params(definitions, ["HANREI_N"])
+        self.assertEqual(params["returnGeometry"], "false")
+        self.assertEqual(params["groupByFieldsForStatistics"], "HANREI_N")
+        self.assertEqual(json.loads(params["outStatistics"]), definitions)
+
+        no_area = {"fields": [{"name": "OBJECTID", "type": "esriFieldTypeOID"}]}
+        self.assertEqual(len(statistics_definitions(no_area)), 1)
+
+    def test_resolve_fields(self):
+        """Verify field names resolve case-insensitively"""
+        self.assertEqual(resolve_fields(LAYER_META, ["hanrei_n"]), ["HANREI_N"])
+        with self.assertRaises(ValueError):
+            resolve_fields(LAYER_META, ["missing"])
+
+    def test_layer_spatial_reference(self):
+        """Verify that the area reference falls back to the service's"""
+        self.assertEqual(layer_spatial_reference({}, LAYER_META), WEB_MERCATOR)
+        service = {"spatialReference": {"wkid": 6668}}
+        self.assertEqual(layer_spatial_reference(service, {}), {"wkid": 6668})
+        self.assertEqual(layer_spatial_reference({}, {}), {})
+
+    def test_collect(self):
+        """Verify rows from several services keep target order and errors"""
+        server = FakeServer(
+            {
+                "https://example.com/a": {"ブナ群落": 3, "スギ植林": 7},
+                "https://example.com/b": {"ブナ群落": 1},
+            }
+        )
+        targets = [
+            ("A", "https://example.com/a"),
+            ("X", "https://example.com/x"),
+            ("B", "https://example.com/b"),
+        ]
+        rows, errors = collect_statistics(
+            targets, ["hanrei_n"], workers=3, fetch=server
+        )
+        self.assertEqual(
+            [(r["source"], r["hanrei_n"], r[COUNT_FIELD]) for r in rows],
+            [("A", "スギ植林", 7), ("A", "ブナ群落", 3), ("B", "ブナ群落", 1)],
+        )
+        self.assertEqual(rows[0][AREA_FIELD], 70.0)
+        self.assertEqual(rows[0][SPATIAL_REFERENCE], WEB_MERCATOR)
+        self.assertEqual(list(errors), ["X"])
+        self.assertEqual(len(server.queries), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import random
+import tempfile
+import unittest
+
+from data_loader.spatial_sort import ExternalSorter, hilbert_key, z_order_key
+
+
+class TestCurveKeys(unittest.TestCase):
+    """Test the space-filling curve keys"""
+
+    def test_hilbert_order_2(self):
+        """Verify the Hilbert curve visits a 4x4 grid in its known order"""
+        bounds = (0, 0, 3, 3)
+        keys = {
+            (x, y): hilbert_key(x, y, bounds, order=2)
+            for x in range(4)
+            for y in range(4)
+        }
+        self.assertEqual(sorted(keys.values()), list(range(16)))
+        path = sorted(keys, key=keys.get)
+        self.assertEqual(path[0], (0, 0))
+        self.assertEqual(path[-1], (3, 0))
+        # Consecutive cells are always neighbours.
+        for (x0, y0), (x1, y1) in zip(path, path[1:]):
+            self.assertEqual(abs(x0 - x1) + abs(y0 - y1), 1)
+
+    def test_z_order(self):
+        """Verify Morton keys interleave the x and y bits"""
+        bounds = (0, 0, 3, 3)
+        self.assertEqual(z_order_key(0, 0, bounds, order=2), 0)
+        self.assertEqual(z_order_key(1, 0, bounds, order=2), 1)
+        self.assertEqual(z_order_key(0, 1, bounds, order=2), 2)
+        self.assertEqual(z_order_key(3, 3, bounds, order=2), 15)
+
+    def test_clamped_and_degenerate_bounds(self):
+        """Verify points outside or on empty bounds get valid keys"""
+        self.assertEqual(
+            hilbert_key(-5, -5, (0, 0, 1, 1)), hilbert_key(0, 0, (0, 0, 1, 1))
+        )
+        self.assertEqual(hilbert_key(3, 4, (3, 4, 3, 4)), 0)
+
+
+class TestExternalSorter(unittest.TestCase):
+    """Test the external merge sort"""
+
+    def test_sort_with_spilled_runs(self):
+        """Verify that runs spilled to disk merge into one sorted stream"""
+        rng = random.Random(1)
+        values = [rng.randrange(1000) for _ in range(2500)]
+        with tempfile.TemporaryDirectory() as tmp:
+            sorter = ExternalSorter(run_size=300, temp_dir=tmp)
+            for i, value in enumerate(values):
+                sorter.add(value, (value, i))
+            self.assertEqual(sorter.spilled_runs, 8)
+            result = list(sorter)
+            sorter.close()
+            self.assertEqual(os.listdir(tmp), [])
+        self.assertEqual(result, sorted((v, i) for i, v in enumerate(values)))
+
+    def test_stable_in_memory(self):
+        """Verify that equal keys keep insertion order without spilling"""
+        sorter = ExternalSorter()
+        for item in ["b1", "a1", "b2", "a2"]:
+            sorter.add(item[0], item)
+        self.assertEqual(list(sorter), ["a1", "a2", "b1", "b2"])
+        self.assertEqual(sorter.spilled_runs, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
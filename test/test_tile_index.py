@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+
+from data_loader.tile_index import (
+    TileIndex,
+    find_layer,
+    intersects,
+    owner_tile,
+    tile_grid,
+    tile_key,
+)
+
+SERVICE = "https://example.com/FeatureServer"
+
+
+class TestTileGrid(unittest.TestCase):
+    """Test the tile grid of the feature cache"""
+
+    def test_grid_covers_extent(self):
+        """Verify that the tiles cover the extent without gaps"""
+        tiles = list(tile_grid((0, 0, 40, 20), tiles_per_side=4))
+        self.assertEqual(len(tiles), 16)
+        self.assertEqual(tiles[0], (0, 0, (0, 0, 10, 5)))
+        self.assertEqual(tiles[-1], (3, 3, (30, 15, 40, 20)))
+        self.assertEqual(len({tile_key(bounds) for _, _, bounds in tiles}), 16)
+
+    def test_visible_tiles(self):
+        """Verify that only tiles intersecting a view are selected"""
+        tiles = tile_grid((0, 0, 40, 40), tiles_per_side=4)
+        view = (12, 12, 18, 25)
+        visible = [(col, row) for col, row, b in tiles if intersects(b, view)]
+        self.assertEqual(visible, [(1, 1), (1, 2)])
+
+    def test_owner_tile(self):
+        """Verify that a feature belongs to the tile holding its centre"""
+        extent = (0, 0, 40, 40)
+        self.assertEqual(owner_tile(15, 25, extent, 4), (1, 2))
+        self.assertEqual(owner_tile(-5, 50, extent, 4), (0, 3))
+        self.assertEqual(owner_tile(40, 40, extent, 4), (3, 3))
+        self.assertEqual(owner_tile(3, 3, (0, 0, 0, 0), 4), (3, 3))
+
+
+class TestTileIndex(unittest.TestCase):
+    """Test the fetch bookkeeping of cached tiles"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache.gpkg")
+        self.index = TileIndex(self.path, "layer_a", SERVICE, 0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_ttl_expiry(self):
+        """Verify that tiles older than the TTL are no longer fresh"""
+        self.index.mark("a", (0, 0, 1, 1), now=1000.0)
+        self.index.mark("b", (1, 0, 2, 1), now=5000.0)
+        self.assertEqual(self.index.fresh(now=5000.0, ttl_seconds=3600), {"b"})
+        self.assertEqual(self.index.fresh(now=4600.0, ttl_seconds=3600), {"a", "b"})
+        self.assertEqual(self.index.fresh(now=9000.0, ttl_seconds=3600), set())
+        self.assertEqual(self.index.keys(), {"a", "b"})
+
+    def test_refetch_renews_tile(self):
+        """Verify that marking a tile again replaces its fetch time"""
+        self.index.mark("a", (0, 0, 1, 1), now=1000.0)
+        self.index.mark("a", (0, 0, 1, 1), now=8000.0)
+        self.assertEqual(self.index.fresh(now=9000.0, ttl_seconds=3600), {"a"})
+        self.assertEqual(self.index.keys(), {"a"})
+
+    def test_forget_and_clear(self):
+        """Verify that tiles are dropped per key and per table"""
+        other = TileIndex(self.path, "layer_b", SERVICE, 1)
+        for key in ("a", "b", "c"):
+            self.index.mark(key, (0, 0, 1, 1), now=0.0)
+        other.mark("a", (0, 0, 1, 1), now=0.0)
+        self.index.forget(["a", "c"])
+        self.assertEqual(self.index.keys(), {"b"})
+        self.index.clear()
+        self.assertEqual(self.index.keys(), set())
+        self.assertEqual(other.keys(), {"a"})
+
+    def test_find_layer(self):
+        """Verify that the first cached layer of a service is found"""
+        self.assertIsNone(find_layer(self.path, SERVICE))
+        TileIndex(self.path, "layer_b", SERVICE, 3).mark("a", (0, 0, 1, 1), 0.0)
+        self.index.mark("a", (0, 0, 1, 1), now=0.0)
+        self.assertEqual(find_layer(self.path, SERVICE), 0)
+        self.assertIsNone(find_layer(self.path, "https://example.com/other"))
+
+    def test_style(self):
+        """Verify that the saved style is kept per table"""
+        self.assertIsNone(self.index.style())
+        self.index.save_style("<qgis/>")
+        self.index.save_style("<qgis version='2'/>")
+        self.assertEqual(self.index.style(), "<qgis version='2'/>")
+        self.assertIsNone(TileIndex(self.path, "layer_b", SERVICE, 1).style())
+
+
+if __name__ == "__main__":
+    unittest.main()